@@ -0,0 +1,151 @@
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Sequence, TypeVar
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Draw ADAPTIVE_INITIAL_SAMPLES samples, then waves of ADAPTIVE_WAVE_SIZE until the samples agree
+# within the question type's tolerance or the maximum number of samples is reached
+ADAPTIVE_SAMPLING = os.getenv("ADAPTIVE_SAMPLING", "true").lower() == "true"
+ADAPTIVE_INITIAL_SAMPLES = int(os.getenv("ADAPTIVE_INITIAL_SAMPLES", "3"))
+ADAPTIVE_WAVE_SIZE = int(os.getenv("ADAPTIVE_WAVE_SIZE", "2"))
+BINARY_TOLERANCE = float(os.getenv("ADAPTIVE_BINARY_TOLERANCE", "0.05"))  # probability
+NUMERIC_TOLERANCE = float(os.getenv("ADAPTIVE_NUMERIC_TOLERANCE", "0.03"))  # mean absolute CDF difference
+MULTIPLE_CHOICE_TOLERANCE = float(os.getenv("ADAPTIVE_MULTIPLE_CHOICE_TOLERANCE", "0.1"))  # L1 over options
+
+
+@dataclass
+class Convergence:
+    """
+    How to tell that an ensemble has converged: `aggregate` combines the sample values and
+    `distance` compares two values (or a value and the aggregate) on the scale of `tolerance`.
+    """
+
+    name: str
+    aggregate: Callable[[list], Any]
+    distance: Callable[[Any, Any], float]
+    tolerance: float
+
+
+def binary_convergence(tolerance: float = BINARY_TOLERANCE) -> Convergence:
+    """
+    Values are probabilities; the samples agree when they all lie within `tolerance` of the median.
+    """
+    return Convergence(
+        "binary", lambda values: float(np.median(values)), lambda a, b: abs(a - b), tolerance
+    )
+
+
+def cdf_convergence(tolerance: float = NUMERIC_TOLERANCE) -> Convergence:
+    """
+    Values are CDFs on a shared grid; distance is the mean absolute difference (L1 / grid size).
+    """
+    return Convergence(
+        "numeric",
+        lambda values: np.median(np.asarray(values, dtype=float), axis=0),
+        lambda a, b: float(np.mean(np.abs(np.asarray(a) - np.asarray(b)))),
+        tolerance,
+    )
+
+
+def option_convergence(tolerance: float = MULTIPLE_CHOICE_TOLERANCE) -> Convergence:
+    """
+    Values are probability vectors over the options; distance is the L1 distance.
+    """
+    return Convergence(
+        "multiple_choice",
+        lambda values: np.mean(np.asarray(values, dtype=float), axis=0),
+        lambda a, b: float(np.sum(np.abs(np.asarray(a) - np.asarray(b)))),
+        tolerance,
+    )
+
+
+@dataclass
+class AdaptiveSamplingRecord:
+    label: str
+    kind: str
+    samples_used: int
+    max_samples: int
+    spread: float
+    tolerance: float
+
+
+class AdaptiveSamplingStats:
+    def __init__(self) -> None:
+        self.records: list[AdaptiveSamplingRecord] = []
+
+    def summary(self) -> str:
+        if not self.records:
+            return "Adaptive sampling: no ensembles drawn"
+        used = sum(record.samples_used for record in self.records)
+        budget = sum(record.max_samples for record in self.records)
+        early = sum(record.samples_used < record.max_samples for record in self.records)
+        return (
+            f"Adaptive sampling: {used}/{budget} samples drawn, "
+            f"{early}/{len(self.records)} ensembles stopped early"
+        )
+
+
+adaptive_sampling_stats = AdaptiveSamplingStats()
+
+
+def ensemble_spread(values: Sequence, convergence: Convergence, aggregate: Any = None) -> float:
+    """
+    The largest distance of any sample from the aggregate (computed from `values` if not given).
+    """
+    if aggregate is None:
+        aggregate = convergence.aggregate(list(values))
+    return max(convergence.distance(value, aggregate) for value in values)
+
+
+async def sample_adaptively(
+    draw: Callable[[int], Awaitable[list[T]]],
+    value_of: Callable[[T], Any],
+    convergence: Convergence,
+    max_samples: int,
+    label: str = "",
+    initial_samples: int = ADAPTIVE_INITIAL_SAMPLES,
+    wave_size: int = ADAPTIVE_WAVE_SIZE,
+) -> list[T]:
+    """
+    Draws samples in waves with `draw(k)` until they have converged or `max_samples` have been drawn.
+    The ensemble has converged when every sample is within the tolerance of the aggregate, or when
+    the last wave moved the aggregate by less than half the tolerance.
+    """
+    if not ADAPTIVE_SAMPLING:
+        initial_samples = max_samples
+    samples: list[T] = []
+    values: list = []
+    previous_aggregate = None
+    spread = float("inf")
+    wave = min(max(initial_samples, 1), max_samples)
+    while wave > 0:
+        new_samples = await draw(wave)
+        samples += new_samples
+        values += [value_of(sample) for sample in new_samples]
+        if not values:
+            break
+        aggregate = convergence.aggregate(values)
+        spread = ensemble_spread(values, convergence, aggregate)
+        stable = previous_aggregate is not None and (
+            convergence.distance(aggregate, previous_aggregate) < convergence.tolerance / 2
+        )
+        if spread <= convergence.tolerance or stable or len(samples) >= max_samples:
+            break
+        previous_aggregate = aggregate
+        wave = min(wave_size, max_samples - len(samples))
+
+    record = AdaptiveSamplingRecord(
+        label, convergence.name, len(samples), max_samples, spread, convergence.tolerance
+    )
+    adaptive_sampling_stats.records.append(record)
+    logger.info(
+        f"{convergence.name} ensemble for {label}: {record.samples_used}/{max_samples} samples, "
+        f"spread {spread:.3f} (tolerance {convergence.tolerance})"
+    )
+    return samples
@@ -0,0 +1,189 @@
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# How an ensemble of samples is combined into one forecast, per question type. Every function takes
+# the samples stacked along one axis, with any leading axes as a batch, and ignores NaN (missing) samples.
+BINARY_AGGREGATION = os.getenv("BINARY_AGGREGATION", "median")  # median | trimmed_mean | geo_mean_odds
+NUMERIC_AGGREGATION = os.getenv("NUMERIC_AGGREGATION", "median")  # median | quantile_average
+MULTIPLE_CHOICE_AGGREGATION = os.getenv("MULTIPLE_CHOICE_AGGREGATION", "mean")  # mean | median | log_pool
+TRIM_FRACTION = float(os.getenv("AGGREGATION_TRIM_FRACTION", "0.2"))  # dropped from each end by trimmed_mean
+QUANTILE_LEVELS = int(os.getenv("AGGREGATION_QUANTILE_LEVELS", "1001"))  # probability grid for quantile_average
+
+# Metaculus accepts binary forecasts in [0.001, 0.999]; options are clamped like generate_multiple_choice_forecast
+BINARY_BOUNDS = (0.001, 0.999)
+OPTION_BOUNDS = (0.01, 0.99)
+
+
+def _require_samples(samples_present: np.ndarray) -> None:
+    """
+    `samples_present` is (..., samples); every question in the batch needs at least one sample.
+    """
+    if samples_present.shape[-1] == 0 or not samples_present.any(axis=-1).all():
+        raise ValueError("No samples to aggregate")
+
+
+def trimmed_mean(values: np.ndarray, trim_fraction: float = TRIM_FRACTION) -> np.ndarray:
+    """
+    Mean over the last axis after dropping floor(n * trim_fraction) values from each end.
+    """
+    ordered = np.sort(values, axis=-1)  # NaNs sort last
+    counts = np.sum(~np.isnan(values), axis=-1, keepdims=True)
+    trimmed = np.floor(counts * trim_fraction)
+    ranks = np.arange(values.shape[-1])
+    keep = (ranks >= trimmed) & (ranks < counts - trimmed)
+    return np.sum(np.where(keep, ordered, 0.0), axis=-1) / np.sum(keep, axis=-1)
+
+
+def geometric_mean_of_odds(probabilities: np.ndarray) -> np.ndarray:
+    """
+    Averages in log-odds space over the last axis, so confident samples are not washed out.
+    """
+    clipped = np.clip(probabilities, *BINARY_BOUNDS)
+    log_odds = np.nanmean(np.log(clipped) - np.log1p(-clipped), axis=-1)
+    return 1 / (1 + np.exp(-log_odds))
+
+
+_BINARY_AGGREGATORS = {
+    "median": lambda probabilities: np.nanmedian(probabilities, axis=-1),
+    "trimmed_mean": trimmed_mean,
+    "geo_mean_odds": geometric_mean_of_odds,
+}
+
+
+def aggregate_probabilities(probabilities: np.ndarray, method: str = BINARY_AGGREGATION) -> np.ndarray:
+    """
+    Binary probabilities of shape (..., samples) -> (...), clipped to what Metaculus accepts.
+    Raises ValueError if a question has no samples.
+    """
+    probabilities = np.asarray(probabilities, dtype=float)
+    _require_samples(~np.isnan(probabilities))
+    aggregated = _BINARY_AGGREGATORS[method](probabilities)
+    return np.clip(aggregated, *BINARY_BOUNDS)
+
+
+def clip_and_renormalize(probabilities: np.ndarray) -> np.ndarray:
+    """
+    Clamps option probabilities of shape (..., options) to OPTION_BOUNDS and rescales each row to sum to 1.
+    """
+    clipped = np.clip(probabilities, *OPTION_BOUNDS)
+    return clipped / np.sum(clipped, axis=-1, keepdims=True)
+
+
+def log_pool(probabilities: np.ndarray) -> np.ndarray:
+    """
+    Logarithmic opinion pool: the normalized geometric mean of the samples' option probabilities.
+    """
+    log_probabilities = np.nanmean(np.log(np.clip(probabilities, *OPTION_BOUNDS)), axis=-2)
+    pooled = np.exp(log_probabilities - np.max(log_probabilities, axis=-1, keepdims=True))
+    return pooled / np.sum(pooled, axis=-1, keepdims=True)
+
+
+_OPTION_AGGREGATORS = {
+    "mean": lambda probabilities: np.nanmean(probabilities, axis=-2),
+    "median": lambda probabilities: np.nanmedian(probabilities, axis=-2),
+    "log_pool": log_pool,
+}
+
+
+def aggregate_option_probabilities(
+    probabilities: np.ndarray, method: str = MULTIPLE_CHOICE_AGGREGATION
+) -> np.ndarray:
+    """
+    Option probabilities of shape (..., samples, options) -> (..., options) summing to 1.
+    """
+    probabilities = np.asarray(probabilities, dtype=float)
+    _require_samples(~np.isnan(probabilities).all(axis=-1))
+    aggregated = _OPTION_AGGREGATORS[method](probabilities)
+    return clip_and_renormalize(aggregated)
+
+
+def enforce_cdf_constraints(
+    cdfs: np.ndarray, open_upper_bound: bool, open_lower_bound: bool
+) -> np.ndarray:
+    """
+    Makes every row of `cdfs` a CDF that Metaculus accepts: non-decreasing, 0/1 at closed bounds,
+    within [0.001, 0.999] at open bounds, and increasing by at least 0.01 / (cdf_size - 1) per step
+    (5e-05 for the usual 201 points). The step constraint is met by mixing in the smallest possible
+    share of a uniform ramp, which leaves the endpoints where they are.
+    """
+    cdf_size = cdfs.shape[-1]
+    low = 0.001 if open_lower_bound else 0.0
+    high = 0.999 if open_upper_bound else 1.0
+    cdfs = np.clip(np.maximum.accumulate(cdfs, axis=-1), low, high)
+    if not open_lower_bound:
+        cdfs[..., 0] = 0.0
+    if not open_upper_bound:
+        cdfs[..., -1] = 1.0
+    min_step = 0.01 / (cdf_size - 1)
+    ramp_weight = min_step * (cdf_size - 1) / (high - low)
+    ramp = np.linspace(low, high, cdf_size)
+    return (1 - ramp_weight) * cdfs + ramp_weight * ramp
+
+
+def interp_rows(x: np.ndarray, xp: np.ndarray, fp: np.ndarray) -> np.ndarray:
+    """
+    np.interp(x, xp[i], fp[i]) for every row i at once: sorted x (m,), and xp, fp (..., k) with
+    non-decreasing rows (fp may broadcast against xp) -> (..., m). The knots of all rows are placed among x with one searchsorted.
+    """
+    batch_shape, knots = xp.shape[:-1], xp.shape[-1]
+    fp = np.broadcast_to(fp, xp.shape).reshape(-1)
+    xp = xp.reshape(-1, knots)
+    rows, points = len(xp), len(x)
+    # Knot j of a row is at or below x[i] exactly when searchsorted puts it at or before i
+    positions = np.searchsorted(x, xp) + (np.arange(rows) * (points + 1))[:, None]
+    counts = np.bincount(positions.ravel(), minlength=rows * (points + 1)).reshape(rows, points + 1)
+    index = np.cumsum(counts[:, :-1], axis=1)
+    index = np.minimum(np.maximum(index, 1), knots - 1) + (np.arange(rows) * knots)[:, None]
+    xp = xp.ravel()
+    x_low, x_high, f_low, f_high = xp[index - 1], xp[index], fp[index - 1], fp[index]
+    span = x_high - x_low
+    fraction = np.divide(x - x_low, span, out=np.ones_like(span), where=span > 0)
+    fraction = np.minimum(np.maximum(fraction, 0.0), 1.0)
+    return (f_low + fraction * (f_high - f_low)).reshape(*batch_shape, points)
+
+
+def quantile_average(cdfs: np.ndarray, levels: int = QUANTILE_LEVELS) -> np.ndarray:
+    """
+    Averages CDFs of shape (..., samples, points) horizontally: each sample's quantile function is
+    averaged at `levels` probabilities and the result is turned back into a CDF on the same grid.
+    Unlike a per-point median this keeps the shape of the samples (e.g. a consensus spread instead
+    of a step where the samples disagree). Mass beyond an open bound is placed within one grid step of it.
+    """
+    cdfs = np.asarray(cdfs, dtype=float)
+    points = cdfs.shape[-1]
+    missing = np.isnan(cdfs[..., 0])
+    # Pad with 0 and 1 one grid step outside the range, so every probability level has a location
+    padded = np.concatenate(
+        [np.zeros((*cdfs.shape[:-1], 1)), np.nan_to_num(cdfs), np.ones((*cdfs.shape[:-1], 1))], axis=-1
+    )
+    padded = np.maximum.accumulate(np.clip(padded, 0.0, 1.0), axis=-1)
+    probabilities = np.linspace(0.0, 1.0, levels)
+    locations = interp_rows(probabilities, padded, np.arange(-1.0, points + 1))
+    locations[missing] = np.nan
+    mean_locations = np.nanmean(locations, axis=-2)
+    return interp_rows(np.arange(float(points)), mean_locations, probabilities)
+
+
+_CDF_AGGREGATORS = {
+    "median": lambda cdfs: np.nanmedian(cdfs, axis=-2),
+    "quantile_average": quantile_average,
+}
+
+
+def aggregate_cdfs(
+    cdfs: np.ndarray,
+    open_upper_bound: bool,
+    open_lower_bound: bool,
+    method: str = NUMERIC_AGGREGATION,
+) -> np.ndarray:
+    """
+    CDFs of shape (..., samples, points) on a shared grid -> (..., points), made valid for Metaculus.
+    """
+    cdfs = np.asarray(cdfs, dtype=float)
+    _require_samples(~np.isnan(cdfs).all(axis=-1))
+    aggregated = _CDF_AGGREGATORS[method](cdfs)
+    return enforce_cdf_constraints(aggregated, open_upper_bound, open_lower_bound)
@@ -0,0 +1,218 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, TypeVar
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+# HTTP/2 needs the optional `h2` package (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+@dataclass
+class ConnectionStats:
+    clients_created: int = 0
+    client_setup_seconds: float = 0.0
+    requests: int = 0
+    connections_opened: int = 0
+    handshake_seconds: float = 0.0  # TCP connect + TLS
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of HTTP and LLM clients so that connections (and their TLS sessions) are
+    reused across calls instead of being rebuilt for every request.
+
+    - `http_client(provider)`: one pooled httpx.AsyncClient per provider; the client is shared by every
+      caller, so a caller that needs a shorter timeout passes it on each request
+    - `openai_client(base_url)`: one AsyncOpenAI per base url, sharing the pooled HTTP client
+    - `general_llm(model)`: one forecasting_tools GeneralLlm per model and settings
+    - `asknews_searcher()` / `smart_searcher(model)`: one forecasting_tools searcher (per model and settings)
+
+    Async clients belong to the event loop that created them; they are closed when asyncio.run shuts
+    that loop down, and recreated if a new loop is started (e.g. a second asyncio.run). Each client
+    records how many connections it had to open and how long the TCP/TLS handshakes took, which
+    `summary()` reports. `aclose_all()` (or wrapping the run in `closing(...)`) closes them earlier.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        keepalive_seconds: float = HTTP_KEEPALIVE_SECONDS,
+        http2: bool = HTTP2_AVAILABLE,
+    ) -> None:
+        self.pool_size = pool_size
+        self.keepalive_seconds = keepalive_seconds
+        self.http2 = http2
+        self.stats: dict[str, ConnectionStats] = defaultdict(ConnectionStats)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._http_clients: dict[str, httpx.AsyncClient] = {}
+        self._openai_clients: dict[tuple[str | None, str | None], object] = {}
+        self._llms: dict[tuple, object] = {}
+        self._searchers: dict[tuple, object] = {}
+        self._closer: asyncio.Task | None = None
+
+    def _check_loop(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._loop is not loop:
+            # Clients of the previous loop were closed by _aclose_at_exit when that loop shut down
+            self._loop = loop
+            self._http_clients = {}
+            self._openai_clients = {}
+            self._closer = loop.create_task(self._aclose_at_exit())
+
+    async def _aclose_at_exit(self) -> None:
+        """
+        Waits until cancelled, then closes the clients. asyncio.run cancels the tasks still pending
+        once its coroutine returns, so this shuts the pools down while their loop can still close the
+        connections; once the loop is closed, nothing can.
+        """
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            if self._closer is asyncio.current_task():
+                await self.aclose_all()
+            raise
+
+    def _make_trace(self, provider: str):
+        stats = self.stats[provider]
+        started_at: dict[str, float] = {}
+
+        async def trace(event_name: str, info: dict) -> None:
+            if event_name.endswith(".started"):
+                started_at[event_name.removesuffix(".started")] = time.perf_counter()
+            elif event_name.endswith(".complete"):
+                step = event_name.removesuffix(".complete")
+                start = started_at.pop(step, None)
+                if start is not None and step in ("connection.connect_tcp", "connection.start_tls"):
+                    stats.handshake_seconds += time.perf_counter() - start
+                if step == "connection.connect_tcp":
+                    stats.connections_opened += 1
+
+        return trace
+
+    def http_client(
+        self,
+        provider: str,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> httpx.AsyncClient:
+        self._check_loop()
+        client = self._http_clients.get(provider)
+        if client is not None and not client.is_closed:
+            return client
+        stats = self.stats[provider]
+        trace = self._make_trace(provider)
+
+        async def on_request(request: httpx.Request) -> None:
+            stats.requests += 1
+            request.extensions["trace"] = trace
+
+        start = time.perf_counter()
+        client = httpx.AsyncClient(
+            http2=self.http2,
+            timeout=httpx.Timeout(600, connect=10),
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+                keepalive_expiry=self.keepalive_seconds,
+            ),
+            transport=transport,
+            event_hooks={"request": [on_request]},
+        )
+        stats.clients_created += 1
+        stats.client_setup_seconds += time.perf_counter() - start
+        self._http_clients[provider] = client
+        return client
+
+    def openai_client(self, base_url: str | None = None, api_key: str | None = None):
+        """
+        Retries are left to rate_limiting.call_with_backoff, so the SDK's own retries are disabled.
+        """
+        from openai import AsyncOpenAI
+
+        self._check_loop()
+        key = (base_url, api_key)
+        if key not in self._openai_clients:
+            provider = "openai" if base_url is None else httpx.URL(base_url).host
+            http_client = self.http_client(provider)
+            start = time.perf_counter()
+            self._openai_clients[key] = AsyncOpenAI(
+                base_url=base_url, api_key=api_key, http_client=http_client, max_retries=0
+            )
+            self.stats[provider].client_setup_seconds += time.perf_counter() - start
+        return self._openai_clients[key]
+
+    def general_llm(self, model: str, **kwargs):
+        from forecasting_tools import GeneralLlm
+
+        key = (model, tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+        if key not in self._llms:
+            start = time.perf_counter()
+            self._llms[key] = GeneralLlm(model=model, **kwargs)
+            stats = self.stats[f"llm:{model}"]
+            stats.clients_created += 1
+            stats.client_setup_seconds += time.perf_counter() - start
+        return self._llms[key]
+
+    def _searcher(self, name: str, factory, **kwargs):
+        key = (name, tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+        if key not in self._searchers:
+            start = time.perf_counter()
+            self._searchers[key] = factory(**kwargs)
+            stats = self.stats[f"searcher:{name}"]
+            stats.clients_created += 1
+            stats.client_setup_seconds += time.perf_counter() - start
+        return self._searchers[key]
+
+    def asknews_searcher(self, **kwargs):
+        from forecasting_tools import AskNewsSearcher
+
+        return self._searcher("asknews", AskNewsSearcher, **kwargs)
+
+    def smart_searcher(self, model: str, **kwargs):
+        from forecasting_tools import SmartSearcher
+
+        return self._searcher(f"smart_searcher:{model}", SmartSearcher, model=model, **kwargs)
+
+    async def aclose_all(self) -> None:
+        closer, self._closer = self._closer, None
+        if closer is not None and closer is not asyncio.current_task():
+            closer.cancel()
+        # The next client starts over, along with a new _aclose_at_exit
+        self._loop = None
+        clients = list(self._http_clients.values())
+        self._http_clients = {}
+        self._openai_clients = {}
+        await asyncio.gather(*[client.aclose() for client in clients], return_exceptions=True)
+
+    async def closing(self, coro: Awaitable[T]) -> T:
+        try:
+            return await coro
+        finally:
+            await self.aclose_all()
+
+    def summary(self) -> str:
+        lines = [f"HTTP clients (pool size {self.pool_size}, http2={self.http2}):"]
+        for provider, stats in sorted(self.stats.items()):
+            lines.append(
+                f"- {provider}: {stats.clients_created} clients built in {stats.client_setup_seconds * 1000:.1f}ms, "
+                f"{stats.requests} requests over {stats.connections_opened} connections "
+                f"({stats.handshake_seconds * 1000:.1f}ms in TCP/TLS handshakes)"
+            )
+        return "\n".join(lines)
+
+
+clients = ClientRegistry()
@@ -0,0 +1,98 @@
+import logging
+from collections import Counter
+from typing import Awaitable, Callable, TypeVar
+
+from forecasting_tools import (
+    BinaryPrediction,
+    Percentile,
+    PredictedOption,
+    PredictedOptionList,
+)
+
+from parse_answers_from_response import (
+    extract_answer,
+    extract_percentiles_from_response,
+    parse_multiple_choice_probab_distr,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# (question kind, tier) -> count, where tier is "regex" or "llm"
+parse_tier_counts: Counter[tuple[str, str]] = Counter()
+
+
+def parse_binary_with_regex(text: str) -> BinaryPrediction | None:
+    parsed = extract_answer(text, "binary")
+    if parsed.value is None or not 0 <= parsed.value <= 1:
+        logger.info(f"Regex binary parse failed: {parsed.diagnostics}")
+        return None
+    return BinaryPrediction(prediction_in_decimal=parsed.value)
+
+
+def parse_option_list_with_regex(text: str, options: list[str]) -> PredictedOptionList | None:
+    try:
+        probabilities = parse_multiple_choice_probab_distr(text, len(options))
+    except (ValueError, ZeroDivisionError) as e:
+        logger.info(f"Regex option list parse failed: {e}")
+        return None
+    return PredictedOptionList(
+        predicted_options=[
+            PredictedOption(option_name=option, probability=probability)
+            for option, probability in zip(options, probabilities)
+        ]
+    )
+
+
+def parse_percentiles_with_regex(text: str) -> list[Percentile] | None:
+    try:
+        percentile_values = extract_percentiles_from_response(text)
+    except ValueError as e:
+        logger.info(f"Regex percentile parse failed: {e}")
+        return None
+    if len(percentile_values) < 3:
+        return None
+    percentiles = [
+        Percentile(percentile=round(percentile / 100, 6), value=value)
+        for percentile, value in sorted(percentile_values.items())
+    ]
+    values = [percentile.value for percentile in percentiles]
+    if any(lower >= upper for lower, upper in zip(values, values[1:])):
+        return None
+    return percentiles
+
+
+async def tiered_parse(
+    kind: str,
+    regex_parse: Callable[[], T | None],
+    llm_parse: Callable[[], Awaitable[T]],
+) -> T:
+    """
+    Tries the deterministic regex parser first and only calls the parser LLM if it
+    finds nothing or its output fails validation.
+    """
+    try:
+        parsed = regex_parse()
+    except Exception as e:
+        logger.info(f"Regex parse for {kind} failed validation: {e}")
+        parsed = None
+    if parsed is not None:
+        parse_tier_counts[(kind, "regex")] += 1
+        return parsed
+    parse_tier_counts[(kind, "llm")] += 1
+    return await llm_parse()
+
+
+def parse_tier_summary() -> str:
+    kinds = sorted({kind for kind, _ in parse_tier_counts})
+    if not kinds:
+        return "Parser tiers: nothing parsed"
+    parts = []
+    for kind in kinds:
+        regex_count = parse_tier_counts[(kind, "regex")]
+        llm_count = parse_tier_counts[(kind, "llm")]
+        parts.append(
+            f"{kind}: {regex_count}/{regex_count + llm_count} regex ({llm_count} fell back to the parser LLM)"
+        )
+    return "Parser tiers: " + ", ".join(parts)
@@ -0,0 +1,87 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+DEFAULT_STATE_PATH = os.getenv("FORECAST_STATE_PATH", ".cache/forecast_state.sqlite3")
+
+
+def digest(*parts: str | None) -> str:
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update((part or "").encode("utf-8"))
+        hasher.update(b"\x00")
+    return hasher.hexdigest()
+
+
+def question_input_hash(
+    title: str, description: str | None, resolution_criteria: str | None, fine_print: str | None
+) -> str:
+    return digest(title, description, resolution_criteria, fine_print)
+
+
+class ForecastStateStore:
+    """
+    Remembers, per question, the inputs of its last forecast: a hash of the question text
+    (title, description, resolution criteria, fine print), a digest of the research used,
+    and when the forecast was made. Used by incremental mode to only re-forecast questions
+    that are new, changed, or older than `max_age_seconds`.
+    """
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH, max_age_seconds: float = 3 * 24 * 60 * 60) -> None:
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS question_state (
+                question_id INTEGER PRIMARY KEY,
+                input_hash TEXT NOT NULL,
+                research_digest TEXT,
+                forecast_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _get(self, question_id: int) -> tuple[str, str | None, float] | None:
+        return self._conn.execute(
+            "SELECT input_hash, research_digest, forecast_at FROM question_state WHERE question_id = ?",
+            (question_id,),
+        ).fetchone()
+
+    def reason_to_forecast(self, question_id: int, input_hash: str) -> str | None:
+        """
+        Returns "new", "changed" or "stale", or None if the last forecast is still current.
+        """
+        row = self._get(question_id)
+        if row is None:
+            return "new"
+        last_input_hash, _, forecast_at = row
+        if last_input_hash != input_hash:
+            return "changed"
+        if time.time() - forecast_at > self.max_age_seconds:
+            return "stale"
+        return None
+
+    def research_unchanged(self, question_id: int, input_hash: str, research_digest: str) -> bool:
+        row = self._get(question_id)
+        return row is not None and row[0] == input_hash and row[1] == research_digest
+
+    def record_forecast(self, question_id: int, input_hash: str, research_digest: str | None) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO question_state (question_id, input_hash, research_digest, forecast_at) VALUES (?, ?, ?, ?)",
+            (question_id, input_hash, research_digest, time.time()),
+        )
+        self._conn.commit()
+
+    def touch(self, question_id: int) -> None:
+        """
+        Marks the last forecast as current again without changing its inputs.
+        """
+        self._conn.execute(
+            "UPDATE question_state SET forecast_at = ? WHERE question_id = ?", (time.time(), question_id)
+        )
+        self._conn.commit()
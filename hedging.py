@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from rate_limiting import estimate_tokens
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# "single": only the first provider, "hedge": race a backup once the primary is slow, "merge": ask every provider
+RESEARCH_MODE = os.getenv("RESEARCH_MODE", "hedge")
+# The backup is started once the primary has taken longer than this percentile of its recent latencies
+RESEARCH_HEDGE_PERCENTILE = float(os.getenv("RESEARCH_HEDGE_PERCENTILE", "0.9"))
+# Used until a provider has RESEARCH_HEDGE_MIN_SAMPLES latencies recorded
+RESEARCH_HEDGE_DEFAULT_DELAY = float(os.getenv("RESEARCH_HEDGE_DEFAULT_DELAY", "60"))
+RESEARCH_HEDGE_MIN_SAMPLES = int(os.getenv("RESEARCH_HEDGE_MIN_SAMPLES", "5"))
+RESEARCH_TOKEN_BUDGET = int(os.getenv("RESEARCH_TOKEN_BUDGET", "6000"))
+
+
+@dataclass
+class ResearchSource:
+    name: str
+    fetch: Callable[[str], Awaitable[str]]
+
+
+class LatencyTracker:
+    """
+    Keeps the last `window` successful latencies per provider.
+    """
+
+    def __init__(self, window: int = 200) -> None:
+        self._latencies: dict[str, deque[float]] = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, provider: str, seconds: float) -> None:
+        self._latencies[provider].append(seconds)
+
+    def count(self, provider: str) -> int:
+        return len(self._latencies[provider])
+
+    def percentile(self, provider: str, q: float) -> float | None:
+        latencies = sorted(self._latencies[provider])
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, max(0, round(q * (len(latencies) - 1))))
+        return latencies[index]
+
+
+def _is_good_answer(answer: object) -> bool:
+    return isinstance(answer, str) and bool(answer.strip())
+
+
+class HedgedResearcher:
+    """
+    Fetches research for a query from a list of providers, in order of preference.
+
+    - "single": only the first provider is asked.
+    - "hedge": the first provider is asked; if it has not answered after its `hedge_percentile`
+      latency (or fails), the next provider is asked too, and so on. The first good answer wins and
+      the requests still in flight are cancelled.
+    - "merge": all providers are asked at once and their answers are concatenated, each truncated
+      to an equal share of `token_budget`.
+    """
+
+    def __init__(
+        self,
+        sources: list[ResearchSource],
+        mode: str = RESEARCH_MODE,
+        hedge_percentile: float = RESEARCH_HEDGE_PERCENTILE,
+        default_hedge_delay: float = RESEARCH_HEDGE_DEFAULT_DELAY,
+        min_samples: int = RESEARCH_HEDGE_MIN_SAMPLES,
+        token_budget: int = RESEARCH_TOKEN_BUDGET,
+        latencies: LatencyTracker | None = None,
+    ) -> None:
+        if mode not in ("single", "hedge", "merge"):
+            raise ValueError(f"Unknown research mode: {mode}")
+        self.sources = sources
+        self.mode = mode
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_samples = min_samples
+        self.token_budget = token_budget
+        self.latencies = latencies or LatencyTracker()
+        self.wins: Counter[str] = Counter()
+        self.hedges_started = 0
+        self.failures: Counter[str] = Counter()
+        self.total_latencies: list[float] = []
+
+    def hedge_delay(self, provider: str) -> float:
+        if self.latencies.count(provider) < self.min_samples:
+            return self.default_hedge_delay
+        return self.latencies.percentile(provider, self.hedge_percentile) or self.default_hedge_delay
+
+    async def _timed_fetch(self, source: ResearchSource, query: str) -> str:
+        start = time.perf_counter()
+        try:
+            with tracer.span(source.name):
+                answer = await source.fetch(query)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures[source.name] += 1
+            logger.warning(f"Research from {source.name} failed: {e.__class__.__name__} {e}")
+            raise
+        self.latencies.record(source.name, time.perf_counter() - start)
+        return answer
+
+    async def fetch(self, query: str) -> str:
+        if not self.sources:
+            raise ValueError("No research sources configured")
+        start = time.perf_counter()
+        try:
+            if self.mode == "merge" and len(self.sources) > 1:
+                return await self._fetch_merged(query)
+            if self.mode == "hedge" and len(self.sources) > 1:
+                return await self._fetch_hedged(query)
+            answer = await self._timed_fetch(self.sources[0], query)
+            self.wins[self.sources[0].name] += 1
+            return answer
+        finally:
+            self.total_latencies.append(time.perf_counter() - start)
+
+    async def _fetch_hedged(self, query: str) -> str:
+        tasks: dict[asyncio.Task, ResearchSource] = {}
+        remaining = list(self.sources)
+        last_error: BaseException | None = None
+        newest: ResearchSource | None = None
+        newest_started_at = 0.0
+
+        def start_next() -> None:
+            nonlocal newest, newest_started_at
+            newest = remaining.pop(0)
+            newest_started_at = time.perf_counter()
+            tasks[asyncio.create_task(self._timed_fetch(newest, query))] = newest
+
+        start_next()
+        try:
+            while tasks:
+                # Wait for an answer, or until the most recently started provider is due a backup. The
+                # delay counts from that provider's start, not from this wait, which may follow a failure
+                timeout = None
+                if remaining:
+                    elapsed = time.perf_counter() - newest_started_at
+                    timeout = max(0.0, self.hedge_delay(newest.name) - elapsed)
+                done, _ = await asyncio.wait(
+                    tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    self.hedges_started += 1
+                    logger.info(f"{newest.name} is slow, also asking {remaining[0].name}")
+                    start_next()
+                    continue
+                for task in done:
+                    source = tasks.pop(task)
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                    elif _is_good_answer(task.result()):
+                        self.wins[source.name] += 1
+                        return task.result()
+                    else:
+                        last_error = ValueError(f"Empty research from {source.name}")
+                if not tasks and remaining:
+                    start_next()
+        finally:
+            for task in tasks:
+                task.cancel()
+        raise last_error or ValueError("No research source returned an answer")
+
+    async def _fetch_merged(self, query: str) -> str:
+        answers = await asyncio.gather(
+            *[self._timed_fetch(source, query) for source in self.sources], return_exceptions=True
+        )
+        good = [
+            (source, answer)
+            for source, answer in zip(self.sources, answers)
+            if _is_good_answer(answer)
+        ]
+        if not good:
+            errors = [answer for answer in answers if isinstance(answer, BaseException)]
+            raise errors[0] if errors else ValueError("No research source returned an answer")
+        char_budget_per_source = self.token_budget * 4 // len(good)
+        merged = ""
+        for source, answer in good:
+            self.wins[source.name] += 1
+            if estimate_tokens(answer) * len(good) > self.token_budget:
+                answer = answer[:char_budget_per_source] + "\n[...truncated]"
+            merged += f"[Research from {source.name}]\n{answer}\n\n"
+        return merged
+
+    def summary(self) -> str:
+        latencies = sorted(self.total_latencies)
+        if latencies:
+            p50 = latencies[len(latencies) // 2]
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            timing = f"p50 {p50:.1f}s, p99 {p99:.1f}s over {len(latencies)} fetches"
+        else:
+            timing = "no fetches"
+        wins = ", ".join(f"{name} {count}" for name, count in self.wins.most_common()) or "none"
+        failures = ", ".join(f"{name} {count}" for name, count in self.failures.most_common()) or "none"
+        return (
+            f"Research ({self.mode} mode): {timing}, {self.hedges_started} backup requests started, "
+            f"answers from: {wins}, failures: {failures}"
+        )
@@ -0,0 +1,295 @@
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable
+
+from parse_answers_from_response import NUM_PATTERN, clean
+from rate_limiting import estimate_tokens
+from tracing import add_to_span, annotate, record_usage as record_span_usage
+
+logger = logging.getLogger(__name__)
+
+# A completion longer than this without finishing is treated as a runaway generation
+LLM_STREAM_MAX_CHARS = int(os.getenv("LLM_STREAM_MAX_CHARS", "60000"))
+LLM_STREAM_MAX_ATTEMPTS = int(os.getenv("LLM_STREAM_MAX_ATTEMPTS", "3"))
+
+_NUMBER = r"[+-]?\d+(?:\.\d+)?"
+
+
+@dataclass
+class AnswerFormat:
+    """
+    What the final answer of a completion looks like. `line` matches a (cleaned) valid answer line
+    and `placeholder` an answer line where the model echoed the template instead of a number.
+    """
+
+    name: str
+    line: re.Pattern
+    placeholder: re.Pattern
+    lines_expected: int = 1
+
+
+def binary_answer_format() -> AnswerFormat:
+    return AnswerFormat(
+        "binary",
+        re.compile(rf"^\W*probability:\W*{_NUMBER}\s*%"),
+        re.compile(r"^\W*probability:\W*(?:zz|xx)\b"),
+    )
+
+
+def percentile_answer_format(lines_expected: int) -> AnswerFormat:
+    return AnswerFormat(
+        "numeric",
+        NUM_PATTERN,
+        re.compile(r"^(?:percentile\s*)?\d{1,3}(?:\.\d+)?\s*:\s*(?:xx|x|\?)\s*$"),
+        lines_expected,
+    )
+
+
+def option_list_answer_format() -> AnswerFormat:
+    return AnswerFormat(
+        "multiple_choice",
+        re.compile(rf"probabilities:\s*\[\s*{_NUMBER}%?(?:\s*,\s*{_NUMBER}%?)*\s*\]"),
+        re.compile(r"probabilities:\s*\[\s*probability_"),
+    )
+
+
+def option_lines_answer_format(options: list[str]) -> AnswerFormat:
+    names = "|".join(re.escape(option.lower()) for option in options)
+    return AnswerFormat(
+        "multiple_choice",
+        re.compile(rf"^\W*(?:{names})\W*:\W*{_NUMBER}"),
+        re.compile(rf"^\W*(?:{names}|option_[a-z])\W*:\W*probability_"),
+        len(options),
+    )
+
+
+class MalformedCompletion(ValueError):
+    pass
+
+
+class IncrementalAnswerParser:
+    """
+    Follows a completion as it streams in, one finished line at a time. It records the answer
+    lines as they appear and flags output that cannot turn into a usable answer before the model
+    has finished: a template placeholder where the answer should be, a generation stuck
+    repeating itself, or one longer than `max_chars`.
+    """
+
+    def __init__(self, answer_format: AnswerFormat, max_chars: int = LLM_STREAM_MAX_CHARS) -> None:
+        self.answer_format = answer_format
+        self.max_chars = max_chars
+        self.chars = 0
+        self.answer_lines: list[str] = []
+        self.error: str | None = None
+        # The completion itself is kept by the caller; only the unfinished line and the window
+        # checked for repetition are kept here, so each chunk costs the same however long the text is
+        self._partial_line: list[str] = []
+        self._window = ""
+
+    @property
+    def complete(self) -> bool:
+        return len(self.answer_lines) >= self.answer_format.lines_expected
+
+    def _check_line(self, raw_line: str) -> None:
+        line = clean(raw_line)
+        if not line:
+            return
+        if self.answer_format.placeholder.search(line):
+            self.error = f"Template placeholder instead of an answer: {raw_line.strip()[:100]}"
+        elif self.answer_format.line.search(line):
+            if self.complete:
+                # A later answer block supersedes the earlier one
+                self.answer_lines = []
+            self.answer_lines.append(line)
+        elif self.answer_lines and not self.complete:
+            # The answer lines of a block are consecutive; start over at the next one
+            self.answer_lines = []
+
+    def _is_repeating(self) -> bool:
+        if self.chars < 2000:
+            return False
+        tail = self._window[-60:]
+        return self._window.count(tail) >= 6
+
+    def feed(self, chunk: str) -> None:
+        self.chars += len(chunk)
+        self._window = (self._window + chunk)[-1500:]
+        if "\n" not in chunk:
+            self._partial_line.append(chunk)
+        else:
+            lines = chunk.split("\n")
+            lines[0] = "".join(self._partial_line) + lines[0]
+            self._partial_line = [lines.pop()]
+            for line in lines:
+                if self.error is not None:
+                    break
+                self._check_line(line)
+        if self.error is None and self.chars > self.max_chars:
+            self.error = f"No answer after {self.max_chars} characters"
+        if self.error is None and self._is_repeating():
+            self.error = "Generation is repeating itself"
+
+    def finish(self) -> None:
+        line = "".join(self._partial_line)
+        self._partial_line = []
+        if self.error is None and line:
+            self._check_line(line)
+
+
+@dataclass
+class ModelStreamStats:
+    requests: int = 0
+    malformed: int = 0
+    ttft_seconds: list[float] = field(default_factory=list)
+    tokens_per_second: list[float] = field(default_factory=list)
+
+
+def _median(values: list[float]) -> float:
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2] if ordered else 0.0
+
+
+class StreamStats:
+    def __init__(self) -> None:
+        self.models: dict[str, ModelStreamStats] = defaultdict(ModelStreamStats)
+
+    def record(self, model: str, ttft: float | None, tokens: int, generation_seconds: float) -> None:
+        stats = self.models[model]
+        stats.requests += 1
+        if ttft is not None:
+            stats.ttft_seconds.append(ttft)
+        if generation_seconds > 0 and tokens > 0:
+            stats.tokens_per_second.append(tokens / generation_seconds)
+
+    def summary(self) -> str:
+        if not self.models:
+            return "Streaming: no streamed requests"
+        lines = ["Streaming:"]
+        for model, stats in sorted(self.models.items()):
+            lines.append(
+                f"- {model}: {stats.requests} requests, median time to first token "
+                f"{_median(stats.ttft_seconds):.2f}s, median {_median(stats.tokens_per_second):.0f} tokens/s, "
+                f"{stats.malformed} cut short as malformed"
+            )
+        return "\n".join(lines)
+
+
+stream_stats = StreamStats()
+
+
+async def _close(stream) -> None:
+    close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+    if close is None:
+        return
+    result = close()
+    if hasattr(result, "__await__"):
+        await result
+
+
+async def stream_choices(
+    stream,
+    model: str,
+    answer_format: AnswerFormat | None = None,
+    n: int = 1,
+    record_usage: Callable[[object, int], None] | None = None,
+) -> AsyncIterator[tuple[int, str | None, str | None]]:
+    """
+    Reads a chat completion stream of `n` choices (OpenAI SDK or litellm chunks) and yields
+    (choice index, text, error) for each choice once it has finished, or as soon as it is found to
+    be malformed, in which case text is None. The stream is closed once every choice is done, so a
+    malformed completion stops being generated (and billed) as soon as it is noticed.
+    `record_usage(usage, completions)` is called with the stream's usage, if it reports any.
+    """
+    start = time.perf_counter()
+    first_token_at: float | None = None
+    parsers: dict[int, IncrementalAnswerParser] = {}
+    parts: dict[int, list[str]] = defaultdict(list)
+    done: set[int] = set()
+    characters = 0
+    usage = None
+    completed = 0
+
+    def malformed(index: int, error: str) -> tuple[int, None, str]:
+        done.add(index)
+        parts.pop(index, None)
+        stream_stats.models[model].malformed += 1
+        add_to_span("malformed")
+        logger.info(f"Cutting short choice {index} from {model}: {error}")
+        return index, None, error
+
+    try:
+        async for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            for choice in chunk.choices or []:
+                index = choice.index or 0
+                if index in done:
+                    continue
+                parser = None
+                if answer_format is not None:
+                    parser = parsers.setdefault(index, IncrementalAnswerParser(answer_format))
+                content = choice.delta.content if choice.delta is not None else None
+                if content:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    characters += len(content)
+                    parts[index].append(content)
+                    if parser is not None:
+                        parser.feed(content)
+                        if parser.error is not None:
+                            yield malformed(index, parser.error)
+                            continue
+                if choice.finish_reason is not None:
+                    if parser is not None:
+                        parser.finish()
+                        if parser.error is not None:
+                            yield malformed(index, parser.error)
+                            continue
+                    done.add(index)
+                    completed += 1
+                    yield index, "".join(parts.pop(index, [])), None
+            if len(done) >= n and completed < n:
+                # Only cut-short choices are left unread; a stream that finished normally is read to
+                # its end, where the usage is reported
+                break
+    finally:
+        await _close(stream)
+        end = time.perf_counter()
+        ttft = first_token_at - start if first_token_at is not None else None
+        tokens = getattr(usage, "completion_tokens", None) or estimate_tokens("x" * characters)
+        if record_usage is not None:
+            record_usage(usage, completed)
+        record_span_usage(model, usage if usage is not None else {"completion_tokens": tokens})
+        if ttft is not None:
+            annotate(ttft=ttft)
+        stream_stats.record(model, ttft, tokens, end - (first_token_at or end))
+
+
+async def stream_completion(
+    create_stream: Callable[[], Awaitable],
+    model: str,
+    answer_format: AnswerFormat | None = None,
+    max_attempts: int = LLM_STREAM_MAX_ATTEMPTS,
+    record_usage: Callable[[object, int], None] | None = None,
+) -> str:
+    """
+    Streams a single completion, starting over right away if it turns out to be malformed.
+    """
+    last_error = "no attempts made"
+    for attempt in range(1, max_attempts + 1):
+        stream = await create_stream()
+        choices = stream_choices(stream, model, answer_format, record_usage=record_usage)
+        try:
+            async for _, text, error in choices:
+                if text:
+                    return text
+                last_error = error or "empty completion"
+                break
+        finally:
+            await choices.aclose()
+        logger.info(f"Streamed completion from {model} was malformed ({last_error}), attempt {attempt}/{max_attempts}")
+    raise MalformedCompletion(f"{model} gave no usable completion in {max_attempts} attempts: {last_error}")
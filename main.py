@@ -1,17 +1,19 @@
 import argparse
 import asyncio
 import logging
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Literal
+from typing import Awaitable, Callable, Iterator, Literal, Sequence
 import prompts
 
 from forecasting_tools import (
-    AskNewsSearcher,
     BinaryQuestion,
     ForecastBot,
+    ForecastReport,
     GeneralLlm,
     MetaculusApi,
     MetaculusQuestion,
+    MonetaryCostManager,
     MultipleChoiceQuestion,
     NumericDistribution,
     NumericQuestion,
@@ -19,16 +21,133 @@ from forecasting_tools import (
     BinaryPrediction,
     PredictedOptionList,
     ReasonedPrediction,
-    SmartSearcher,
     clean_indents,
     structure_output,
 )
-import re, os, requests
+import re, os
+
+from adaptive_sampling import (
+    ADAPTIVE_SAMPLING,
+    Convergence,
+    adaptive_sampling_stats,
+    binary_convergence,
+    cdf_convergence,
+    option_convergence,
+    sample_adaptively,
+)
+from client_registry import clients
+from forecast_state import ForecastStateStore, digest, question_input_hash
+from hedging import HedgedResearcher, ResearchSource
+from llm_streaming import (
+    AnswerFormat,
+    binary_answer_format,
+    option_list_answer_format,
+    percentile_answer_format,
+    stream_stats,
+)
+from forecast_parsing import (
+    parse_binary_with_regex,
+    parse_option_list_with_regex,
+    parse_percentiles_with_regex,
+    parse_tier_summary,
+    tiered_parse,
+)
+from prompt_caching import PromptSampler
+from rate_limiting import rate_limiters
+from research import perplexity_fetcher
+from research_compaction import RESEARCH_COMPACTION_SUMMARIZE, ResearchCompactor
+from research_store import ResearchStore
+from response_cache import ResponseCache, SqliteCacheBackend, cached_invoke
+from scheduler import ConcurrencyScheduler, ProviderLimits
+from tracing import Span, add_to_span, tracer
 
 logger = logging.getLogger(__name__)
 
-ENABLE_LOGGING=False
-LOGGING_DIR="/Users/sahil/Desktop/data/metaculus/minibench_live"
+# Caches query generations, research and predictions keyed on prompt, model and sampling params
+ENABLE_RESPONSE_CACHE=False
+RESPONSE_CACHE_PATH=os.getenv("RESPONSE_CACHE_PATH", ".cache/responses.sqlite3")
+RESPONSE_CACHE_TTL_SECONDS=7 * 24 * 60 * 60
+
+response_cache = ResponseCache(
+    SqliteCacheBackend(RESPONSE_CACHE_PATH, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS)
+    if ENABLE_RESPONSE_CACHE
+    else None
+)
+perplexity_fetcher.cache = response_cache
+
+# Concurrency is sized from per-provider limits (see scheduler.ProviderLimits for the env overrides)
+provider_limits = ProviderLimits.from_env(predictions_per_question=5)
+scheduler = ConcurrencyScheduler(provider_limits)
+perplexity_fetcher.max_concurrent_requests = provider_limits.perplexity
+# Forecast prompts are sent as a cacheable prefix plus a short suffix; see prompt_caching.PromptSampler
+prompt_sampler = PromptSampler(response_cache, limit=lambda: scheduler.limit("forecaster"))
+
+# In incremental mode only questions that are new, changed or whose forecast is older than FORECAST_MAX_AGE_HOURS
+# are forecast again when running on tournaments (this replaces skip_previously_forecasted_questions)
+INCREMENTAL_MODE=os.getenv("INCREMENTAL_MODE", "false").lower() == "true"
+FORECAST_MAX_AGE_HOURS=float(os.getenv("FORECAST_MAX_AGE_HOURS", "72"))
+forecast_state = (
+    ForecastStateStore(max_age_seconds=FORECAST_MAX_AGE_HOURS * 60 * 60)
+    if INCREMENTAL_MODE
+    else None
+)
+research_digests: dict[int, str] = {}
+
+
+@contextmanager
+def _traced_llm_call(stage: str, model: str) -> Iterator[Span]:
+    """
+    A span for a call made through forecasting_tools, which reports its cost to MonetaryCostManager
+    rather than returning token usage.
+    """
+    with tracer.span(stage, model=model) as span, MonetaryCostManager() as cost_manager:
+        try:
+            yield span
+        finally:
+            span.add("cost", cost_manager.current_usage)
+
+
+async def _asknews_answer(query: str) -> str:
+    return await clients.asknews_searcher().get_formatted_news_async(query)
+
+
+async def _smart_searcher_answer(query: str) -> str:
+    searcher = clients.smart_searcher("openrouter/openai/o4-mini-high", num_searches_to_run=2, num_sites_per_search=10)
+    with MonetaryCostManager() as cost_manager:
+        answer = await searcher.invoke(query)
+    # Recorded on the hedger's "smart_searcher" span
+    add_to_span("cost", cost_manager.current_usage)
+    return answer
+
+
+# Perplexity answers each search query; AskNews or SmartSearcher (Exa) back it up when it is slow (see hedging.RESEARCH_MODE)
+research_sources = [ResearchSource("perplexity", perplexity_fetcher.fetch_answer)]
+if os.getenv("ASKNEWS_CLIENT_ID") and os.getenv("ASKNEWS_SECRET"):
+    research_sources.append(ResearchSource("asknews", _asknews_answer))
+if os.getenv("EXA_API_KEY"):
+    research_sources.append(ResearchSource("smart_searcher", _smart_searcher_answer))
+research_hedger = HedgedResearcher(research_sources)
+async def _summarize_research(research: str, token_budget: int) -> str:
+    llm = clients.general_llm("openrouter/openai/o4-mini-high")
+    async with scheduler.limit("forecaster"):
+        with _traced_llm_call("research_summary", llm.model):
+            return await cached_invoke(
+                response_cache, llm, prompts.get_research_summarization_prompt(research, token_budget), kind="research_summary"
+            )
+
+
+research_compactor = ResearchCompactor(summarize=_summarize_research if RESEARCH_COMPACTION_SUMMARIZE else None)
+# Serves near-duplicate search queries (e.g. from sibling questions) from research already done this run
+research_store = ResearchStore()
+
+
+def _question_input_hash(question: MetaculusQuestion) -> str:
+    return question_input_hash(
+        question.question_text,
+        question.background_info,
+        question.resolution_criteria,
+        question.fine_print,
+    )
 
 
 class FallTemplateBot2025(ForecastBot):
@@ -59,6 +178,8 @@ class FallTemplateBot2025(ForecastBot):
     though you may want to override other ones.
     In this example, you can change the prompts to be whatever you want since,
     structure_output uses an LLMto intelligently reformat the output into the needed structure.
+    The regex parsers in parse_answers_from_response.py are tried first (see forecast_parsing.tiered_parse),
+    so the parser LLM is only called when they fail to find or validate an answer.
 
     By default (i.e. 'tournament' mode), when you run this script, it will forecast on any open questions for the
     MiniBench and Seasonal AIB tournaments. If you want to forecast on only one or the other, you can remove one
@@ -106,119 +227,214 @@ class FallTemplateBot2025(ForecastBot):
     Additionally OpenRouter has large rate limits immediately on account creation
     """
 
-    _max_concurrent_questions = (
-        1  # Set this to whatever works for your search-provider/ai-model rate limits
-    )
-    _concurrency_limiter = asyncio.Semaphore(_max_concurrent_questions)
+    async def forecast_on_tournaments(
+        self, tournament_ids: list[int | str], return_exceptions: bool = True
+    ):
+        # Forecast every tournament's questions in one event loop so one slow question doesn't hold up the others
+        questions: list[MetaculusQuestion] = []
+        seen_question_ids = set()
+        with tracer.span("load", tournaments=len(tournament_ids)) as span:
+            for tournament_id in tournament_ids:
+                for question in MetaculusApi.get_all_open_questions_from_tournament(tournament_id):
+                    if question.id_of_question not in seen_question_ids:
+                        seen_question_ids.add(question.id_of_question)
+                        questions.append(question)
+            span.set(questions=len(questions))
+        skip_previously_forecasted_questions = self.skip_previously_forecasted_questions
+        if forecast_state is not None:
+            questions = self._questions_to_reforecast(questions)
+            # Changed and stale questions have been forecast before, so they must not be skipped
+            skip_previously_forecasted_questions = False
+        logger.info(
+            f"Forecasting {len(questions)} questions with up to {scheduler.max_concurrent_questions} researching concurrently"
+        )
+        return await self.forecast_questions(
+            questions, return_exceptions, skip_previously_forecasted_questions=skip_previously_forecasted_questions
+        )
+
+    async def forecast_questions(
+        self,
+        questions: Sequence[MetaculusQuestion],
+        return_exceptions: bool = False,
+        skip_previously_forecasted_questions: bool | None = None,
+    ) -> list[ForecastReport] | list[ForecastReport | BaseException]:
+        """
+        ForecastBot.forecast_questions, except that whether previously forecasted questions are skipped
+        can be given per call. It defaults to the bot's skip_previously_forecasted_questions.
+        """
+        if skip_previously_forecasted_questions is None:
+            skip_previously_forecasted_questions = self.skip_previously_forecasted_questions
+        if skip_previously_forecasted_questions:
+            unforecasted_questions = [question for question in questions if not question.already_forecasted]
+            if len(questions) != len(unforecasted_questions):
+                logger.info(f"Skipping {len(questions) - len(unforecasted_questions)} previously forecasted questions")
+            questions = unforecasted_questions
+        reports = await asyncio.gather(
+            *[self._run_individual_question_with_error_propagation(question) for question in questions],
+            return_exceptions=return_exceptions,
+        )
+        if self.folder_to_save_reports_to:
+            non_exception_reports = [report for report in reports if not isinstance(report, BaseException)]
+            file_path = self._create_file_path_to_save_to(list(questions))
+            ForecastReport.save_object_list_to_file_path(non_exception_reports, file_path)
+        return reports
+
+    def _questions_to_reforecast(self, questions: list[MetaculusQuestion]) -> list[MetaculusQuestion]:
+        assert forecast_state is not None
+        selected = []
+        for question in questions:
+            input_hash = _question_input_hash(question)
+            reason = forecast_state.reason_to_forecast(question.id_of_question, input_hash)
+            if reason == "new" and question.already_forecasted:
+                # Seed the store with forecasts made before incremental mode was turned on; they are redone once stale
+                forecast_state.record_forecast(question.id_of_question, input_hash, None)
+            elif reason is not None:
+                selected.append(question)
+        logger.info(
+            f"Incremental mode: re-forecasting {len(selected)} of {len(questions)} questions"
+        )
+        return selected
+
+    async def _run_individual_question(self, question: MetaculusQuestion):
+        # Every span of the question's research, samples, parsing and submission belongs to this trace
+        with tracer.span("question", question_id=question.id_of_question, url=question.page_url):
+            report = await super()._run_individual_question(question)
+        # A dry run publishes nothing, so it must not stop a later real run from forecasting the question
+        if forecast_state is not None and self.publish_reports_to_metaculus:
+            forecast_state.record_forecast(
+                question.id_of_question,
+                _question_input_hash(question),
+                research_digests.get(question.id_of_question),
+            )
+        return report
 
     async def run_research(self, question: MetaculusQuestion) -> str:
         # Here, we will first generate the search prompts, then search for each of them and then stitch them together as research
-        async with self._concurrency_limiter:
-            # Generate search query prompts
-            search_query_generation_filename = f'{LOGGING_DIR}/search_query_generation/{question.id_of_question}.txt'
-            if ENABLE_LOGGING and os.path.exists(search_query_generation_filename):
-                search_query_generation_response = open(search_query_generation_filename).read()
-            else:
+        async with scheduler.limit("questions"):
+            with tracer.span("research"):
+                # Generate search query prompts
                 search_query_generation_prompt = prompts.get_search_query_generation_prompt(question.to_json())
-                llm = GeneralLlm(model="openrouter/openai/o4-mini-high")
-                search_query_generation_response = await llm.invoke(search_query_generation_prompt)
-                if ENABLE_LOGGING:
-                    with open(search_query_generation_filename, 'w') as f:
-                        f.write(search_query_generation_response)
-                
-            search_queries_block = re.search(r'(?:Search queries:)(.*)', search_query_generation_response, re.DOTALL | re.IGNORECASE)
-            assert search_queries_block
-            queries_text = search_queries_block.group(1).strip()
-            current_queries = [question.question_text]
-            for query in queries_text.split('\n'):
-                query = '. '.join(query.split('. ')[1:])
-                if len(query) > 5:
-                    current_queries.append(query)
-
-            # Search on perplexity for these queries
-            research_filename = f'{LOGGING_DIR}/perplexity_search_response/{question.id_of_question}.txt'
-            if ENABLE_LOGGING and os.path.exists(research_filename):
-                research = open(research_filename).read()
-            else:
-                current_responses = []
-                PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
-                for search_query in current_queries:
-                    url = "https://api.perplexity.ai/chat/completions"
-                    payload = {
-                        "model": "sonar",
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": "Be thorough and detailed. Be objective in your analysis, proving documented facts only. Cite all sources with names and dates."
-                            },
-                            {
-                                "role": "user",
-                                "content": search_query + " Cite all sources with names and dates, compiling a list of sources at the end. Be objective in your analysis, providing documented facts only."
-                            }
-                        ]
-                    }
-                    headers = {
-                        "accept": "application/json",
-                        "content-type": "application/json",
-                        "authorization": f"Bearer {PERPLEXITY_API_KEY}"
-                    }
-                    
-                    resp = requests.post(url, json=payload, headers=headers, timeout=800)
-                    resp.raise_for_status()
-                    data = resp.json()
-                    content = data['choices'][0]['message']['content']
-                    content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL)
-                    current_responses.append(content)
-                
+                llm = clients.general_llm("openrouter/openai/o4-mini-high")
+                async with scheduler.limit("forecaster"):
+                    with _traced_llm_call("query_generation", llm.model):
+                        search_query_generation_response = await cached_invoke(
+                            response_cache, llm, search_query_generation_prompt, kind="search_query_generation"
+                        )
+
+                search_queries_block = re.search(r'(?:Search queries:)(.*)', search_query_generation_response, re.DOTALL | re.IGNORECASE)
+                assert search_queries_block
+                queries_text = search_queries_block.group(1).strip()
+                current_queries = [question.question_text]
+                for query in queries_text.split('\n'):
+                    query = '. '.join(query.split('. ')[1:])
+                    if len(query) > 5:
+                        current_queries.append(query)
+
+                # Search for these queries concurrently, backing up slow Perplexity requests with the other providers
+                current_responses = await asyncio.gather(
+                    *[research_store.get_or_fetch(query, research_hedger.fetch) for query in current_queries]
+                )
+
                 research = ""
-                for question, answer in zip(current_queries, current_responses):
-                    research += f"<Question>: {question}\n"
+                for query, answer in zip(current_queries, current_responses):
+                    research += f"<Question>: {query}\n"
                     research += f"<Answer>: {answer}\n<End of Answer>\n\n"
-                if ENABLE_LOGGING:
-                    with open(research_filename, 'w') as f:
-                        f.write(research)
+                research_digests[question.id_of_question] = digest(research)
+
+                # The research goes into every prediction prompt, so fit it to the token budget once here
+                compacted, _ = await research_compactor.compact(research, label=question.page_url)
+                return compacted
+
+    async def _sample_prediction(self, prefix: str, suffix: str, answer_format: AnswerFormat) -> str:
+        # The predictions_per_research_report forecasts of a question share one batch of samples
+        llm = clients.general_llm("openrouter/openai/gpt-5.2")
+        with tracer.span("forecast_sample", model=llm.model, samples=1):
+            return await prompt_sampler.take(
+                llm, prefix, suffix, n=provider_limits.predictions_per_question, answer_format=answer_format
+            )
 
-            return research
+    async def _ensemble_prediction(
+        self,
+        question: MetaculusQuestion,
+        prefix: str,
+        suffix: str,
+        parse: Callable[[str], Awaitable[ReasonedPrediction]],
+        answer_format: AnswerFormat,
+        convergence: Convergence,
+        value_of: Callable[[ReasonedPrediction], object],
+    ) -> ReasonedPrediction:
+        """
+        With ADAPTIVE_SAMPLING the bot makes one prediction per research report, and that prediction
+        is itself an ensemble of up to predictions_per_question samples, drawn in waves until they agree.
+        """
+        if not ADAPTIVE_SAMPLING:
+            return await parse(await self._sample_prediction(prefix, suffix, answer_format))
+        llm = clients.general_llm("openrouter/openai/gpt-5.2")
+
+        async def draw(count: int) -> list[ReasonedPrediction]:
+            with tracer.span("forecast_sample", model=llm.model, samples=count):
+                responses = await prompt_sampler.sample_batch(llm, prefix, suffix, count, answer_format)
+            return list(await asyncio.gather(*[parse(response) for response in responses]))
+
+        predictions = await sample_adaptively(
+            draw, value_of, convergence, provider_limits.predictions_per_question, label=question.page_url
+        )
+        if len(predictions) == 1:
+            return predictions[0]
+        aggregate = await self._aggregate_predictions(
+            [prediction.prediction_value for prediction in predictions], question
+        )
+        reasoning = "\n\n".join(
+            f"Sample {index + 1} of {len(predictions)}:\n{prediction.reasoning}"
+            for index, prediction in enumerate(predictions)
+        )
+        return ReasonedPrediction(prediction_value=aggregate, reasoning=reasoning)
+
+    async def _structure_output(self, text: str, output_type, additional_instructions: str | None = None):
+        # Slow path of tiered_parse: only used when the regex parsers fail
+        parser_llm = self.get_llm("parser", "llm")
+        async with scheduler.limit("parser"):
+            with _traced_llm_call("parser", parser_llm.model):
+                return await structure_output(
+                    text_to_structure=text,
+                    output_type=output_type,
+                    model=parser_llm,
+                    additional_instructions=additional_instructions,
+                )
 
     async def _run_forecast_on_binary(
         self, question: BinaryQuestion, research: str
     ) -> ReasonedPrediction[float]:
-        prediction_filename = f"{LOGGING_DIR}/predictions/{question.id_of_question}.txt"
-        if ENABLE_LOGGING and os.path.exists(prediction_filename):
-            prediction_response = open(prediction_filename).read()
-        else:
-            prompt = prompts.get_binary_prompt_with_research(question=question.to_json(), research=research)
-            llm = GeneralLlm(model="openrouter/openai/gpt-5.2")
-            prediction_response = await llm.invoke(prompt)
-            if ENABLE_LOGGING:
-                with open(prediction_filename, 'w') as f:
-                    f.write(prediction_response)
-
-        logger.info(f"Reasoning for URL {question.page_url}: {prediction_response}")
-        binary_prediction: BinaryPrediction = await structure_output(
-            prediction_response, BinaryPrediction, model=self.get_llm("parser", "llm")
-        )
-        decimal_pred = max(0.01, min(0.99, binary_prediction.prediction_in_decimal))
+        prefix, suffix = prompts.get_binary_prompt_parts_with_research(question=question.to_json(), research=research)
 
+        async def parse(prediction_response: str) -> ReasonedPrediction[float]:
+            logger.info(f"Reasoning for URL {question.page_url}: {prediction_response}")
+            binary_prediction: BinaryPrediction = await tiered_parse(
+                "binary",
+                lambda: parse_binary_with_regex(prediction_response),
+                lambda: self._structure_output(prediction_response, BinaryPrediction),
+            )
+            decimal_pred = max(0.01, min(0.99, binary_prediction.prediction_in_decimal))
+            return ReasonedPrediction(prediction_value=decimal_pred, reasoning=prediction_response)
+
+        prediction = await self._ensemble_prediction(
+            question,
+            prefix,
+            suffix,
+            parse,
+            binary_answer_format(),
+            binary_convergence(),
+            lambda p: p.prediction_value,
+        )
         logger.info(
-            f"Forecasted URL {question.page_url} with prediction: {decimal_pred}"
+            f"Forecasted URL {question.page_url} with prediction: {prediction.prediction_value}"
         )
-        return ReasonedPrediction(prediction_value=decimal_pred, reasoning=prediction_response)
+        return prediction
 
     async def _run_forecast_on_multiple_choice(
         self, question: MultipleChoiceQuestion, research: str
     ) -> ReasonedPrediction[PredictedOptionList]:
-        prediction_filename = f"{LOGGING_DIR}/predictions/{question.id_of_question}.txt"
-        if ENABLE_LOGGING and os.path.exists(prediction_filename):
-            prediction_response = open(prediction_filename).read()
-        else:
-            prompt = prompts.get_multiple_choice_prompt_with_research(question=question.to_json(), research=research)
-            llm = GeneralLlm(model="openrouter/openai/gpt-5.2")
-            prediction_response = await llm.invoke(prompt)
-            if ENABLE_LOGGING:
-                with open(prediction_filename, 'w') as f:
-                    f.write(prediction_response)
-
+        prefix, suffix = prompts.get_multiple_choice_prompt_parts_with_research(question=question.to_json(), research=research)
         parsing_instructions = clean_indents(
             f"""
             Make sure that all option names are one of the following:
@@ -226,43 +442,69 @@ class FallTemplateBot2025(ForecastBot):
             The text you are parsing may prepend these options with some variation of "Option" which you should remove if not part of the option names I just gave you.
             """
         )
-        logger.info(f"Reasoning for URL {question.page_url}: {prediction_response}")
-        predicted_option_list: PredictedOptionList = await structure_output(
-            text_to_structure=prediction_response,
-            output_type=PredictedOptionList,
-            model=self.get_llm("parser", "llm"),
-            additional_instructions=parsing_instructions,
+
+        async def parse(prediction_response: str) -> ReasonedPrediction[PredictedOptionList]:
+            logger.info(f"Reasoning for URL {question.page_url}: {prediction_response}")
+            predicted_option_list: PredictedOptionList = await tiered_parse(
+                "multiple_choice",
+                lambda: parse_option_list_with_regex(prediction_response, question.options),
+                lambda: self._structure_output(
+                    prediction_response, PredictedOptionList, parsing_instructions
+                ),
+            )
+            return ReasonedPrediction(
+                prediction_value=predicted_option_list, reasoning=prediction_response
+            )
+
+        def option_probabilities(prediction: ReasonedPrediction[PredictedOptionList]) -> list[float]:
+            probabilities = {
+                option.option_name: option.probability
+                for option in prediction.prediction_value.predicted_options
+            }
+            return [probabilities.get(option, 0.0) for option in question.options]
+
+        prediction = await self._ensemble_prediction(
+            question,
+            prefix,
+            suffix,
+            parse,
+            option_list_answer_format(),
+            option_convergence(),
+            option_probabilities,
         )
         logger.info(
-            f"Forecasted URL {question.page_url} with prediction: {predicted_option_list}"
-        )
-        return ReasonedPrediction(
-            prediction_value=predicted_option_list, reasoning=prediction_response
+            f"Forecasted URL {question.page_url} with prediction: {prediction.prediction_value}"
         )
+        return prediction
 
     async def _run_forecast_on_numeric(
         self, question: NumericQuestion, research: str
     ) -> ReasonedPrediction[NumericDistribution]:
-        prediction_filename = f"{LOGGING_DIR}/predictions/{question.id_of_question}.txt"
-        if ENABLE_LOGGING and os.path.exists(prediction_filename):
-            prediction_response = open(prediction_filename).read()
-        else:
-            prompt = prompts.get_numeric_prompt_with_research(question=question.to_json(), research=research)
-            llm = GeneralLlm(model="openrouter/openai/gpt-5.2")
-            prediction_response = await llm.invoke(prompt)
-            if ENABLE_LOGGING:
-                with open(prediction_filename, 'w') as f:
-                    f.write(prediction_response)
-
-        logger.info(f"Reasoning for URL {question.page_url}: {prediction_response}")
-        percentile_list: list[Percentile] = await structure_output(
-            prediction_response, list[Percentile], model=self.get_llm("parser", "llm")
+        prefix, suffix = prompts.get_numeric_prompt_parts_with_research(question=question.to_json(), research=research)
+
+        async def parse(prediction_response: str) -> ReasonedPrediction[NumericDistribution]:
+            logger.info(f"Reasoning for URL {question.page_url}: {prediction_response}")
+            percentile_list: list[Percentile] = await tiered_parse(
+                "numeric",
+                lambda: parse_percentiles_with_regex(prediction_response),
+                lambda: self._structure_output(prediction_response, list[Percentile]),
+            )
+            prediction = NumericDistribution.from_question(percentile_list, question)
+            return ReasonedPrediction(prediction_value=prediction, reasoning=prediction_response)
+
+        prediction = await self._ensemble_prediction(
+            question,
+            prefix,
+            suffix,
+            parse,
+            percentile_answer_format(12),
+            cdf_convergence(),
+            lambda p: [point.percentile for point in p.prediction_value.cdf],
         )
-        prediction = NumericDistribution.from_question(percentile_list, question)
         logger.info(
-            f"Forecasted URL {question.page_url} with prediction: {prediction.declared_percentiles}"
+            f"Forecasted URL {question.page_url} with prediction: {prediction.prediction_value.declared_percentiles}"
         )
-        return ReasonedPrediction(prediction_value=prediction, reasoning=prediction_response)
+        return prediction
 
 if __name__ == "__main__":
     logging.basicConfig(
@@ -295,7 +537,8 @@ if __name__ == "__main__":
 
     template_bot = FallTemplateBot2025(
         research_reports_per_question=1,
-        predictions_per_research_report=5,
+        # With adaptive sampling each prediction is already an ensemble of up to predictions_per_question samples
+        predictions_per_research_report=1 if ADAPTIVE_SAMPLING else provider_limits.predictions_per_question,
         use_research_summary_to_forecast=False,
         publish_reports_to_metaculus=True,
         folder_to_save_reports_to=None,
@@ -314,24 +557,26 @@ if __name__ == "__main__":
     )
 
     if run_mode == "tournament":
-        seasonal_tournament_reports = asyncio.run(
-            template_bot.forecast_on_tournament(
-                MetaculusApi.CURRENT_AI_COMPETITION_ID, return_exceptions=True
-            )
-        )
-        minibench_reports = asyncio.run(
-            template_bot.forecast_on_tournament(
-                MetaculusApi.CURRENT_MINIBENCH_ID, return_exceptions=True
+        forecast_reports = asyncio.run(
+            clients.closing(
+                template_bot.forecast_on_tournaments(
+                    [
+                        MetaculusApi.CURRENT_AI_COMPETITION_ID,
+                        MetaculusApi.CURRENT_MINIBENCH_ID,
+                    ],
+                    return_exceptions=True,
+                )
             )
         )
-        forecast_reports = seasonal_tournament_reports + minibench_reports
     elif run_mode == "metaculus_cup":
         # The Metaculus cup is a good way to test the bot's performance on regularly open questions. You can also use AXC_2025_TOURNAMENT_ID = 32564 or AI_2027_TOURNAMENT_ID = "ai-2027"
         # The Metaculus cup may not be initialized near the beginning of a season (i.e. January, May, September)
         template_bot.skip_previously_forecasted_questions = False
         forecast_reports = asyncio.run(
-            template_bot.forecast_on_tournament(
-                MetaculusApi.CURRENT_METACULUS_CUP_ID, return_exceptions=True
+            clients.closing(
+                template_bot.forecast_on_tournament(
+                    MetaculusApi.CURRENT_METACULUS_CUP_ID, return_exceptions=True
+                )
             )
         )
     elif run_mode == "test_questions":
@@ -348,6 +593,19 @@ if __name__ == "__main__":
             for question_url in EXAMPLE_QUESTIONS
         ]
         forecast_reports = asyncio.run(
-            template_bot.forecast_questions(questions, return_exceptions=True)
+            clients.closing(
+                template_bot.forecast_questions(questions, return_exceptions=True)
+            )
         )
     template_bot.log_report_summary(forecast_reports)
+    logger.info(response_cache.stats_summary())
+    logger.info(rate_limiters.summary())
+    logger.info(clients.summary())
+    logger.info(research_hedger.summary())
+    logger.info(research_store.summary())
+    logger.info(research_compactor.summary())
+    logger.info(prompt_sampler.summary())
+    logger.info(stream_stats.summary())
+    logger.info(f"Traces:\n{tracer.summary()}")
+    logger.info(adaptive_sampling_stats.summary())
+    logger.info(parse_tier_summary())
@@ -3,16 +3,62 @@ import datetime
 import json
 import os
 import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable
 
 import dotenv
 
 dotenv.load_dotenv()
 
 import forecasting_tools
+import httpx
 import numpy as np
 import requests
-from asknews_sdk import AskNewsSDK
-from openai import AsyncOpenAI
+from asknews_sdk import AsyncAskNewsSDK
+
+from adaptive_sampling import (
+    adaptive_sampling_stats,
+    binary_convergence,
+    cdf_convergence,
+    option_convergence,
+    sample_adaptively,
+)
+from aggregation import (
+    BINARY_AGGREGATION,
+    MULTIPLE_CHOICE_AGGREGATION,
+    NUMERIC_AGGREGATION,
+    aggregate_cdfs,
+    aggregate_option_probabilities,
+    aggregate_probabilities,
+    enforce_cdf_constraints,
+    interp_rows,
+)
+from client_registry import clients
+from forecast_state import ForecastStateStore, digest, question_input_hash
+from hedging import HedgedResearcher, ResearchSource
+from llm_streaming import (
+    AnswerFormat,
+    binary_answer_format,
+    option_lines_answer_format,
+    percentile_answer_format,
+    stream_choices,
+    stream_completion,
+    stream_stats,
+)
+from pipeline import Pipeline, Stage
+from prompt_caching import PromptCacheStats
+import prompts
+from rate_limiting import (
+    call_with_backoff,
+    call_with_backoff_blocking,
+    estimate_tokens,
+    raise_for_retryable_status,
+    rate_limiters,
+)
+from research_compaction import RESEARCH_COMPACTION_SUMMARIZE, ResearchCompactor
+from research_store import ResearchStore
+from tracing import add_to_span, new_trace_id, record_usage, tracer
 
 
 """
@@ -44,8 +90,12 @@ with this file it may be worth double checking key components locally.
 # Constants
 SUBMIT_PREDICTION = True  # set to True to publish your predictions to Metaculus
 USE_EXAMPLE_QUESTIONS = False  # set to True to forecast example questions rather than the tournament questions
-NUM_RUNS_PER_QUESTION = 5  # The median forecast is taken between NUM_RUNS_PER_QUESTION runs
+NUM_RUNS_PER_QUESTION = 5  # The forecast is aggregated (see aggregation.py) over up to NUM_RUNS_PER_QUESTION runs (fewer if the first runs agree, see adaptive_sampling.py)
 SKIP_PREVIOUSLY_FORECASTED_QUESTIONS = True
+# In incremental mode only questions that are new, changed or whose forecast is older than FORECAST_MAX_AGE_HOURS
+# are forecast again (this replaces SKIP_PREVIOUSLY_FORECASTED_QUESTIONS). State is kept in forecast_state.py's store.
+INCREMENTAL_MODE = os.getenv("INCREMENTAL_MODE", "false").lower() == "true"
+FORECAST_MAX_AGE_HOURS = float(os.getenv("FORECAST_MAX_AGE_HOURS", "72"))
 
 # Environment variables
 # You only need *either* Exa or Perplexity or AskNews keys for online research
@@ -55,6 +105,10 @@ ASKNEWS_CLIENT_ID = os.getenv("ASKNEWS_CLIENT_ID")
 ASKNEWS_SECRET = os.getenv("ASKNEWS_SECRET")
 EXA_API_KEY = os.getenv("EXA_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") # You'll also need the OpenAI API Key if you want to use the Exa Smart Searcher
+# Base URLs can be pointed at a local replay server (see replay.py); the OpenAI SDK reads OPENAI_BASE_URL itself
+PERPLEXITY_API_BASE_URL = os.getenv("PERPLEXITY_API_BASE_URL", "https://api.perplexity.ai")
+ASKNEWS_API_BASE_URL = os.getenv("ASKNEWS_API_BASE_URL", "https://api.asknews.app")
+ASKNEWS_TOKEN_URL = os.getenv("ASKNEWS_TOKEN_URL", "https://auth.asknews.app/oauth2/token")
 
 # The tournament IDs below can be used for testing your bot.
 Q4_2024_AI_BENCHMARKING_ID = 32506
@@ -84,7 +138,7 @@ EXAMPLE_QUESTIONS = [  # (question_id, post_id)
 
 # @title Helper functions
 AUTH_HEADERS = {"headers": {"Authorization": f"Token {METACULUS_TOKEN}"}}
-API_BASE_URL = "https://www.metaculus.com/api"
+API_BASE_URL = os.getenv("METACULUS_API_BASE_URL", "https://www.metaculus.com/api")
 
 
 def post_question_comment(post_id: int, comment_text: str) -> None:
@@ -92,17 +146,22 @@ def post_question_comment(post_id: int, comment_text: str) -> None:
     Post a comment on the question page as the bot user.
     """
 
-    response = requests.post(
-        f"{API_BASE_URL}/comments/create/",
-        json={
-            "text": comment_text,
-            "parent": None,
-            "included_forecast": True,
-            "is_private": True,
-            "on_post": post_id,
-        },
-        **AUTH_HEADERS,  # type: ignore
-    )
+    def send_request() -> requests.Response:
+        response = requests.post(
+            f"{API_BASE_URL}/comments/create/",
+            json={
+                "text": comment_text,
+                "parent": None,
+                "included_forecast": True,
+                "is_private": True,
+                "on_post": post_id,
+            },
+            **AUTH_HEADERS,  # type: ignore
+        )
+        raise_for_retryable_status(response)
+        return response
+
+    response = call_with_backoff_blocking("metaculus", send_request)
     if not response.ok:
         raise RuntimeError(response.text)
 
@@ -112,16 +171,22 @@ def post_question_prediction(question_id: int, forecast_payload: dict) -> None:
     Post a forecast on a question.
     """
     url = f"{API_BASE_URL}/questions/forecast/"
-    response = requests.post(
-        url,
-        json=[
-            {
-                "question": question_id,
-                **forecast_payload,
-            },
-        ],
-        **AUTH_HEADERS,  # type: ignore
-    )
+
+    def send_request() -> requests.Response:
+        response = requests.post(
+            url,
+            json=[
+                {
+                    "question": question_id,
+                    **forecast_payload,
+                },
+            ],
+            **AUTH_HEADERS,  # type: ignore
+        )
+        raise_for_retryable_status(response)
+        return response
+
+    response = call_with_backoff_blocking("metaculus", send_request)
     print(f"Prediction Post status code: {response.status_code}")
     if not response.ok:
         raise RuntimeError(response.text)
@@ -160,13 +225,164 @@ def create_forecast_payload(
     }
 
 
-def list_posts_from_tournament(
-    tournament_id: int | str = TOURNAMENT_ID, offset: int = 0, count: int = 50
-) -> list[dict]:
+async def post_forecast_batch(forecasts: list[dict]) -> None:
     """
-    List (all details) {count} posts from the {tournament_id}
+    Post several forecasts in one request. Each item is {"question": question_id, **forecast_payload}.
     """
-    url_qparams = {
+    client = clients.http_client("metaculus")
+
+    async def send_request():
+        response = await client.post(
+            f"{API_BASE_URL}/questions/forecast/", json=forecasts, **AUTH_HEADERS  # type: ignore
+        )
+        raise_for_retryable_status(response)
+        return response
+
+    response = await call_with_backoff("metaculus", send_request)
+    print(f"Prediction batch of {len(forecasts)} post status code: {response.status_code}")
+    if not response.is_success:
+        raise RuntimeError(response.text)
+
+
+async def post_question_comment_async(post_id: int, comment_text: str) -> None:
+    client = clients.http_client("metaculus")
+
+    async def send_request():
+        response = await client.post(
+            f"{API_BASE_URL}/comments/create/",
+            json={
+                "text": comment_text,
+                "parent": None,
+                "included_forecast": True,
+                "is_private": True,
+                "on_post": post_id,
+            },
+            **AUTH_HEADERS,  # type: ignore
+        )
+        raise_for_retryable_status(response)
+        return response
+
+    response = await call_with_backoff("metaculus", send_request)
+    if not response.is_success:
+        raise RuntimeError(response.text)
+
+
+# How long a forecast may wait for others to share its submission request
+SUBMISSION_BATCH_MAX_WAIT_SECONDS = float(os.getenv("SUBMISSION_BATCH_MAX_WAIT_SECONDS", "5"))
+
+
+class ForecastSubmissionQueue:
+    """
+    Collects finished forecasts and posts them to /questions/forecast/ in batches.
+
+    A batch is flushed once it holds `max_batch_size` forecasts or `max_wait_seconds` after its
+    first forecast arrived, whichever comes first. If a batch is rejected, each forecast in it is
+    retried on its own so one bad payload doesn't sink the rest. Comments are posted by a separate
+    worker once their forecast is accepted (comments reference the included forecast).
+
+    Use as `async with ForecastSubmissionQueue() as queue:`; leaving the block flushes everything.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 20,
+        max_wait_seconds: float = SUBMISSION_BATCH_MAX_WAIT_SECONDS,
+        comment_workers: int = 2,
+    ) -> None:
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.comment_workers = comment_workers
+        self.batches_posted = 0
+        self.comment_errors: list[Exception] = []
+
+    async def __aenter__(self) -> "ForecastSubmissionQueue":
+        self._forecasts: asyncio.Queue = asyncio.Queue()
+        self._comments: asyncio.Queue = asyncio.Queue()
+        self._flusher = asyncio.create_task(self._flush_forever())
+        self._commenters = [
+            asyncio.create_task(self._post_comments_forever()) for _ in range(self.comment_workers)
+        ]
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._forecasts.put(None)
+        await self._flusher
+        await self._comments.join()
+        for commenter in self._commenters:
+            commenter.cancel()
+        await asyncio.gather(*self._commenters, return_exceptions=True)
+
+    async def submit(self, question_id: int, post_id: int, forecast_payload: dict, comment: str) -> asyncio.Future:
+        """
+        Queues the forecast and returns right away with a future that resolves once it has been
+        accepted, or fails if it was rejected. Callers must not await it before more forecasts have
+        been queued, or each batch waits out `max_wait_seconds` with only their forecasts in it.
+        The comment is posted in the background.
+        """
+        accepted = asyncio.get_running_loop().create_future()
+        item = {"question": question_id, **forecast_payload}
+        await self._forecasts.put((item, post_id, comment, accepted))
+        return accepted
+
+    async def _flush_forever(self) -> None:
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            first = await self._forecasts.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = loop.time() + self.max_wait_seconds
+            while len(batch) < self.max_batch_size:
+                try:
+                    entry = await asyncio.wait_for(self._forecasts.get(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                if entry is None:
+                    closing = True
+                    break
+                batch.append(entry)
+            await self._post_batch(batch)
+
+    async def _post_batch(self, batch: list) -> None:
+        with tracer.span("submission_batch", forecasts=len(batch)):
+            try:
+                await post_forecast_batch([item for item, _, _, _ in batch])
+                self.batches_posted += 1
+                results: list[Exception | None] = [None] * len(batch)
+            except Exception as batch_error:
+                print(f"Forecast batch of {len(batch)} failed ({batch_error}), retrying forecasts one by one")
+                add_to_span("retries", len(batch))
+                results = []
+                for item, _, _, _ in batch:
+                    try:
+                        await post_forecast_batch([item])
+                        self.batches_posted += 1
+                        results.append(None)
+                    except Exception as item_error:
+                        results.append(item_error)
+        for (item, post_id, comment, accepted), error in zip(batch, results):
+            if error is not None:
+                accepted.set_exception(error)
+                continue
+            accepted.set_result(None)
+            await self._comments.put((post_id, comment))
+
+    async def _post_comments_forever(self) -> None:
+        while True:
+            post_id, comment = await self._comments.get()
+            try:
+                with tracer.span("comment", post_id=post_id):
+                    await post_question_comment_async(post_id, comment)
+            except Exception as e:
+                print(f"Failed to post comment on post {post_id}: {e}")
+                self.comment_errors.append(e)
+            finally:
+                self._comments.task_done()
+
+
+def _posts_query_params(tournament_id: int | str, offset: int, count: int) -> dict:
+    return {
         "limit": count,
         "offset": offset,
         "order_by": "-hotness",
@@ -182,95 +398,353 @@ def list_posts_from_tournament(
         "statuses": "open",
         "include_description": "true",
     }
+
+
+def list_posts_from_tournament(
+    tournament_id: int | str = TOURNAMENT_ID, offset: int = 0, count: int = 50
+) -> list[dict]:
+    """
+    List (all details) {count} posts from the {tournament_id}
+    """
+    url_qparams = _posts_query_params(tournament_id, offset, count)
     url = f"{API_BASE_URL}/posts/"
-    response = requests.get(url, **AUTH_HEADERS, params=url_qparams)  # type: ignore
+
+    def send_request() -> requests.Response:
+        response = requests.get(url, **AUTH_HEADERS, params=url_qparams)  # type: ignore
+        raise_for_retryable_status(response)
+        return response
+
+    response = call_with_backoff_blocking("metaculus", send_request)
     if not response.ok:
         raise Exception(response.text)
     data = json.loads(response.content)
     return data
 
 
-def get_open_question_ids_from_tournament() -> list[tuple[int, int]]:
-    posts = list_posts_from_tournament()
+def _open_question_of_post(post: dict) -> dict | None:
+    # Only single question posts are supported
+    question = post.get("question")
+    if question and question.get("status") == "open":
+        return question
+    return None
 
-    post_dict = dict()
-    for post in posts["results"]:
-        if question := post.get("question"):
-            # single question post
-            post_dict[post["id"]] = [question]
 
+def get_open_question_ids_from_tournament(page_size: int = 50) -> list[tuple[int, int]]:
     open_question_id_post_id = []  # [(question_id, post_id)]
-    for post_id, questions in post_dict.items():
-        for question in questions:
-            if question.get("status") == "open":
+    offset = 0
+    while True:
+        posts = list_posts_from_tournament(offset=offset, count=page_size)
+        for post in posts["results"]:
+            if question := _open_question_of_post(post):
                 print(
                     f"ID: {question['id']}\nQ: {question['title']}\nCloses: "
                     f"{question['scheduled_close_time']}"
                 )
-                open_question_id_post_id.append((question["id"], post_id))
+                open_question_id_post_id.append((question["id"], post["id"]))
+        if not posts.get("next") or len(posts["results"]) < page_size:
+            break
+        offset += page_size
 
     return open_question_id_post_id
 
 
+class ConditionalRequestCache:
+    """
+    Remembers the ETag / Last-Modified and body of each GET so repeat runs can send conditional
+    requests and reuse the stored body on a 304. Stored as JSON at `path`.
+    """
+
+    def __init__(self, path: str = os.getenv("METACULUS_HTTP_CACHE_PATH", ".cache/metaculus_http.json")) -> None:
+        self.path = path
+        self.hits = 0
+        try:
+            with open(path) as f:
+                self._entries: dict[str, dict] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._entries = {}
+
+    def request_headers(self, key: str) -> dict:
+        entry = self._entries.get(key)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def cached_body(self, key: str) -> dict:
+        self.hits += 1
+        return self._entries[key]["body"]
+
+    def store(self, key: str, response, body: dict) -> None:
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        if etag or last_modified:
+            self._entries[key] = {"etag": etag, "last_modified": last_modified, "body": body}
+
+    def save(self) -> None:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self._entries, f)
+
+
+async def fetch_posts_page(
+    tournament_id: int | str, offset: int, count: int, conditional_cache: ConditionalRequestCache | None = None
+) -> dict:
+    url = f"{API_BASE_URL}/posts/"
+    params = _posts_query_params(tournament_id, offset, count)
+    cache_key = f"{url}?{json.dumps(params, sort_keys=True)}"
+    headers = dict(AUTH_HEADERS["headers"])
+    if conditional_cache is not None:
+        headers.update(conditional_cache.request_headers(cache_key))
+    client = clients.http_client("metaculus")
+
+    async def send_request():
+        response = await client.get(url, params=params, headers=headers)
+        raise_for_retryable_status(response)
+        return response
+
+    response = await call_with_backoff("metaculus", send_request)
+    if response.status_code == 304 and conditional_cache is not None:
+        return conditional_cache.cached_body(cache_key)
+    if not response.is_success:
+        raise Exception(response.text)
+    data = response.json()
+    if conditional_cache is not None:
+        conditional_cache.store(cache_key, response, data)
+    return data
+
+
+async def stream_open_posts_from_tournament(
+    tournament_id: int | str = TOURNAMENT_ID, page_size: int = 50, prefetch_pages: int = 4
+) -> AsyncIterator[dict]:
+    """
+    Yields every open single-question post of the tournament, page by page and in order.
+    Up to `prefetch_pages` pages are fetched concurrently ahead of the consumer; the stream
+    stops at the first short page or a page without a `next` link.
+    """
+    conditional_cache = ConditionalRequestCache()
+    pending: deque[asyncio.Task] = deque()
+    next_offset = 0
+
+    def schedule_next_page() -> None:
+        nonlocal next_offset
+        pending.append(
+            asyncio.create_task(fetch_posts_page(tournament_id, next_offset, page_size, conditional_cache))
+        )
+        next_offset += page_size
+
+    for _ in range(prefetch_pages):
+        schedule_next_page()
+    try:
+        while pending:
+            page = await pending.popleft()
+            for post in page["results"]:
+                if _open_question_of_post(post):
+                    yield post
+            if not page.get("next") or len(page["results"]) < page_size:
+                break
+            schedule_next_page()
+    finally:
+        for task in pending:
+            task.cancel()
+        conditional_cache.save()
+
+
 def get_post_details(post_id: int) -> dict:
     """
     Get all details about a post from the Metaculus API.
     """
     url = f"{API_BASE_URL}/posts/{post_id}/"
     print(f"Getting details for {url}")
-    response = requests.get(
-        url,
-        **AUTH_HEADERS,  # type: ignore
-    )
+
+    def send_request() -> requests.Response:
+        response = requests.get(
+            url,
+            **AUTH_HEADERS,  # type: ignore
+        )
+        raise_for_retryable_status(response)
+        return response
+
+    response = call_with_backoff_blocking("metaculus", send_request)
     if not response.ok:
         raise Exception(response.text)
     details = json.loads(response.content)
     return details
 
+# Caps in-flight LLM requests; the request/token rate itself is limited by the shared "openai" token bucket
+# (see rate_limiting.py, e.g. OPENAI_REQUESTS_PER_SECOND and OPENAI_TOKENS_PER_MINUTE)
 CONCURRENT_REQUESTS_LIMIT = 5
 llm_rate_limiter = asyncio.Semaphore(CONCURRENT_REQUESTS_LIMIT)
+# Whether the LLM backend can return several completions per request (`n`); the OpenAI API can, many proxies can't
+LLM_SUPPORTS_N_SAMPLES = os.getenv("LLM_SUPPORTS_N_SAMPLES", "true").lower() == "true"
+llm_usage_stats = PromptCacheStats()
 
 
-async def call_llm(prompt: str, model: str = "gpt-4o", temperature: float = 0.3) -> str:
+async def call_llm(
+    prompt: str,
+    model: str = "gpt-4o",
+    temperature: float = 0.3,
+    answer_format: AnswerFormat | None = None,
+) -> str:
     """
     Makes a streaming completion request to OpenAI's API with concurrent request limiting.
+    429s and server errors are retried with backoff by the shared rate limiter. If `answer_format`
+    is given the answer is checked while it streams in, and a malformed completion is abandoned
+    and requested again right away instead of being parsed (and failing) at the end.
     """
 
     # Remove the base_url parameter to call the OpenAI API directly
     # Also checkout the package 'litellm' for one function that can call any model from any provider
     # Also checkout OpenRouter for allowing one API key for many providers (especially powerful if combined with litellm)
-    client = AsyncOpenAI()
+    client = clients.openai_client()
 
     async with llm_rate_limiter:
-        response = await client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            stream=False,
+        return await stream_completion(
+            lambda: call_with_backoff(
+                "openai",
+                lambda: client.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=temperature,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                ),
+                tokens=estimate_tokens(prompt),
+            ),
+            model,
+            answer_format,
+            record_usage=llm_usage_stats.record,
         )
-        answer = response.choices[0].message.content
-        if answer is None:
-            raise ValueError("No answer returned from LLM")
-        return answer
-
-
-def run_research(question: str) -> str:
-    research = ""
-    if ASKNEWS_CLIENT_ID and ASKNEWS_SECRET:
-        research = call_asknews(question)
-    elif EXA_API_KEY:
-        research = call_exa_smart_searcher(question)
-    elif PERPLEXITY_API_KEY:
-        research = call_perplexity(question)
-    else:
+
+
+async def _stream_n_completions(
+    prompt: str, n: int, model: str, temperature: float, answer_format: AnswerFormat | None = None
+) -> AsyncIterator[str]:
+    client = clients.openai_client()
+    async with llm_rate_limiter:
+        stream = await call_with_backoff(
+            "openai",
+            lambda: client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                n=n,
+                stream=True,
+                stream_options={"include_usage": True},
+            ),
+            tokens=estimate_tokens(prompt),
+        )
+        choices = stream_choices(stream, model, answer_format, n=n, record_usage=llm_usage_stats.record)
+        try:
+            async for _, answer, _ in choices:
+                if answer:
+                    yield answer
+        finally:
+            await choices.aclose()
+
+
+async def call_llm_samples(
+    prompt: str,
+    n: int,
+    model: str = "gpt-4o",
+    temperature: float = 0.3,
+    answer_format: AnswerFormat | None = None,
+) -> AsyncIterator[str]:
+    """
+    Yields n completions of the same prompt, each as soon as it has finished, so it can be parsed
+    while the others are still being generated. If the backend supports `n` they all come from one
+    streamed request, so the prompt is only processed (and billed) once. Otherwise, or for any
+    completions that request did not return (including ones cut short as malformed), separate
+    call_llm requests are made in parallel.
+    """
+    received = 0
+    if n > 1 and LLM_SUPPORTS_N_SAMPLES:
+        try:
+            async for answer in _stream_n_completions(prompt, n, model, temperature, answer_format):
+                received += 1
+                yield answer
+        except Exception as e:
+            print(f"Sampling {n} completions in one request failed after {received}, falling back to separate requests: {e}")
+    tasks = [
+        asyncio.create_task(call_llm(prompt, model, temperature, answer_format))
+        for _ in range(n - received)
+    ]
+    try:
+        for next_completed in asyncio.as_completed(tasks):
+            yield await next_completed
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@dataclass
+class ResearchProvider:
+    """
+    A source of research for a question. `is_configured` checks that the provider's API keys are
+    set, `fetch` returns the formatted research. All providers are async so research never blocks
+    the event loop.
+    """
+
+    name: str
+    is_configured: Callable[[], bool]
+    fetch: Callable[[str], Awaitable[str]]
+
+
+_research_hedger: HedgedResearcher | None = None
+
+
+def get_research_hedger() -> HedgedResearcher | None:
+    """
+    Every configured provider, in order of preference. With RESEARCH_MODE=hedge a slow provider
+    is backed up by the next one; with RESEARCH_MODE=merge all of them are asked.
+    """
+    global _research_hedger
+    if _research_hedger is None:
+        sources = [
+            ResearchSource(provider.name, provider.fetch)
+            for provider in RESEARCH_PROVIDERS
+            if provider.is_configured()
+        ]
+        if sources:
+            _research_hedger = HedgedResearcher(sources)
+    return _research_hedger
+
+
+# Sibling questions (same event, different threshold or date) share one research request
+research_store = ResearchStore()
+
+
+async def summarize_research(research: str, token_budget: int) -> str:
+    prompt = prompts.get_research_summarization_prompt(research, token_budget)
+    with tracer.span("research_summary"):
+        return await call_llm(prompt, temperature=0)
+
+
+# The research is sent with every one of the NUM_RUNS_PER_QUESTION prompts, so it is fitted to a token budget first
+research_compactor = ResearchCompactor(
+    summarize=summarize_research if RESEARCH_COMPACTION_SUMMARIZE else None
+)
+
+
+async def run_research(question: str) -> str:
+    hedger = get_research_hedger()
+    if hedger is None:
         research = "No research done"
+    else:
+        research = await research_store.get_or_fetch(question, hedger.fetch)
+        research, record = await research_compactor.compact(research, label=question)
+        print(f"Research tokens for {question}: {record.tokens_before} -> {record.tokens_after}")
 
     print(f"########################\nResearch Found:\n{research}\n########################")
 
     return research
 
-def call_perplexity(question: str) -> str:
-    url = "https://api.perplexity.ai/chat/completions"
+async def call_perplexity(question: str) -> str:
+    url = f"{PERPLEXITY_API_BASE_URL}/chat/completions"
     api_key = PERPLEXITY_API_KEY
     headers = {
         "accept": "application/json",
@@ -295,19 +769,29 @@ def call_perplexity(question: str) -> str:
             },
         ],
     }
-    response = requests.post(url=url, json=payload, headers=headers)
-    if not response.ok:
+    client = clients.http_client("perplexity")
+
+    async def send_request() -> httpx.Response:
+        response = await client.post(url, json=payload, headers=headers)
+        raise_for_retryable_status(response)
+        return response
+
+    response = await call_with_backoff("perplexity", send_request)
+    if not response.is_success:
         raise Exception(response.text)
-    content = response.json()["choices"][0]["message"]["content"]
+    body = response.json()
+    record_usage(f"perplexity/{payload['model']}", body.get("usage"))
+    content = body["choices"][0]["message"]["content"]
     return content
 
-def call_exa_smart_searcher(question: str) -> str:
+async def call_exa_smart_searcher(question: str) -> str:
+    await rate_limiters.get("exa").acquire()
     if OPENAI_API_KEY is None:
         searcher = forecasting_tools.ExaSearcher(
             include_highlights=True,
             num_results=10,
         )
-        highlights = asyncio.run(searcher.invoke_for_highlights_in_relevance_order(question))
+        highlights = await searcher.invoke_for_highlights_in_relevance_order(question)
         prioritized_highlights = highlights[:10]
         combined_highlights = ""
         for i, highlight in enumerate(prioritized_highlights):
@@ -326,57 +810,65 @@ def call_exa_smart_searcher(question: str) -> str:
             "would resolve Yes or No based on current information. You do not produce forecasts yourself."
             f"\n\nThe question is: {question}"
         )
-        response = asyncio.run(searcher.invoke(prompt))
+        response = await searcher.invoke(prompt)
         assert response is not None
 
     return response
 
-def call_asknews(question: str) -> str:
+def format_asknews_articles(articles) -> str:
+    formatted_articles = ""
+    articles = [article.__dict__ for article in articles]
+    articles = sorted(articles, key=lambda x: x["pub_date"], reverse=True)
+    for article in articles:
+        pub_date = article["pub_date"].strftime("%B %d, %Y %I:%M %p")
+        formatted_articles += f"**{article['eng_title']}**\n{article['summary']}\nOriginal language: {article['language']}\nPublish date: {pub_date}\nSource:[{article['source_id']}]({article['article_url']})\n\n"
+    return formatted_articles
+
+async def call_asknews(question: str) -> str:
     """
     Use the AskNews `news` endpoint to get news context for your query.
     The full API reference can be found here: https://docs.asknews.app/en/reference#get-/v1/news/search
+    The latest news and historical searches are sent at the same time.
     """
-    ask = AskNewsSDK(
-        client_id=ASKNEWS_CLIENT_ID, client_secret=ASKNEWS_SECRET, scopes=set(["news"])
-    )
-
-    # get the latest news related to the query (within the past 48 hours)
-    hot_response = ask.news.search_news(
-        query=question,  # your natural language query
-        n_articles=6,  # control the number of articles to include in the context, originally 5
-        return_type="both",
-        strategy="latest news",  # enforces looking at the latest news only
-    )
-
-    # get context from the "historical" database that contains a news archive going back to 2023
-    historical_response = ask.news.search_news(
-        query=question,
-        n_articles=10,
-        return_type="both",
-        strategy="news knowledge",  # looks for relevant news within the past 60 days
-    )
+    async with AsyncAskNewsSDK(
+        client_id=ASKNEWS_CLIENT_ID,
+        client_secret=ASKNEWS_SECRET,
+        scopes=set(["news"]),
+        base_url=ASKNEWS_API_BASE_URL,
+        token_url=ASKNEWS_TOKEN_URL,
+    ) as ask:
+        hot_response, historical_response = await asyncio.gather(
+            # get the latest news related to the query (within the past 48 hours)
+            call_with_backoff(
+                "asknews",
+                lambda: ask.news.search_news(
+                    query=question,  # your natural language query
+                    n_articles=6,  # control the number of articles to include in the context, originally 5
+                    return_type="both",
+                    strategy="latest news",  # enforces looking at the latest news only
+                ),
+            ),
+            # get context from the "historical" database that contains a news archive going back to 2023
+            call_with_backoff(
+                "asknews",
+                lambda: ask.news.search_news(
+                    query=question,
+                    n_articles=10,
+                    return_type="both",
+                    strategy="news knowledge",  # looks for relevant news within the past 60 days
+                ),
+            ),
+        )
 
     hot_articles = hot_response.as_dicts
     historical_articles = historical_response.as_dicts
     formatted_articles = "Here are the relevant news articles:\n\n"
 
     if hot_articles:
-        hot_articles = [article.__dict__ for article in hot_articles]
-        hot_articles = sorted(hot_articles, key=lambda x: x["pub_date"], reverse=True)
-
-        for article in hot_articles:
-            pub_date = article["pub_date"].strftime("%B %d, %Y %I:%M %p")
-            formatted_articles += f"**{article['eng_title']}**\n{article['summary']}\nOriginal language: {article['language']}\nPublish date: {pub_date}\nSource:[{article['source_id']}]({article['article_url']})\n\n"
+        formatted_articles += format_asknews_articles(hot_articles)
 
     if historical_articles:
-        historical_articles = [article.__dict__ for article in historical_articles]
-        historical_articles = sorted(
-            historical_articles, key=lambda x: x["pub_date"], reverse=True
-        )
-
-        for article in historical_articles:
-            pub_date = article["pub_date"].strftime("%B %d, %Y %I:%M %p")
-            formatted_articles += f"**{article['eng_title']}**\n{article['summary']}\nOriginal language: {article['language']}\nPublish date: {pub_date}\nSource:[{article['source_id']}]({article['article_url']})\n\n"
+        formatted_articles += format_asknews_articles(historical_articles)
 
     if not hot_articles and not historical_articles:
         formatted_articles += "No articles were found.\n\n"
@@ -384,6 +876,13 @@ def call_asknews(question: str) -> str:
 
     return formatted_articles
 
+# Providers in order of preference; run_research asks the configured ones as set by RESEARCH_MODE
+RESEARCH_PROVIDERS = [
+    ResearchProvider("asknews", lambda: bool(ASKNEWS_CLIENT_ID and ASKNEWS_SECRET), call_asknews),
+    ResearchProvider("exa", lambda: bool(EXA_API_KEY), call_exa_smart_searcher),
+    ResearchProvider("perplexity", lambda: bool(PERPLEXITY_API_KEY), call_perplexity),
+]
+
 ############### BINARY ###############
 # @title Binary prompt & functions
 
@@ -435,9 +934,12 @@ def extract_probability_from_response_as_percentage_not_decimal(
         raise ValueError(f"Could not extract prediction from response: {forecast_text}")
 
 
-async def get_binary_gpt_prediction(
-    question_details: dict, num_runs: int
-) -> tuple[float, str]:
+async def sample_binary_predictions(
+    question_details: dict, num_runs: int, summary_report: str
+) -> list[tuple[float, str]]:
+    """
+    Returns up to num_runs (probability in percent, comment) samples, fewer if the first ones agree.
+    """
 
     today = datetime.datetime.now().strftime("%Y-%m-%d")
     title = question_details["title"]
@@ -446,8 +948,6 @@ async def get_binary_gpt_prediction(
     fine_print = question_details["fine_print"]
     question_type = question_details["type"]
 
-    summary_report = run_research(title)
-
     content = BINARY_PROMPT_TEMPLATE.format(
         title=title,
         today=today,
@@ -457,9 +957,7 @@ async def get_binary_gpt_prediction(
         summary_report=summary_report,
     )
 
-    async def get_rationale_and_probability(content: str) -> tuple[float, str]:
-        rationale = await call_llm(content)
-
+    def parse_rationale_and_probability(rationale: str) -> tuple[float, str]:
         probability = extract_probability_from_response_as_percentage_not_decimal(
             rationale
         )
@@ -469,20 +967,42 @@ async def get_binary_gpt_prediction(
         )
         return probability, comment
 
-    probability_and_comment_pairs = await asyncio.gather(
-        *[get_rationale_and_probability(content) for _ in range(num_runs)]
+    async def draw(count: int) -> list[tuple[float, str]]:
+        with tracer.span("forecast_sample", samples=count):
+            return [
+                parse_rationale_and_probability(rationale)
+                async for rationale in call_llm_samples(content, count, answer_format=binary_answer_format())
+            ]
+
+    return await sample_adaptively(
+        draw, lambda sample: sample[0] / 100, binary_convergence(), num_runs, label=title
     )
+
+
+def aggregate_binary_predictions(
+    question_details: dict, probability_and_comment_pairs: list[tuple[float, str]]
+) -> tuple[float, str]:
     comments = [pair[1] for pair in probability_and_comment_pairs]
     final_comment_sections = [
         f"## Rationale {i+1}\n{comment}" for i, comment in enumerate(comments)
     ]
-    probabilities = [pair[0] for pair in probability_and_comment_pairs]
-    median_probability = float(np.median(probabilities)) / 100
+    probabilities = np.array([pair[0] for pair in probability_and_comment_pairs]) / 100
+    aggregated_probability = float(aggregate_probabilities(probabilities))
 
-    final_comment = f"Median Probability: {median_probability}\n\n" + "\n\n".join(
-        final_comment_sections
+    final_comment = (
+        f"Aggregated Probability ({BINARY_AGGREGATION}): {aggregated_probability}\n\n"
+        + "\n\n".join(final_comment_sections)
     )
-    return median_probability, final_comment
+    return aggregated_probability, final_comment
+
+
+async def get_binary_gpt_prediction(
+    question_details: dict, num_runs: int, summary_report: str | None = None
+) -> tuple[float, str]:
+    if summary_report is None:
+        summary_report = await run_research(question_details["title"])
+    samples = await sample_binary_predictions(question_details, num_runs, summary_report)
+    return aggregate_binary_predictions(question_details, samples)
 
 
 ####################### NUMERIC ###############
@@ -582,20 +1102,30 @@ def extract_percentiles_from_response(forecast_text: str) -> dict:
         raise ValueError(f"Could not extract prediction from response: {forecast_text}")
 
 
-def generate_continuous_cdf(
+def generate_cdf_locations(
+    range_min: float, range_max: float, zero_point: float | None, cdf_size: int
+) -> np.ndarray:
+    """
+    The x-axis locations of the CDF, log-scaled when the question has a zero_point.
+    """
+    x = np.linspace(0, 1, cdf_size)
+    if zero_point is None:
+        return range_min + (range_max - range_min) * x
+    deriv_ratio = (range_max - zero_point) / (range_min - zero_point)
+    return range_min + (range_max - range_min) * (deriv_ratio**x - 1) / (deriv_ratio - 1)
+
+
+def _anchored_value_percentiles(
     percentile_values: dict,
-    question_type: str,
     open_upper_bound: bool,
     open_lower_bound: bool,
     upper_bound: float,
     lower_bound: float,
-    zero_point: float | None,
-    cdf_size: int,
-) -> list[float]:
+) -> tuple[np.ndarray, np.ndarray]:
     """
-    Returns: list[float]: A list of 201 float values representing the CDF.
+    Pins values to the bounds, adds the bound anchors and returns (values, percentiles in [0, 1]) sorted by value.
     """
-
+    percentile_values = dict(percentile_values)
     percentile_max = max(float(key) for key in percentile_values.keys())
     percentile_min = min(float(key) for key in percentile_values.keys())
     range_min = lower_bound
@@ -624,78 +1154,104 @@ def generate_continuous_cdf(
     else:
         percentile_values[0] = range_min
 
-    sorted_percentile_values = dict(sorted(percentile_values.items()))
-
-    # Normalize percentile keys
-    normalized_percentile_values = {}
-    for key, value in sorted_percentile_values.items():
-        percentile = float(key) / 100
-        normalized_percentile_values[percentile] = value
-
-
+    # Invert to value -> percentile; when two percentiles share a value the higher percentile wins
     value_percentiles = {
-        value: key for key, value in normalized_percentile_values.items()
+        value: float(key) / 100 for key, value in sorted(percentile_values.items())
     }
+    values = np.fromiter(value_percentiles.keys(), dtype=float)
+    percentiles = np.fromiter(value_percentiles.values(), dtype=float)
+    order = np.argsort(values, kind="stable")
+    return values[order], percentiles[order]
 
-    # function for log scaled questions
-    def generate_cdf_locations(range_min, range_max, zero_point):
-        if zero_point is None:
-            scale = lambda x: range_min + (range_max - range_min) * x
-        else:
-            deriv_ratio = (range_max - zero_point) / (range_min - zero_point)
-            scale = lambda x: range_min + (range_max - range_min) * (
-                deriv_ratio**x - 1
-            ) / (deriv_ratio - 1)
-        return [scale(x) for x in np.linspace(0, 1, cdf_size)]
-
-    cdf_xaxis = generate_cdf_locations(range_min, range_max, zero_point)
-
-    def linear_interpolation(x_values, xy_pairs):
-        # Sort the xy_pairs by x-values
-        sorted_pairs = sorted(xy_pairs.items())
-
-        # Extract sorted x and y values
-        known_x = [pair[0] for pair in sorted_pairs]
-        known_y = [pair[1] for pair in sorted_pairs]
 
-        # Initialize the result list
-        y_values = []
-
-        for x in x_values:
-            # Check if x is exactly in the known x values
-            if x in known_x:
-                y_values.append(known_y[known_x.index(x)])
-            else:
-                # Find the indices of the two nearest known x-values
-                i = 0
-                while i < len(known_x) and known_x[i] < x:
-                    i += 1
-
-                list_index_2 = i
-
-                # If x is outside the range of known x-values, use the nearest endpoint
-                if i == 0:
-                    y_values.append(known_y[0])
-                elif i == len(known_x):
-                    y_values.append(known_y[-1])
-                else:
-                    # Perform linear interpolation
-                    x0, x1 = known_x[i - 1], known_x[i]
-                    y0, y1 = known_y[i - 1], known_y[i]
+def generate_continuous_cdfs(
+    percentile_value_sets: list[dict],
+    question_type: str,
+    open_upper_bound: bool,
+    open_lower_bound: bool,
+    upper_bound: float,
+    lower_bound: float,
+    zero_point: float | None,
+    cdf_size: int,
+) -> np.ndarray:
+    """
+    Builds one CDF per percentile set in a single call.
 
-                    # Linear interpolation formula
-                    y = y0 + (x - x0) * (y1 - y0) / (x1 - x0)
-                    y_values.append(y)
+    Returns: np.ndarray of shape (len(percentile_value_sets), cdf_size).
+    """
+    cdf_xaxis = generate_cdf_locations(lower_bound, upper_bound, zero_point, cdf_size)
+    if not percentile_value_sets:
+        return np.empty((0, cdf_size))
+    anchored = [
+        _anchored_value_percentiles(
+            percentile_values, open_upper_bound, open_lower_bound, upper_bound, lower_bound
+        )
+        for percentile_values in percentile_value_sets
+    ]
+    # Rows are padded to the same length by repeating their last point, which interpolation ignores
+    width = max(len(values) for values, _ in anchored)
+    values = np.empty((len(anchored), width))
+    percentiles = np.empty((len(anchored), width))
+    for row, (row_values, row_percentiles) in enumerate(anchored):
+        values[row, : len(row_values)], values[row, len(row_values) :] = row_values, row_values[-1]
+        percentiles[row, : len(row_percentiles)], percentiles[row, len(row_percentiles) :] = (
+            row_percentiles,
+            row_percentiles[-1],
+        )
+    # Like np.interp, this holds the endpoint percentile outside the known values, as the old linear scan did
+    cdfs = interp_rows(cdf_xaxis, values, percentiles)
+    return enforce_cdf_constraints(cdfs, open_upper_bound, open_lower_bound)
 
-        return y_values
 
-    continuous_cdf = linear_interpolation(cdf_xaxis, value_percentiles)
-    return continuous_cdf
+def generate_continuous_cdf(
+    percentile_values: dict,
+    question_type: str,
+    open_upper_bound: bool,
+    open_lower_bound: bool,
+    upper_bound: float,
+    lower_bound: float,
+    zero_point: float | None,
+    cdf_size: int,
+) -> list[float]:
+    """
+    Returns: list[float]: A list of 201 float values representing the CDF.
+    """
+    return generate_continuous_cdfs(
+        [percentile_values],
+        question_type,
+        open_upper_bound,
+        open_lower_bound,
+        upper_bound,
+        lower_bound,
+        zero_point,
+        cdf_size,
+    )[0].tolist()
+
+
+def _numeric_question_settings(question_details: dict) -> dict:
+    scaling = question_details["scaling"]
+    question_type = question_details["type"]
+    if question_type == "discrete":
+        cdf_size = scaling["inbound_outcome_count"] + 1
+    else:
+        cdf_size = 201
+    return {
+        "question_type": question_type,
+        "open_upper_bound": question_details["open_upper_bound"],
+        "open_lower_bound": question_details["open_lower_bound"],
+        "upper_bound": scaling["range_max"],
+        "lower_bound": scaling["range_min"],
+        "zero_point": scaling["zero_point"],
+        "cdf_size": cdf_size,
+    }
 
 
-async def get_numeric_gpt_prediction(
-    question_details: dict, num_runs: int
-) -> tuple[list[float], str]:
+async def sample_numeric_predictions(
+    question_details: dict, num_runs: int, summary_report: str
+) -> list[tuple[dict, str]]:
+    """
+    Returns up to num_runs (percentile values, comment) samples, fewer if the first ones agree.
+    """
 
     today = datetime.datetime.now().strftime("%Y-%m-%d")
     title = question_details["title"]
@@ -709,12 +1265,6 @@ async def get_numeric_gpt_prediction(
     unit_of_measure = question_details["unit"] if question_details["unit"] else "Not stated (please infer this)"
     upper_bound = scaling["range_max"]
     lower_bound = scaling["range_min"]
-    zero_point = scaling["zero_point"]
-    if question_type == "discrete":
-        outcome_count = question_details["scaling"]["inbound_outcome_count"]
-        cdf_size = outcome_count + 1
-    else:
-        cdf_size = 201
 
     # Create messages about the bounds that are passed in the LLM prompt
     if open_upper_bound:
@@ -726,8 +1276,6 @@ async def get_numeric_gpt_prediction(
     else:
         lower_bound_message = f"The outcome can not be lower than {lower_bound}."
 
-    summary_report = run_research(title)
-
     content = NUMERIC_PROMPT_TEMPLATE.format(
         title=title,
         today=today,
@@ -740,43 +1288,62 @@ async def get_numeric_gpt_prediction(
         units=unit_of_measure,
     )
 
-    async def ask_llm_to_get_cdf(content: str) -> tuple[list[float], str]:
-        rationale = await call_llm(content)
+    def parse_percentiles(rationale: str) -> tuple[dict, str]:
         percentile_values = extract_percentiles_from_response(rationale)
 
         comment = (
             f"Extracted Percentile_values: {percentile_values}\n\nGPT's Answer: "
             f"{rationale}\n\n\n"
         )
+        return percentile_values, comment
 
-        cdf = generate_continuous_cdf(
-            percentile_values,
-            question_type,
-            open_upper_bound,
-            open_lower_bound,
-            upper_bound,
-            lower_bound,
-            zero_point,
-            cdf_size,
-        )
-
-        return cdf, comment
+    async def draw(count: int) -> list[tuple[dict, str]]:
+        with tracer.span("forecast_sample", samples=count):
+            return [
+                parse_percentiles(rationale)
+                async for rationale in call_llm_samples(content, count, answer_format=percentile_answer_format(6))
+            ]
 
-    cdf_and_comment_pairs = await asyncio.gather(
-        *[ask_llm_to_get_cdf(content) for _ in range(num_runs)]
+    settings = _numeric_question_settings(question_details)
+    return await sample_adaptively(
+        draw,
+        lambda sample: generate_continuous_cdfs([sample[0]], **settings)[0],
+        cdf_convergence(),
+        num_runs,
+        label=title,
     )
-    comments = [pair[1] for pair in cdf_and_comment_pairs]
+
+
+def aggregate_numeric_predictions(
+    question_details: dict, percentiles_and_comment_pairs: list[tuple[dict, str]]
+) -> tuple[list[float], str]:
+    comments = [pair[1] for pair in percentiles_and_comment_pairs]
     final_comment_sections = [
         f"## Rationale {i+1}\n{comment}" for i, comment in enumerate(comments)
     ]
-    cdfs: list[list[float]] = [pair[0] for pair in cdf_and_comment_pairs]
-    all_cdfs = np.array(cdfs)
-    median_cdf: list[float] = np.median(all_cdfs, axis=0).tolist()
+    # All runs' CDFs are built in one batched call
+    settings = _numeric_question_settings(question_details)
+    all_cdfs = generate_continuous_cdfs(
+        [pair[0] for pair in percentiles_and_comment_pairs], **settings
+    )
+    aggregated_cdf: list[float] = aggregate_cdfs(
+        all_cdfs, settings["open_upper_bound"], settings["open_lower_bound"]
+    ).tolist()
 
-    final_comment = f"Median CDF: `{str(median_cdf)[:100]}...`\n\n" + "\n\n".join(
-        final_comment_sections
+    final_comment = (
+        f"Aggregated CDF ({NUMERIC_AGGREGATION}): `{str(aggregated_cdf)[:100]}...`\n\n"
+        + "\n\n".join(final_comment_sections)
     )
-    return median_cdf, final_comment
+    return aggregated_cdf, final_comment
+
+
+async def get_numeric_gpt_prediction(
+    question_details: dict, num_runs: int, summary_report: str | None = None
+) -> tuple[list[float], str]:
+    if summary_report is None:
+        summary_report = await run_research(question_details["title"])
+    samples = await sample_numeric_predictions(question_details, num_runs, summary_report)
+    return aggregate_numeric_predictions(question_details, samples)
 
 
 ########################## MULTIPLE CHOICE ###############
@@ -896,10 +1463,12 @@ def generate_multiple_choice_forecast(options, option_probabilities) -> dict:
     return probability_yes_per_category
 
 
-async def get_multiple_choice_gpt_prediction(
-    question_details: dict,
-    num_runs: int,
-) -> tuple[dict[str, float], str]:
+async def sample_multiple_choice_predictions(
+    question_details: dict, num_runs: int, summary_report: str
+) -> list[tuple[dict[str, float], str]]:
+    """
+    Returns up to num_runs (probability per option, comment) samples, fewer if the first ones agree.
+    """
 
     today = datetime.datetime.now().strftime("%Y-%m-%d")
     title = question_details["title"]
@@ -909,8 +1478,6 @@ async def get_multiple_choice_gpt_prediction(
     question_type = question_details["type"]
     options = question_details["options"]
 
-    summary_report = run_research(title)
-
     content = MULTIPLE_CHOICE_PROMPT_TEMPLATE.format(
         title=title,
         today=today,
@@ -921,12 +1488,9 @@ async def get_multiple_choice_gpt_prediction(
         options=options,
     )
 
-    async def ask_llm_for_multiple_choice_probabilities(
-        content: str,
+    def parse_multiple_choice_probabilities(
+        rationale: str,
     ) -> tuple[dict[str, float], str]:
-        rationale = await call_llm(content)
-
-
         option_probabilities = extract_option_probabilities_from_response(
             rationale, options
         )
@@ -941,9 +1505,29 @@ async def get_multiple_choice_gpt_prediction(
         )
         return probability_yes_per_category, comment
 
-    probability_yes_per_category_and_comment_pairs = await asyncio.gather(
-        *[ask_llm_for_multiple_choice_probabilities(content) for _ in range(num_runs)]
+    async def draw(count: int) -> list[tuple[dict[str, float], str]]:
+        with tracer.span("forecast_sample", samples=count):
+            return [
+                parse_multiple_choice_probabilities(rationale)
+                async for rationale in call_llm_samples(
+                    content, count, answer_format=option_lines_answer_format(options)
+                )
+            ]
+
+    return await sample_adaptively(
+        draw,
+        lambda sample: [sample[0][option] for option in options],
+        option_convergence(),
+        num_runs,
+        label=title,
     )
+
+
+def aggregate_multiple_choice_predictions(
+    question_details: dict,
+    probability_yes_per_category_and_comment_pairs: list[tuple[dict[str, float], str]],
+) -> tuple[dict[str, float], str]:
+    options = question_details["options"]
     comments = [pair[1] for pair in probability_yes_per_category_and_comment_pairs]
     final_comment_sections = [
         f"## Rationale {i+1}\n{comment}" for i, comment in enumerate(comments)
@@ -951,20 +1535,30 @@ async def get_multiple_choice_gpt_prediction(
     probability_yes_per_category_dicts: list[dict[str, float]] = [
         pair[0] for pair in probability_yes_per_category_and_comment_pairs
     ]
-    average_probability_yes_per_category: dict[str, float] = {}
-    for option in options:
-        probabilities_for_current_option: list[float] = [
-            dict[option] for dict in probability_yes_per_category_dicts
-        ]
-        average_probability_yes_per_category[option] = sum(
-            probabilities_for_current_option
-        ) / len(probabilities_for_current_option)
+    # (samples, options), in the order of the question's options
+    probabilities = np.array(
+        [[forecast[option] for option in options] for forecast in probability_yes_per_category_dicts]
+    ).reshape(-1, len(options))
+    aggregated = aggregate_option_probabilities(probabilities)
+    aggregated_probability_yes_per_category: dict[str, float] = dict(zip(options, aggregated.tolist()))
 
     final_comment = (
-        f"Average Probability Yes Per Category: `{average_probability_yes_per_category}`\n\n"
+        f"Aggregated Probability Yes Per Category ({MULTIPLE_CHOICE_AGGREGATION}): "
+        f"`{aggregated_probability_yes_per_category}`\n\n"
         + "\n\n".join(final_comment_sections)
     )
-    return average_probability_yes_per_category, final_comment
+    return aggregated_probability_yes_per_category, final_comment
+
+
+async def get_multiple_choice_gpt_prediction(
+    question_details: dict,
+    num_runs: int,
+    summary_report: str | None = None,
+) -> tuple[dict[str, float], str]:
+    if summary_report is None:
+        summary_report = await run_research(question_details["title"])
+    samples = await sample_multiple_choice_predictions(question_details, num_runs, summary_report)
+    return aggregate_multiple_choice_predictions(question_details, samples)
 
 
 ################### FORECASTING ###################
@@ -986,103 +1580,331 @@ def forecast_is_already_made(post_details: dict) -> bool:
         return False
 
 
-async def forecast_individual_question(
-    question_id: int,
-    post_id: int,
-    submit_prediction: bool,
-    num_runs_per_question: int,
+@dataclass
+class QuestionJob:
+    """
+    A question moving through the forecasting pipeline. Each stage fills in its part; once `done`
+    is set (skipped, or finished early) the remaining stages pass the job through untouched.
+    """
+
+    question_id: int
+    post_id: int
+    post_details: dict | None = None
+    summary: str = ""
+    input_hash: str | None = None
+    reason: str | None = None
+    summary_report: str | None = None
+    research_digest: str | None = None
+    samples: list = field(default_factory=list)
+    forecast: object = None
+    comment: str | None = None
+    # Resolves once a queued forecast has been accepted; see ForecastSubmissionQueue
+    submission: asyncio.Future | None = None
+    done: bool = False
+    # The stages of a job run in different workers; their spans share this trace
+    trace_id: str = field(default_factory=new_trace_id)
+
+    @property
+    def question_details(self) -> dict:
+        return self.post_details["question"]
+
+
+# Workers per pipeline stage. Research and forecasting are the slow, I/O bound steps, so they get
+# the most workers; the queues in front of each stage are bounded so a slow stage holds back the
+# ones feeding it instead of piling up work.
+PIPELINE_LOAD_WORKERS = int(os.getenv("PIPELINE_LOAD_WORKERS", "4"))
+PIPELINE_RESEARCH_WORKERS = int(os.getenv("PIPELINE_RESEARCH_WORKERS", "3"))
+PIPELINE_FORECAST_WORKERS = int(os.getenv("PIPELINE_FORECAST_WORKERS", "3"))
+PIPELINE_AGGREGATE_WORKERS = int(os.getenv("PIPELINE_AGGREGATE_WORKERS", "1"))
+PIPELINE_SUBMIT_WORKERS = int(os.getenv("PIPELINE_SUBMIT_WORKERS", "2"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+
+
+def traced_stage(
+    name: str, func: Callable[[QuestionJob], Awaitable[QuestionJob]]
+) -> Callable[[QuestionJob], Awaitable[QuestionJob]]:
+    """
+    Runs a stage function in a span of the job's trace. Jobs that are already done pass through untraced.
+    """
+
+    async def run(job: QuestionJob) -> QuestionJob:
+        if job.done:
+            return await func(job)
+        with tracer.span(name, trace_id=job.trace_id, question_id=job.question_id):
+            return await func(job)
+
+    return run
+
+
+async def load_question(
+    job: QuestionJob,
     skip_previously_forecasted_questions: bool,
-) -> str:
-    post_details = get_post_details(post_id)
-    question_details = post_details["question"]
+    state_store: ForecastStateStore | None = None,
+) -> QuestionJob:
+    if job.post_details is None:
+        job.post_details = await asyncio.to_thread(get_post_details, job.post_id)
+    question_details = job.question_details
     title = question_details["title"]
-    question_type = question_details["type"]
 
-    summary_of_forecast = ""
-    summary_of_forecast += f"-----------------------------------------------\nQuestion: {title}\n"
-    summary_of_forecast += f"URL: https://www.metaculus.com/questions/{post_id}/\n"
-
-    if question_type == "multiple_choice":
-        options = question_details["options"]
-        summary_of_forecast += f"options: {options}\n"
+    job.summary += f"-----------------------------------------------\nQuestion: {title}\n"
+    job.summary += f"URL: https://www.metaculus.com/questions/{job.post_id}/\n"
+    if question_details["type"] == "multiple_choice":
+        job.summary += f"options: {question_details['options']}\n"
 
-    if (
-        forecast_is_already_made(post_details)
+    job.input_hash = question_input_hash(
+        title,
+        question_details["description"],
+        question_details["resolution_criteria"],
+        question_details["fine_print"],
+    )
+    if state_store is not None:
+        job.reason = state_store.reason_to_forecast(job.question_id, job.input_hash)
+        if job.reason is None:
+            job.summary += "Skipped: Inputs unchanged since the last forecast\n"
+            job.done = True
+        elif job.reason == "new" and forecast_is_already_made(job.post_details):
+            # Seed the store with forecasts made before incremental mode was turned on; they are redone once stale
+            state_store.record_forecast(job.question_id, job.input_hash, None)
+            job.summary += "Skipped: Forecast already made (recorded in incremental state)\n"
+            job.done = True
+        else:
+            job.summary += f"Forecasting because the question is {job.reason}\n"
+    elif (
+        forecast_is_already_made(job.post_details)
         and skip_previously_forecasted_questions == True
     ):
-        summary_of_forecast += f"Skipped: Forecast already made\n"
-        return summary_of_forecast
+        job.summary += f"Skipped: Forecast already made\n"
+        job.done = True
+    return job
+
+
+async def research_question(
+    job: QuestionJob, state_store: ForecastStateStore | None = None
+) -> QuestionJob:
+    if job.done:
+        return job
+    job.summary_report = await run_research(job.question_details["title"])
+    job.research_digest = digest(job.summary_report)
+    if (
+        state_store is not None
+        and job.reason == "stale"
+        and state_store.research_unchanged(job.question_id, job.input_hash, job.research_digest)
+    ):
+        state_store.touch(job.question_id)
+        job.summary += "Skipped: Research unchanged since the last forecast\n"
+        job.done = True
+    return job
+
 
+async def sample_question_predictions(job: QuestionJob, num_runs_per_question: int) -> QuestionJob:
+    if job.done:
+        return job
+    question_details = job.question_details
+    question_type = question_details["type"]
     if question_type == "binary":
-        forecast, comment = await get_binary_gpt_prediction(
-            question_details, num_runs_per_question
-        )
-    elif question_type == "numeric":
-        forecast, comment = await get_numeric_gpt_prediction(
-            question_details, num_runs_per_question
-        )
-    elif question_type == "discrete":
-        forecast, comment = await get_numeric_gpt_prediction(
-            question_details, num_runs_per_question
-        )
+        sample = sample_binary_predictions
+    elif question_type == "numeric" or question_type == "discrete":
+        sample = sample_numeric_predictions
     elif question_type == "multiple_choice":
-        forecast, comment = await get_multiple_choice_gpt_prediction(
-            question_details, num_runs_per_question
-        )
+        sample = sample_multiple_choice_predictions
     else:
         raise ValueError(f"Unknown question type: {question_type}")
+    job.samples = await sample(question_details, num_runs_per_question, job.summary_report)
+    job.summary += f"Samples: {len(job.samples)} of up to {num_runs_per_question}\n"
+    return job
+
 
+async def aggregate_question_predictions(job: QuestionJob) -> QuestionJob:
+    if job.done:
+        return job
+    question_details = job.question_details
+    question_type = question_details["type"]
+    if question_type == "binary":
+        job.forecast, job.comment = aggregate_binary_predictions(question_details, job.samples)
+    elif question_type == "numeric" or question_type == "discrete":
+        job.forecast, job.comment = aggregate_numeric_predictions(question_details, job.samples)
+    else:
+        job.forecast, job.comment = aggregate_multiple_choice_predictions(question_details, job.samples)
+
+    post_id, question_id = job.post_id, job.question_id
     print(f"-----------------------------------------------\nPost {post_id} Question {question_id}:\n")
-    print(f"Forecast for post {post_id} (question {question_id}):\n{forecast}")
-    print(f"Comment for post {post_id} (question {question_id}):\n{comment}")
+    print(f"Forecast for post {post_id} (question {question_id}):\n{job.forecast}")
+    print(f"Comment for post {post_id} (question {question_id}):\n{job.comment}")
 
     if question_type == "numeric" or question_type == "discrete":
-        summary_of_forecast += f"Forecast: {str(forecast)[:200]}...\n"
+        job.summary += f"Forecast: {str(job.forecast)[:200]}...\n"
     else:
-        summary_of_forecast += f"Forecast: {forecast}\n"
+        job.summary += f"Forecast: {job.forecast}\n"
+    job.summary += f"Comment:\n```\n{job.comment[:200]}...\n```\n\n"
+    return job
 
-    summary_of_forecast += f"Comment:\n```\n{comment[:200]}...\n```\n\n"
 
+async def submit_question_forecast(
+    job: QuestionJob,
+    submit_prediction: bool,
+    submission_queue: ForecastSubmissionQueue | None = None,
+    state_store: ForecastStateStore | None = None,
+) -> QuestionJob:
+    if job.done:
+        return job
     if submit_prediction == True:
-        forecast_payload = create_forecast_payload(forecast, question_type)
-        post_question_prediction(question_id, forecast_payload)
-        post_question_comment(post_id, comment)
-        summary_of_forecast += "Posted: Forecast was posted to Metaculus.\n"
+        forecast_payload = create_forecast_payload(job.forecast, job.question_details["type"])
+        if submission_queue is not None:
+            # Not awaited here: the forecast waits in the queue for others to share its batch, and
+            # is recorded once accepted. Rejections are collected when the queue is drained.
+            job.submission = await submission_queue.submit(
+                job.question_id, job.post_id, forecast_payload, job.comment
+            )
+            job.submission.add_done_callback(lambda accepted: record_submission(job, accepted, state_store))
+        else:
+            await asyncio.to_thread(post_question_prediction, job.question_id, forecast_payload)
+            await asyncio.to_thread(post_question_comment, job.post_id, job.comment)
+            record_submission(job, None, state_store)
+    job.done = True
+    return job
+
+
+def record_submission(
+    job: QuestionJob, accepted: asyncio.Future | None, state_store: ForecastStateStore | None
+) -> None:
+    if accepted is not None and (accepted.cancelled() or accepted.exception() is not None):
+        return
+    job.summary += "Posted: Forecast was posted to Metaculus.\n"
+    # Only forecasts that were accepted are recorded, so a dry run doesn't make later runs skip questions
+    if state_store is not None:
+        state_store.record_forecast(job.question_id, job.input_hash, job.research_digest)
+
 
-    return summary_of_forecast
+def submission_failures(jobs: list[QuestionJob]) -> list[tuple[QuestionJob, BaseException]]:
+    """
+    The jobs whose queued forecast was rejected. Call once the submission queue has been drained.
+    """
+    failures = []
+    for job in jobs:
+        if job.submission is None:
+            continue
+        if job.submission.cancelled():
+            failures.append((job, asyncio.CancelledError("Forecast submission was cancelled")))
+        elif job.submission.exception() is not None:
+            failures.append((job, job.submission.exception()))
+    return failures
+
+
+def build_forecast_pipeline(
+    submit_prediction: bool,
+    num_runs_per_question: int,
+    skip_previously_forecasted_questions: bool,
+    submission_queue: ForecastSubmissionQueue | None,
+    state_store: ForecastStateStore | None,
+    on_error,
+) -> Pipeline:
+    """
+    load -> research -> forecast -> aggregate -> submit, with each question flowing through the
+    stages independently so research, LLM calls and Metaculus writes overlap across questions.
+    """
+    return Pipeline(
+        [
+            Stage(
+                "load",
+                traced_stage("load", lambda job: load_question(job, skip_previously_forecasted_questions, state_store)),
+                PIPELINE_LOAD_WORKERS,
+                PIPELINE_QUEUE_SIZE,
+            ),
+            Stage(
+                "research",
+                traced_stage("research", lambda job: research_question(job, state_store)),
+                PIPELINE_RESEARCH_WORKERS,
+                PIPELINE_QUEUE_SIZE,
+            ),
+            Stage(
+                "forecast",
+                traced_stage("forecast", lambda job: sample_question_predictions(job, num_runs_per_question)),
+                PIPELINE_FORECAST_WORKERS,
+                PIPELINE_QUEUE_SIZE,
+            ),
+            Stage(
+                "aggregate",
+                traced_stage("aggregate", aggregate_question_predictions),
+                PIPELINE_AGGREGATE_WORKERS,
+                PIPELINE_QUEUE_SIZE,
+            ),
+            Stage(
+                "submit",
+                traced_stage(
+                    "submit",
+                    lambda job: submit_question_forecast(job, submit_prediction, submission_queue, state_store),
+                ),
+                PIPELINE_SUBMIT_WORKERS,
+                PIPELINE_QUEUE_SIZE,
+            ),
+        ],
+        on_error=on_error,
+    )
 
 
 async def forecast_questions(
-    open_question_id_post_id: list[tuple[int, int]],
+    open_question_id_post_id: list[tuple[int, int]] | AsyncIterator[tuple[int, int, dict]],
     submit_prediction: bool,
     num_runs_per_question: int,
     skip_previously_forecasted_questions: bool,
+    posts_by_id: dict[int, dict] | None = None,
+    state_store: ForecastStateStore | None = None,
 ) -> None:
-    forecast_tasks = [
-        forecast_individual_question(
-            question_id,
-            post_id,
+    """
+    Accepts either a list of (question_id, post_id) pairs or an async iterator of
+    (question_id, post_id, post_details), so questions can start forecasting while later ones
+    are still being loaded.
+    """
+    posts_by_id = posts_by_id or {}
+    failures: list[tuple[QuestionJob, BaseException]] = []
+
+    async def jobs():
+        if hasattr(open_question_id_post_id, "__aiter__"):
+            async for question_id, post_id, post_details in open_question_id_post_id:
+                yield QuestionJob(question_id, post_id, post_details)
+        else:
+            for question_id, post_id in open_question_id_post_id:
+                yield QuestionJob(question_id, post_id, posts_by_id.get(post_id))
+
+    # Forecasts are posted in batches and comments on a background worker
+    async with ForecastSubmissionQueue() as submission_queue:
+        pipeline = build_forecast_pipeline(
             submit_prediction,
             num_runs_per_question,
             skip_previously_forecasted_questions,
+            submission_queue,
+            state_store,
+            on_error=lambda job, e: failures.append((job, e)),
         )
-        for question_id, post_id in open_question_id_post_id
-    ]
-    forecast_summaries = await asyncio.gather(*forecast_tasks, return_exceptions=True)
+        finished_jobs = await pipeline.run(jobs())
+    failures.extend(submission_failures(finished_jobs))
     print("\n", "#" * 100, "\nForecast Summaries\n", "#" * 100)
 
+    for job in finished_jobs:
+        print(job.summary)
+
     errors = []
-    for question_id_post_id, forecast_summary in zip(
-        open_question_id_post_id, forecast_summaries
-    ):
-        question_id, post_id = question_id_post_id
-        if isinstance(forecast_summary, Exception):
-            print(
-                f"-----------------------------------------------\nPost {post_id} Question {question_id}:\nError: {forecast_summary.__class__.__name__} {forecast_summary}\nURL: https://www.metaculus.com/questions/{post_id}/\n"
-            )
-            errors.append(forecast_summary)
-        else:
-            print(forecast_summary)
+    for job, error in failures:
+        print(
+            f"-----------------------------------------------\nPost {job.post_id} Question {job.question_id}:\nError: {error.__class__.__name__} {error}\nURL: https://www.metaculus.com/questions/{job.post_id}/\n"
+        )
+        errors.append(error)
+
+    print(
+        f"Posted forecasts in {submission_queue.batches_posted} requests, "
+        f"{len(submission_queue.comment_errors)} comments failed"
+    )
+    print(pipeline.metrics_summary())
+    print(f"LLM calls: {llm_usage_stats.summary()}")
+    print(stream_stats.summary())
+    print(f"Traces:\n{tracer.summary()}")
+    print(adaptive_sampling_stats.summary())
+    if get_research_hedger() is not None:
+        print(get_research_hedger().summary())
+    print(research_store.summary())
+    print(research_compactor.summary())
+    print(rate_limiters.summary())
+    print(clients.summary())
 
     if errors:
         print("-----------------------------------------------\nErrors:\n")
@@ -1091,20 +1913,56 @@ async def forecast_questions(
         raise RuntimeError(error_message)
 
 
+async def forecast_tournament(
+    tournament_id: int | str,
+    submit_prediction: bool,
+    num_runs_per_question: int,
+    skip_previously_forecasted_questions: bool,
+    state_store: ForecastStateStore | None = None,
+) -> None:
+    """
+    Streams open questions from the paginated loader straight into the forecasting pipeline,
+    reusing the post details from the list payload instead of fetching each post again.
+    """
+
+    async def open_questions():
+        count = 0
+        async for post in stream_open_posts_from_tournament(tournament_id):
+            count += 1
+            yield post["question"]["id"], post["id"], post
+        print(f"Loaded {count} open questions from {tournament_id}")
+
+    await forecast_questions(
+        open_questions(),
+        submit_prediction,
+        num_runs_per_question,
+        skip_previously_forecasted_questions,
+        state_store=state_store,
+    )
 
 
 ######################## FINAL RUN #########################
 if __name__ == "__main__":
+    state_store = (
+        ForecastStateStore(max_age_seconds=FORECAST_MAX_AGE_HOURS * 60 * 60)
+        if INCREMENTAL_MODE
+        else None
+    )
     if USE_EXAMPLE_QUESTIONS:
-        open_question_id_post_id = EXAMPLE_QUESTIONS
+        run = forecast_questions(
+            EXAMPLE_QUESTIONS,
+            SUBMIT_PREDICTION,
+            NUM_RUNS_PER_QUESTION,
+            SKIP_PREVIOUSLY_FORECASTED_QUESTIONS,
+            state_store=state_store,
+        )
     else:
-        open_question_id_post_id = get_open_question_ids_from_tournament()
-
-    asyncio.run(
-        forecast_questions(
-            open_question_id_post_id,
+        run = forecast_tournament(
+            TOURNAMENT_ID,
             SUBMIT_PREDICTION,
             NUM_RUNS_PER_QUESTION,
             SKIP_PREVIOUSLY_FORECASTED_QUESTIONS,
+            state_store,
         )
-    )
+
+    asyncio.run(clients.closing(run))
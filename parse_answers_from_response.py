@@ -1,13 +1,179 @@
-from typing import Union
+from dataclasses import dataclass, field
+from typing import Iterator, Union
+import logging
 import re
 import unicodedata
+
+logger = logging.getLogger(__name__)
+
 DASH_RE = re.compile(r"[\u2010\u2011\u2012\u2013\u2014\u2015\u2212]")
 BULLET_CHARS = "•▪●‣–*-"
 NUM_PATTERN = re.compile(
-    r"^(?:percentile\s*)?(\d{1,3})\s*[:\-]\s*([+-]?\d+(?:\.\d+)?(?:e[+-]?\d+)?)\s*$",
+    r"^(?:percentile\s*)?(\d{1,3}(?:\.\d+)?)\s*[:\-]\s*([+-]?\d+(?:\.\d+)?(?:e[+-]?\d+)?)\s*$",
     re.IGNORECASE
 )
-VALID_KEYS = {1,5,10,15,20,25,30,35,40,45,50,55,60,65,70,75,80,85,90,95,99}
+VALID_KEYS = {0.1,1,5,10,15,20,25,30,35,40,45,50,55,60,65,70,75,80,85,90,95,99,99.9}
+
+# The line that introduces the final answer, per question type, in the spellings models use
+ANSWER_ANCHORS = {
+    'binary': ("Probability:", "probability:", "PROBABILITY:"),
+    'numeric': ("Distribution:", "distribution:", "DISTRIBUTION:"),
+    'multiple_choice': ("Probabilities:", "probabilities:", "PROBABILITIES:"),
+}
+# If no anchor is found verbatim, only this many trailing characters are normalized (NFKC) and searched again
+ANSWER_TAIL_CHARS = 4000
+# Lines after a "Distribution:" anchor that are read for percentiles
+MAX_SECTION_LINES = 60
+PROBABILITY_RE = re.compile(r"^\W*([+-]?\d+(?:\.\d+)?)")
+OPTION_LIST_RE = re.compile(r"[\s*]*\[([^\]\n]*)\]")
+
+
+@dataclass
+class ParseDiagnostics:
+    """
+    How the answer of a completion was found, or why it was not: which anchor (counted from the end)
+    was used, how much text had to be normalized and which lines of the answer section were rejected.
+    """
+
+    question_type: str
+    completion_chars: int
+    anchors_tried: int = 0
+    anchor_offset: int | None = None
+    normalized_chars: int = 0
+    lines_scanned: int = 0
+    values_found: int = 0
+    rejected: list[str] = field(default_factory=list)
+    error: str | None = None
+
+    def __str__(self) -> str:
+        found = "no anchor" if self.anchor_offset is None else f"anchor at {self.anchor_offset}/{self.completion_chars}"
+        text = (
+            f"{self.question_type}: {found}, {self.anchors_tried} anchors tried, {self.normalized_chars} chars "
+            f"normalized, {self.lines_scanned} lines scanned, {self.values_found} values"
+        )
+        if self.rejected:
+            text += f", rejected {self.rejected[:3]}"
+        if self.error:
+            text += f", error: {self.error}"
+        return text
+
+
+@dataclass
+class ParsedAnswer:
+    value: object
+    diagnostics: ParseDiagnostics
+
+
+def _anchor_offsets(content: str, anchors: tuple) -> Iterator[tuple[int, str]]:
+    # Reverse search: the final answer is at the end, so the reasoning before it is never read
+    end = len(content)
+    while True:
+        offset, anchor = max((content.rfind(anchor, 0, end), anchor) for anchor in anchors)
+        if offset < 0:
+            return
+        yield offset, anchor
+        end = offset
+
+
+def _line_after(content: str, start: int) -> str:
+    end = content.find("\n", start)
+    return content[start:] if end == -1 else content[start:end]
+
+
+def _parse_binary_section(content: str, start: int, diagnostics: ParseDiagnostics):
+    line = clean(_line_after(content, start))
+    diagnostics.lines_scanned += 1
+    match = PROBABILITY_RE.match(line)
+    if not match:
+        diagnostics.rejected.append(line[:80])
+        return None
+    diagnostics.values_found = 1
+    return float(match.group(1)) * 0.01
+
+
+def _parse_option_list_section(content: str, start: int, diagnostics: ParseDiagnostics, num_options: int = -1):
+    diagnostics.lines_scanned += 1
+    match = OPTION_LIST_RE.match(content, start)
+    if not match:
+        diagnostics.rejected.append(_line_after(content, start).strip()[:80])
+        return None
+    try:
+        numbers = [float(n.strip().rstrip("%")) for n in match.group(1).split(",") if n.strip()]
+    except ValueError:
+        diagnostics.rejected.append(match.group(0).strip()[:80])
+        return None
+    if not numbers or (num_options > 0 and len(numbers) != num_options):
+        diagnostics.rejected.append(f"{len(numbers)} probabilities, expected {num_options}: {numbers}")
+        return None
+    diagnostics.values_found = len(numbers)
+    return numbers
+
+
+def _parse_percentile_section(content: str, start: int, diagnostics: ParseDiagnostics):
+    percentiles = {}
+    lines = content[start:].split("\n", MAX_SECTION_LINES + 1)[1 : MAX_SECTION_LINES + 1]
+    for raw in lines:
+        line = clean(raw)
+        diagnostics.normalized_chars += len(raw)
+        diagnostics.lines_scanned += 1
+        if not line:
+            continue
+        match = NUM_PATTERN.match(line)
+        if not match:
+            diagnostics.rejected.append(line[:80])
+            continue
+        key, val_text = match.groups()
+        p = float(key)
+        p = int(p) if p.is_integer() else p
+        if p in VALID_KEYS:
+            percentiles[p] = float(val_text)
+    diagnostics.values_found = len(percentiles)
+    return percentiles or None
+
+
+_SECTION_PARSERS = {
+    'binary': _parse_binary_section,
+    'numeric': _parse_percentile_section,
+    'multiple_choice': _parse_option_list_section,
+}
+
+
+def _scan(content: str, question_type: str, diagnostics: ParseDiagnostics, offset_base: int = 0, **kwargs):
+    parse_section = _SECTION_PARSERS[question_type]
+    for offset, anchor in _anchor_offsets(content, ANSWER_ANCHORS[question_type]):
+        diagnostics.anchors_tried += 1
+        value = parse_section(content, offset + len(anchor), diagnostics, **kwargs)
+        if value is not None:
+            diagnostics.anchor_offset = offset_base + offset
+            return value
+    return None
+
+
+def extract_answer(content: str, question_type: str, num_options: int = -1) -> ParsedAnswer:
+    """
+    Finds the final answer of a completion for any question type ("binary", "numeric"/"discrete" or
+    "multiple_choice") by searching back from the end for its anchor ("Probability:", "Distribution:"
+    or "Probabilities:") and parsing only the section after it. Earlier anchors are tried if the last
+    one is not followed by a valid answer (e.g. the model restated the template). The cost depends on
+    the length of the answer, not of the reasoning before it. `value` is None if nothing was found.
+    """
+    if question_type == 'discrete':
+        question_type = 'numeric'
+    diagnostics = ParseDiagnostics(question_type, len(content))
+    kwargs = {'num_options': num_options} if question_type == 'multiple_choice' else {}
+    value = _scan(content, question_type, diagnostics, **kwargs)
+    if value is None and diagnostics.anchors_tried == 0:
+        # The anchor may be spelled with compatibility characters (e.g. a fullwidth colon)
+        tail_start = max(0, len(content) - ANSWER_TAIL_CHARS)
+        tail = unicodedata.normalize("NFKC", content[tail_start:])
+        diagnostics.normalized_chars += len(tail)
+        value = _scan(tail, question_type, diagnostics, offset_base=tail_start, **kwargs)
+    if value is None:
+        diagnostics.error = (
+            "no answer anchor" if diagnostics.anchors_tried == 0 else "no valid answer after any anchor"
+        )
+    return ParsedAnswer(value, diagnostics)
+
 
 def parse_answer(content, question):
     if question['question_type'] == 'binary':
@@ -18,37 +184,26 @@ def parse_answer(content, question):
         return parse_multiple_choice_probab_distr(content, len(question['options']))
 
 
-
-
 def parse_binary_probab(content):
-    for line in content.split('\n')[::-1]:
-        if "Probability: " in line:
-            probab = line.split('Probability: ')[-1].split('%')[0].replace('*', '')
-            try:
-                return float(probab) * 0.01
-            except:
-                return -1
-
-
+    """
+    The final "Probability: NN%" as a decimal, -1 if the anchor is there but not a number, None if there is none.
+    """
+    parsed = extract_answer(content, 'binary')
+    if parsed.value is None:
+        logger.debug(f"Binary answer not found: {parsed.diagnostics}")
+        return -1 if parsed.diagnostics.anchors_tried else None
+    return parsed.value
 
 
 def parse_multiple_choice_probab_distr(content: str, num_options: int = -1) -> list[float]:
     rv = extract_option_probabilities_from_response(content=content, num_options=num_options)
-    print(rv)
-    rv = normalize_probabilities(rv)
-    print(rv)
-    return rv
-    
+    return normalize_probabilities(rv)
+
 def extract_option_probabilities_from_response(content: str, num_options: int = -1) -> list[float]:
-    matches = re.findall(r"Probabilities:\s*\[([0-9.,\s]+)\]", content)
-    if not matches:
-        raise ValueError(f"Could not extract 'Probabilities' list from response: {content}")
-    last_match = matches[-1]
-    numbers = [float(n.strip()) for n in last_match.split(",") if n.strip()]
-    if num_options > 0:
-        if len(numbers) != num_options:
-            raise ValueError(f"Expected {num_options} probabilities, got {len(numbers)}: {numbers}")
-    return numbers
+    parsed = extract_answer(content, 'multiple_choice', num_options)
+    if parsed.value is None:
+        raise ValueError(f"Could not extract 'Probabilities' list from response ({parsed.diagnostics})")
+    return parsed.value
 
 def normalize_probabilities(probs: list[float]) -> list[float]:
     if max(probs) > 1:
@@ -61,49 +216,27 @@ def normalize_probabilities(probs: list[float]) -> list[float]:
     return normed
 
 
-
-
-
-
 def clean(s: str) -> str:
-    # 1) Normalize compatibility forms
+    # 1) Remove NBSP thousands separators (before NFKC, which would turn them into plain spaces)
+    s = s.replace("\u00A0", "").replace("\u202F", "")
+    # 2) Normalize compatibility forms
     s = unicodedata.normalize("NFKC", s)
-    # 2) Replace every dash‐like char with ASCII hyphen
+    # 3) Replace every dash‐like char with ASCII hyphen
     s = DASH_RE.sub("-", s)
-    # 3) Strip bullets from the start
-    s = s.strip().lstrip(BULLET_CHARS)
-    # 4) Remove thousands-sep commas & NBSPs
-    s = s.replace(",", "").replace("\u00A0", "")
+    # 4) Strip bullets (and the space after them) from the start
+    s = s.strip().lstrip(BULLET_CHARS).lstrip()
+    # 5) Remove markdown emphasis & thousands-sep commas
+    s = s.replace("*", "").replace(",", "")
     return s.lower()
-    
+
 def extract_percentiles_from_response(content: Union[str, list], verbose: bool = False) -> dict:
-    lines = content if isinstance(content, list) else content.splitlines()
-    percentiles = {}
-    collecting = False
-    for idx, raw in enumerate(lines, 1):
-        line = clean(str(raw))
-        if not collecting and "distribution:" in line:
-            collecting = True
-            if verbose:
-                print(f"🚩 Found 'Distribution:' anchor at line {idx}")
-            continue
-        if not collecting:
-            continue
-        match = NUM_PATTERN.match(line)
-        if not match:
-            if verbose:
-                print(f"⛔ No match on line {idx}: {line}")
-            continue
-        key, val_text = match.groups()
-        try:
-            p = int(key)
-            val = float(val_text)
-            if p in VALID_KEYS:
-                percentiles[p] = val
-                if verbose:
-                    print(f"✅ Matched Percentile {p}: {val}")
-        except Exception as e:
-            print(f"❌ Failed parsing line {idx}: {line} → {e}")
-    if not percentiles:
-        raise ValueError("❌ No valid percentiles extracted.")
-    return percentiles
\ No newline at end of file
+    """
+    The percentiles after the last "Distribution:" anchor that is followed by any, as {percentile: value}.
+    """
+    text = "\n".join(map(str, content)) if isinstance(content, list) else content
+    parsed = extract_answer(text, 'numeric')
+    if verbose:
+        logger.info(f"Percentile parse: {parsed.diagnostics}")
+    if parsed.value is None:
+        raise ValueError(f"No valid percentiles extracted ({parsed.diagnostics})")
+    return parsed.value
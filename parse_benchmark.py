@@ -0,0 +1,302 @@
+import argparse
+import gc
+import json
+import os
+import random
+import re
+import timeit
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+PARSE_BENCHMARK_BASELINE_PATH = os.getenv("PARSE_BENCHMARK_BASELINE_PATH", "benchmarks/parse_baseline.json")
+# A case this much slower than the baseline (after calibrating for the machine's speed) fails --check
+PARSE_BENCHMARK_TOLERANCE = float(os.getenv("PARSE_BENCHMARK_TOLERANCE", "0.5"))
+# Peak allocations do not depend on the machine, so they are held to a tighter tolerance
+PARSE_BENCHMARK_ALLOCATION_TOLERANCE = float(os.getenv("PARSE_BENCHMARK_ALLOCATION_TOLERANCE", "0.1"))
+CORPUS_SIZES = (10_000, 30_000, 100_000)
+
+NUMERIC_PERCENTILES = [0.1, 1, 5, 10, 20, 40, 60, 80, 90, 95, 99, 99.9]
+OPTIONS = ["Red", "Green", "Blue", "Yellow"]
+
+# Lines as models actually write them: markdown, unicode dashes and minus signs, bullets, thousands
+# separators, NBSPs, percentages and the occasional mention of a percentile in the reasoning
+_REASONING_LINES = [
+    "## Base rates",
+    "Historically, about 12% of comparable events resolved Yes within a two‑year window.",
+    "• The 2019–2023 average was 1,245,000 units, with a low of 980,500 in 2020.",
+    "• Analysts at the ministry expect growth of 3.5 % — roughly in line with trend.",
+    "- **Status quo:** nothing changes unless the committee meets before the deadline.",
+    "▪ Market-implied odds are near 40%, though liquidity is thin (−$2,300 net flow).",
+    "* The 90th percentile of past outcomes is around 1,600,000; the 10th is near 900,000.",
+    "The time left until resolution is roughly 14 months, which leaves room for surprises.",
+    "> “We do not anticipate a decision before Q3,” a spokesperson said on 2025‑04‑12.",
+    "1. Upside scenario: an early agreement lifts the figure by 15–20%.",
+    "2. Downside scenario: a delay of 6–9 months keeps it flat at ∼1.1m.",
+    "Good forecasters weight the status quo heavily because the world changes slowly.",
+    "",
+]
+
+
+@dataclass
+class Completion:
+    name: str
+    kind: str  # "binary", "numeric", "option_list" or "option_lines"
+    text: str
+
+
+def _reasoning(rng: random.Random, size: int) -> str:
+    lines = []
+    length = 0
+    while length < size:
+        line = rng.choice(_REASONING_LINES)
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+
+def _answer(kind: str, style: str, rng: random.Random) -> str:
+    bullet = "• " if style == "markdown" else ""
+    if kind == "binary":
+        probability = rng.randint(5, 95)
+        return f"**Probability: {probability}%**" if style == "markdown" else f"Probability: {probability}%"
+    if kind == "numeric":
+        lines = ["**Distribution:**" if style == "markdown" else "Distribution:"]
+        value = rng.uniform(800_000, 1_000_000)
+        for percentile in NUMERIC_PERCENTILES:
+            value += rng.uniform(10_000, 80_000)
+            number = f"{value:,.0f}" if style == "markdown" else f"{value:.0f}"
+            separator = " – " if style == "markdown" and percentile >= 90 else ": "
+            lines.append(f"{bullet}Percentile {percentile:g}{separator}{number}")
+        return "\n".join(lines)
+    weights = [rng.randint(5, 40) for _ in OPTIONS]
+    probabilities = [round(100 * weight / sum(weights)) for weight in weights]
+    if kind == "option_list":
+        return f"Probabilities: [{', '.join(map(str, probabilities))}]"
+    return "\n".join(f"{bullet}{option}: {probability}%" for option, probability in zip(OPTIONS, probabilities))
+
+
+def build_corpus(sizes: tuple[int, ...] = CORPUS_SIZES, seed: int = 0) -> list[Completion]:
+    """
+    Long completions of every answer kind and style: reasoning of each of `sizes` characters
+    followed by the final answer, as the forecast prompts ask for it.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for kind in ("binary", "numeric", "option_list", "option_lines"):
+        for style in ("plain", "markdown"):
+            for size in sizes:
+                text = f"{_reasoning(rng, size)}\n\n{_answer(kind, style, rng)}\n"
+                corpus.append(Completion(f"{kind}/{style}/{size // 1000}k", kind, text))
+    return corpus
+
+
+@dataclass
+class Case:
+    name: str
+    func: Callable
+    args: tuple
+    chars: int = 0
+
+    def call(self):
+        """
+        A parser that gives up on a completion is timed too; the error is part of its result.
+        """
+        try:
+            return self.func(*self.args)
+        except ValueError as e:
+            return e
+
+
+def build_cases(corpus: list[Completion]) -> list[Case]:
+    import main_with_no_framework as no_framework
+    import parse_answers_from_response as parsers
+
+    parsers_by_kind = {
+        "binary": [
+            ("parse_binary_probab", parsers.parse_binary_probab, ()),
+            (
+                "no_framework.extract_probability",
+                no_framework.extract_probability_from_response_as_percentage_not_decimal,
+                (),
+            ),
+        ],
+        "numeric": [
+            ("extract_percentiles_from_response", parsers.extract_percentiles_from_response, ()),
+            ("no_framework.extract_percentiles", no_framework.extract_percentiles_from_response, ()),
+        ],
+        "option_list": [
+            ("extract_option_probabilities_from_response", parsers.extract_option_probabilities_from_response, (len(OPTIONS),)),
+        ],
+        "option_lines": [
+            ("no_framework.extract_option_probabilities", no_framework.extract_option_probabilities_from_response, (OPTIONS,)),
+        ],
+    }
+    cases = []
+    for completion in corpus:
+        for name, func, extra_args in parsers_by_kind[completion.kind]:
+            cases.append(Case(f"{name}[{completion.name}]", func, (completion.text, *extra_args), len(completion.text)))
+
+    percentile_values = parsers.extract_percentiles_from_response(
+        next(c for c in corpus if c.kind == "numeric" and "plain" in c.name).text
+    )
+    values = sorted(percentile_values.values())
+    lower, upper = values[0] * 0.5, values[-1] * 1.5
+    for name, zero_point, cdf_size in (("continuous", None, 201), ("log_scaled", 0.0, 201), ("discrete", None, 51)):
+        settings = ("numeric", True, False, upper, lower, zero_point, cdf_size)
+        cases.append(
+            Case(f"generate_continuous_cdf[{name}]", no_framework.generate_continuous_cdf, (percentile_values, *settings))
+        )
+    samples = [
+        {percentile: value * (1 + 0.02 * index) for percentile, value in percentile_values.items()} for index in range(5)
+    ]
+    cases.append(
+        Case(
+            "generate_continuous_cdfs[5_samples]",
+            no_framework.generate_continuous_cdfs,
+            (samples, "numeric", True, False, upper, lower, None, 201),
+        )
+    )
+    return cases
+
+
+def time_per_call_ns(func: Callable, repeat: int = 3) -> float:
+    """
+    Best of `repeat` timings of enough calls to take 0.2 s each, in nanoseconds per call.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def peak_allocation_bytes(func: Callable) -> int:
+    """
+    How much memory one call allocates at its high-water mark, above what was allocated before it.
+    """
+    func()  # compiled regexes and other caches are not the call's own allocations
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before
+
+
+def calibration_ns() -> float:
+    """
+    Time of a fixed pure-Python and regex workload, so baselines recorded on another machine can be
+    scaled to this one.
+    """
+    text = "\n".join(_REASONING_LINES) * 50
+    pattern = re.compile(r"(\d+(?:,\d{3})*)")
+
+    def workload():
+        return sum(len(pattern.findall(line)) for line in text.splitlines())
+
+    return time_per_call_ns(workload)
+
+
+@dataclass
+class CaseResult:
+    name: str
+    chars: int
+    ns_per_call: float
+    peak_alloc_bytes: int
+    error: str | None = None
+
+    def summary(self, width: int) -> str:
+        per_char = f"{self.ns_per_call / self.chars:>8.2f}" if self.chars else f"{'':>8}"
+        return (
+            f"{self.name:<{width}}  {self.ns_per_call:>14,.0f} {per_char} {self.peak_alloc_bytes / 1024:>11,.1f}"
+            f"  {self.error or ''}"
+        )
+
+
+def run_cases(cases: list[Case]) -> list[CaseResult]:
+    results = []
+    for case in cases:
+        outcome = case.call()
+        error = f"{outcome.__class__.__name__}: {str(outcome)[:60]}" if isinstance(outcome, Exception) else None
+        peak = peak_allocation_bytes(case.call)
+        results.append(CaseResult(case.name, case.chars, time_per_call_ns(case.call), peak, error))
+    return results
+
+
+def summarize(results: list[CaseResult]) -> str:
+    width = max(len(result.name) for result in results)
+    lines = [f"{'case':<{width}}  {'ns/call':>14} {'ns/char':>8} {'peak KiB':>11}  error"]
+    lines += [result.summary(width) for result in results]
+    return "\n".join(lines)
+
+
+def check_against_baseline(
+    results: list[CaseResult],
+    baseline: dict,
+    tolerance: float = PARSE_BENCHMARK_TOLERANCE,
+    allocation_tolerance: float = PARSE_BENCHMARK_ALLOCATION_TOLERANCE,
+) -> list[str]:
+    """
+    The regressions against the baseline, as messages. Baseline times are first scaled by how much
+    faster or slower this machine runs the calibration workload.
+    """
+    speed = calibration_ns() / baseline["calibration_ns"]
+    regressions = []
+    for result in results:
+        expected = baseline["cases"].get(result.name)
+        if expected is None:
+            continue
+        if result.ns_per_call > expected["ns_per_call"] * speed * (1 + tolerance):
+            regressions.append(
+                f"{result.name}: {result.ns_per_call:,.0f} ns/call, baseline {expected['ns_per_call'] * speed:,.0f} "
+                f"(scaled by {speed:.2f} for this machine)"
+            )
+        if result.peak_alloc_bytes > expected["peak_alloc_bytes"] * (1 + allocation_tolerance) + 1024:
+            regressions.append(
+                f"{result.name}: {result.peak_alloc_bytes:,} bytes allocated, baseline {expected['peak_alloc_bytes']:,}"
+            )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks of the answer parsers and CDF generation over long synthetic completions"
+    )
+    parser.add_argument("--filter", help="Only run the cases whose name contains this text")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=list(CORPUS_SIZES), help="Characters of reasoning per completion"
+    )
+    parser.add_argument("--baseline", default=PARSE_BENCHMARK_BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=PARSE_BENCHMARK_TOLERANCE)
+    parser.add_argument("--check", action="store_true", help="Exit with an error if a case regressed past the tolerance")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    args = parser.parse_args()
+
+    cases = build_cases(build_corpus(tuple(args.sizes)))
+    if args.filter:
+        cases = [case for case in cases if args.filter in case.name]
+    results = run_cases(cases)
+    print(summarize(results))
+
+    if args.update_baseline:
+        baseline = {"calibration_ns": calibration_ns(), "cases": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline["cases"] = json.load(f).get("cases", {})
+        baseline["cases"].update({result.name: asdict(result) for result in results})
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+    elif args.check:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = check_against_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("Parser regressions:\n" + "\n".join(f"- {regression}" for regression in regressions))
+            raise SystemExit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable
+
+
+@dataclass
+class StageMetrics:
+    processed: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    max_queue_depth: int = 0
+    queue_depth_total: int = 0
+    queue_depth_samples: int = 0
+
+    def record_queue_depth(self, depth: int) -> None:
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self.queue_depth_total += depth
+        self.queue_depth_samples += 1
+
+    @property
+    def mean_queue_depth(self) -> float:
+        return self.queue_depth_total / self.queue_depth_samples if self.queue_depth_samples else 0.0
+
+
+@dataclass
+class Stage:
+    """
+    One step of a Pipeline. `func` receives an item and returns the (possibly updated) item for the
+    next stage. `workers` items are processed concurrently; at most `queue_size` items wait in front
+    of the stage, so a slow stage pushes back on the ones before it.
+    """
+
+    name: str
+    func: Callable[[Any], Awaitable[Any]]
+    workers: int = 1
+    queue_size: int = 4
+    metrics: StageMetrics = field(default_factory=StageMetrics)
+
+
+_DONE = object()
+
+
+class Pipeline:
+    """
+    Runs items through a sequence of stages connected by bounded queues, so different items can be
+    in different stages at the same time. An item whose stage raises is reported through
+    `on_error(item, exception)` and goes no further. `run` returns the items that made it through
+    every stage, in completion order.
+    """
+
+    def __init__(
+        self,
+        stages: list[Stage],
+        on_error: Callable[[Any, BaseException], None] | None = None,
+    ) -> None:
+        self.stages = stages
+        self.on_error = on_error
+        self.elapsed_seconds = 0.0
+
+    async def _put(self, queue: asyncio.Queue, stage: Stage, item: Any) -> None:
+        await queue.put(item)
+        stage.metrics.record_queue_depth(queue.qsize())
+
+    async def _run_stage(
+        self, index: int, queues: list[asyncio.Queue], results: list
+    ) -> None:
+        stage = self.stages[index]
+        inbox = queues[index]
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            start = time.perf_counter()
+            try:
+                item = await stage.func(item)
+            except Exception as e:
+                stage.metrics.failed += 1
+                if self.on_error is not None:
+                    self.on_error(item, e)
+                continue
+            finally:
+                stage.metrics.busy_seconds += time.perf_counter() - start
+            stage.metrics.processed += 1
+            if index + 1 < len(self.stages):
+                await self._put(queues[index + 1], self.stages[index + 1], item)
+            else:
+                results.append(item)
+
+    async def run(self, source: AsyncIterable | Iterable) -> list:
+        start = time.perf_counter()
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        results: list = []
+        worker_groups = [
+            [
+                asyncio.create_task(self._run_stage(index, queues, results))
+                for _ in range(stage.workers)
+            ]
+            for index, stage in enumerate(self.stages)
+        ]
+        try:
+            if hasattr(source, "__aiter__"):
+                async for item in source:  # type: ignore
+                    await self._put(queues[0], self.stages[0], item)
+            else:
+                for item in source:  # type: ignore
+                    await self._put(queues[0], self.stages[0], item)
+            # Close the stages in order once everything upstream of them has finished
+            for index, workers in enumerate(worker_groups):
+                for _ in workers:
+                    await queues[index].put(_DONE)
+                await asyncio.gather(*workers)
+        finally:
+            for workers in worker_groups:
+                for worker in workers:
+                    worker.cancel()
+            self.elapsed_seconds = time.perf_counter() - start
+        return results
+
+    def metrics_summary(self) -> str:
+        minutes = max(self.elapsed_seconds, 1e-9) / 60
+        lines = [f"Pipeline finished in {self.elapsed_seconds:.1f}s:"]
+        for stage in self.stages:
+            metrics = stage.metrics
+            lines.append(
+                f"- {stage.name} ({stage.workers} workers): {metrics.processed} done, {metrics.failed} failed, "
+                f"{metrics.processed / minutes:.1f}/min, busy {metrics.busy_seconds:.1f}s, "
+                f"queue depth mean {metrics.mean_queue_depth:.1f} max {metrics.max_queue_depth}"
+            )
+        return "\n".join(lines)
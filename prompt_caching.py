@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from contextlib import AbstractAsyncContextManager, nullcontext
+from dataclasses import dataclass
+from typing import Callable
+
+from llm_streaming import LLM_STREAM_MAX_ATTEMPTS, AnswerFormat, MalformedCompletion, stream_choices
+from rate_limiting import call_with_backoff, estimate_tokens
+from response_cache import ResponseCache, llm_cache_params
+
+logger = logging.getLogger(__name__)
+
+
+def supports_cache_control(model: str) -> bool:
+    """
+    Anthropic (and Gemini) models only cache prompts that mark a `cache_control` breakpoint.
+    OpenAI models cache long prompt prefixes automatically.
+    """
+    return any(name in model for name in ("anthropic", "claude", "gemini"))
+
+
+def supports_n_sampling(model: str) -> bool:
+    """
+    Whether one request can return several completions (`n`). OpenRouter and Anthropic ignore it.
+    """
+    provider, _, name = model.partition("/")
+    if not name:
+        return model.startswith(("gpt-", "o1", "o3", "o4"))
+    return provider in ("openai", "azure")
+
+
+def _provider(model: str) -> str:
+    return model.split("/", 1)[0] if "/" in model else "openai"
+
+
+def cached_prompt_messages(prefix: str, suffix: str, model: str) -> list[dict]:
+    """
+    A single user message with the stable prefix first. For models that need it, the prefix is a
+    separate content block marked as a cache breakpoint.
+    """
+    if supports_cache_control(model):
+        content = [
+            {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": suffix},
+        ]
+        return [{"role": "user", "content": content}]
+    return [{"role": "user", "content": f"{prefix}\n\n{suffix}"}]
+
+
+@dataclass
+class PromptCacheStats:
+    requests: int = 0
+    completions: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+
+    def record(self, usage, completions: int) -> None:
+        self.requests += 1
+        self.completions += completions
+        if usage is None:
+            return
+        self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details is not None else None
+        if not cached:
+            # Anthropic reports cache reads separately
+            cached = getattr(usage, "cache_read_input_tokens", 0)
+        self.cached_tokens += cached or 0
+
+    def summary(self) -> str:
+        hit_rate = self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+        return (
+            f"Prompt cache: {self.cached_tokens}/{self.prompt_tokens} prompt tokens served from cache "
+            f"({100 * hit_rate:.0f}%), {self.completions} completions from {self.requests} requests"
+        )
+
+
+class PromptSampler:
+    """
+    Produces the repeated samples of one prompt with as few uncached prompt tokens as possible.
+
+    The prompt is sent as (prefix, suffix) with the prefix marked cacheable. The first caller of
+    `take` for a prompt requests all `n` samples: in one request if the model supports `n`,
+    otherwise one request first (which writes the provider's prompt cache) and the remaining n-1
+    at once (which read it). The later callers for the same prompt are handed the extra samples
+    instead of making their own requests.
+    """
+
+    def __init__(
+        self,
+        cache: ResponseCache | None = None,
+        limit: Callable[[], AbstractAsyncContextManager] | None = None,
+    ) -> None:
+        self.cache = cache or ResponseCache()
+        self.limit = limit or nullcontext
+        self.stats: dict[str, PromptCacheStats] = defaultdict(PromptCacheStats)
+        self._pools: dict[str, list[str]] = defaultdict(list)
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    async def _complete(
+        self, llm, messages: list[dict], n: int, answer_format: AnswerFormat | None = None
+    ) -> list[str]:
+        """
+        Streams the completions so a malformed one (see llm_streaming) is abandoned as soon as it is
+        noticed. If none of the completions is usable the request is made again right away.
+        """
+        import litellm
+
+        # As in GeneralLlm, params the provider does not support are dropped rather than rejected
+        kwargs = {
+            **llm.litellm_kwargs,
+            "model": llm.model,
+            "drop_params": True,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        if n > 1:
+            kwargs["n"] = n
+        for attempt in range(1, LLM_STREAM_MAX_ATTEMPTS + 1):
+            answers = []
+            async with self.limit():
+                stream = await call_with_backoff(
+                    _provider(llm.model),
+                    lambda: litellm.acompletion(messages=messages, **kwargs),
+                    tokens=estimate_tokens(json.dumps(messages)),
+                )
+                choices = stream_choices(
+                    stream, llm.model, answer_format, n=n, record_usage=self.stats[llm.model].record
+                )
+                try:
+                    async for _, answer, _ in choices:
+                        if answer:
+                            answers.append(answer)
+                finally:
+                    await choices.aclose()
+            if answers:
+                return answers
+            logger.info(f"{llm.model} returned no usable answer, attempt {attempt}/{LLM_STREAM_MAX_ATTEMPTS}")
+        raise MalformedCompletion(f"{llm.model} returned no usable answer in {LLM_STREAM_MAX_ATTEMPTS} attempts")
+
+    async def sample(
+        self, llm, prefix: str, suffix: str, n: int, answer_format: AnswerFormat | None = None
+    ) -> list[str]:
+        messages = cached_prompt_messages(prefix, suffix, llm.model)
+        samples: list[str] = []
+        if n > 1 and supports_n_sampling(llm.model):
+            try:
+                samples = await self._complete(llm, messages, n, answer_format)
+            except Exception as e:
+                logger.info(f"Sampling {n} completions in one request failed, falling back to separate requests: {e}")
+        if not samples:
+            samples = await self._complete(llm, messages, 1, answer_format)
+        missing = n - len(samples)
+        if missing > 0:
+            more = await asyncio.gather(
+                *[self._complete(llm, messages, 1, answer_format) for _ in range(missing)]
+            )
+            samples += [answer for answers in more for answer in answers[:1]]
+        return samples[:n]
+
+    async def sample_batch(
+        self, llm, prefix: str, suffix: str, n: int, answer_format: AnswerFormat | None = None
+    ) -> list[str]:
+        """
+        Returns n samples of the prompt, through the response cache.
+        """
+        value = await self.cache.get_or_compute(
+            "prediction_samples",
+            [prefix, suffix],
+            llm.model,
+            lambda: self._encode(self.sample(llm, prefix, suffix, n, answer_format)),
+            params={**llm_cache_params(llm), "n": n},
+        )
+        return json.loads(value)
+
+    @staticmethod
+    async def _encode(samples) -> str:
+        return json.dumps(await samples)
+
+    async def take(
+        self, llm, prefix: str, suffix: str, n: int, answer_format: AnswerFormat | None = None
+    ) -> str:
+        """
+        Returns one sample of the prompt, sharing a batch of `n` with the other callers of the same prompt.
+        """
+        key = self.cache.make_key("prediction_samples", [prefix, suffix], llm.model, llm_cache_params(llm))
+        while True:
+            if self._pools[key]:
+                return self._pools[key].pop(0)
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                break
+            try:
+                await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                if not in_flight.cancelled():
+                    raise
+                break
+            except Exception:
+                break
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            samples = await self.sample_batch(llm, prefix, suffix, n, answer_format)
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+        self._pools[key].extend(samples[1:])
+        future.set_result(None)
+        return samples[0]
+
+    def summary(self) -> str:
+        if not self.stats:
+            return "Prompt cache: no sampled requests"
+        return "\n".join(f"{model}: {stats.summary()}" for model, stats in sorted(self.stats.items()))
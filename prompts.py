@@ -4,10 +4,37 @@ import datetime
 def format_article_in_str(article):
     return f"**{article['eng_title']}**\n{article['summary']}\nOriginal language: {article['language']}\nPublish date: {article['pub_date']}\nSource:[{article['source_id']}]({article['article_url']})\n\n"
 
-def get_binary_prompt_with_research(question, research):
-    prompt_with_research = clean_indents(f"""
+def get_binary_prompt_parts_with_research(question, research):
+    """
+    Returns (prefix, suffix). The prefix holds everything that is the same for every sample of a
+    question (instructions, the question, the research) so providers can cache it; the suffix is short.
+    """
+    prefix = clean_indents(f"""
             You are a professional forecaster interviewing for a job.
 
+            Before answering you write:
+            (a) The time left until the outcome to the question is known.
+            (b) The status quo outcome if nothing changed.
+            (c) A brief description of a scenario that results in a No outcome.
+            (d) A brief description of a scenario that results in a Yes outcome.
+
+            You write your rationale remembering that good forecasters put extra weight on the status quo outcome since the world changes slowly most of the time.
+
+            Format your answer as below, it is very important to follow this format exactly, especially for the final probability, as a regex looking for 'Probability:' will be used to extract your answer.
+
+            Analysis:
+            {{Insert your analysis here, following the above components.}}
+
+            Probability calibration
+            {{Insert your calibration of your inside view prediction here.}}
+
+            Checklist:
+            {{Shortened, brief checklist verification here}}
+
+            Probability: ZZ%
+
+            ------------------------------------------------------------------------
+
             Your interview question is:
             {question['question_text']}
 
@@ -23,34 +50,20 @@ def get_binary_prompt_with_research(question, research):
 
             Your research assistant was asked some relevant questions to research using the internet which are documented next. Please bear in mind that these are sourced from the internet and feel free to exercise skepticism based on the sources:
             {research}
+            """
+        )
+    suffix = clean_indents(f"""
+            ------------------------------------------------------------------------
 
             Today is {datetime.datetime.now().strftime("%Y-%m-%d")}.
 
-            Before answering you write:
-            (a) The time left until the outcome to the question is known.
-            (b) The status quo outcome if nothing changed.
-            (c) A brief description of a scenario that results in a No outcome.
-            (d) A brief description of a scenario that results in a Yes outcome.
-
-            You write your rationale remembering that good forecasters put extra weight on the status quo outcome since the world changes slowly most of the time.
-
-            ------------------------------------------------------------------------
-
-            Format your answer as below, it is very important to follow this format exactly, especially for the final probability, as a regex looking for 'Probability:' will be used to extract your answer.
-            
-            Analysis:
-            {{Insert your analysis here, following the above components.}}
-            
-            Probability calibration
-            {{Insert your calibration of your inside view prediction here.}}
-            
-            Checklist:
-            {{Shortened, brief checklist verification here}}
-            
-            Probability: ZZ%
+            Now write your answer in the format above, ending with "Probability: ZZ%".
             """
         )
-    return prompt_with_research
+    return prefix.strip(), suffix.strip()
+
+def get_binary_prompt_with_research(question, research):
+    return "\n\n".join(get_binary_prompt_parts_with_research(question, research))
 
 def get_binary_prompt_without_research(question):
     prompt_without_research = clean_indents(f"""
@@ -84,30 +97,13 @@ def get_binary_prompt_without_research(question):
     return prompt_without_research
 
 
-def get_numeric_prompt_with_research(question, research):
-    prompt_with_research = clean_indents(f"""
+def get_numeric_prompt_parts_with_research(question, research):
+    """
+    Returns (prefix, suffix), see get_binary_prompt_parts_with_research.
+    """
+    prefix = clean_indents(f"""
             You are a professional forecaster interviewing for a job.
 
-            Your interview question is:
-            {question['question_text']}
-
-            Question background:
-            {question['background_info']}
-
-
-            This question's outcome will be determined by the specific criteria below. These criteria have not yet been satisfied:
-            {question['resolution_criteria']}
-
-            {question['fine_print']}
-
-            Units for answer: {question['unit_of_measure']}
-            The answer is expected to be above {question['lower_bound']} and below {question['upper_bound']}. Think carefully, and reconsider your sources, if your projections are outside this range.
-
-            Your research assistant was asked some relevant questions to research using the internet which are documented next. Please bear in mind that these are sourced from the internet and feel free to exercise skepticism based on the sources:
-            {research}
-
-            Today is {datetime.datetime.now().strftime("%Y-%m-%d")}.
-
             Before answering you write:
             (a) The time left until the outcome to the question is known.
             (b) The status quo outcome if nothing changed.
@@ -116,24 +112,21 @@ def get_numeric_prompt_with_research(question, research):
 
             You write your rationale remembering that good forecasters put extra weight on the status quo outcome since the world changes slowly most of the time.
 
-            
-            ------------------------------------------------------------------------
-            
             **Essential formatting requirements**
-            (a) For large numbers, please DO NOT output commas between numbers like 1,000,000. Instead, just write 1000000. If not, this will cause a parsing error. 
-            (b) You MUST prefix the final percentiles with Distribution: as a regex will be programmed to read text below 'Distribution:'. 
-            
-            Format your answer as below. 
-            
+            (a) For large numbers, please DO NOT output commas between numbers like 1,000,000. Instead, just write 1000000. If not, this will cause a parsing error.
+            (b) You MUST prefix the final percentiles with Distribution: as a regex will be programmed to read text below 'Distribution:'.
+
+            Format your answer as below.
+
             Analysis:
             {{Insert your analysis here, following the above components. You can segment your analysis across multiple final answer ranges if you find it useful.}}
-            
+
             Probability calibration
             {{Insert your calibration of your inside view prediction here.}}
-            
+
             Checklist:
             {{Shortened, brief checklist verification here}}
-            
+
             Distribution:
             Percentile 0.1: XX
             Percentile 1: XX
@@ -147,9 +140,41 @@ def get_numeric_prompt_with_research(question, research):
             Percentile 95: XX
             Percentile 99: XX
             Percentile 99.9: XX
+
+            ------------------------------------------------------------------------
+
+            Your interview question is:
+            {question['question_text']}
+
+            Question background:
+            {question['background_info']}
+
+
+            This question's outcome will be determined by the specific criteria below. These criteria have not yet been satisfied:
+            {question['resolution_criteria']}
+
+            {question['fine_print']}
+
+            Units for answer: {question['unit_of_measure']}
+            The answer is expected to be above {question['lower_bound']} and below {question['upper_bound']}. Think carefully, and reconsider your sources, if your projections are outside this range.
+
+            Your research assistant was asked some relevant questions to research using the internet which are documented next. Please bear in mind that these are sourced from the internet and feel free to exercise skepticism based on the sources:
+            {research}
             """
         )
-    return prompt_with_research
+    suffix = clean_indents(f"""
+            ------------------------------------------------------------------------
+
+            Today is {datetime.datetime.now().strftime("%Y-%m-%d")}.
+
+            Now write your answer in the format above, ending with the "Distribution:" percentiles.
+            """
+        )
+    return prefix.strip(), suffix.strip()
+
+
+def get_numeric_prompt_with_research(question, research):
+    return "\n\n".join(get_numeric_prompt_parts_with_research(question, research))
 
 
 def get_numeric_prompt_without_research(question):
@@ -199,10 +224,36 @@ def get_numeric_prompt_without_research(question):
     return prompt_without_research
 
 
-def get_multiple_choice_prompt_with_research(question, research):
-    prompt_with_research = clean_indents(f"""
+def get_multiple_choice_prompt_parts_with_research(question, research):
+    """
+    Returns (prefix, suffix), see get_binary_prompt_parts_with_research.
+    """
+    prefix = clean_indents(f"""
             You are a professional forecaster interviewing for a job.
 
+            Before answering you write:
+            (a) The time left until the outcome to the question is known.
+            (b) The status quo outcome if nothing changed.
+            (c) A brief description of a scenario that results in a No outcome.
+            (d) A brief description of a scenario that results in a Yes outcome.
+
+            You write your rationale remembering that good forecasters put extra weight on the status quo outcome since the world changes slowly most of the time.
+
+            Format your answer as below and be sure to follow the formatting requirements else automated regex extraction will fail.
+
+            Analysis:
+            {{Insert your analysis here, following the above components. You can segment your analysis across multiple categories of options if you find it useful.}}
+
+            Probability calibration
+            {{Insert your calibration of your inside view prediction here.}}
+
+            Checklist:
+            {{Shortened, brief checklist verification here}}
+
+            Probabilities: [Probability_A, Probability_B, ..., Probability_N]
+
+            ------------------------------------------------------------------------
+
             Your interview question is:
             {question['question_text']}
 
@@ -219,35 +270,20 @@ def get_multiple_choice_prompt_with_research(question, research):
 
             Your research assistant was asked some relevant questions to research using the internet which are documented next. Please bear in mind that these are sourced from the internet and feel free to exercise skepticism based on the sources:
             {research}
+            """
+        )
+    suffix = clean_indents(f"""
+            ------------------------------------------------------------------------
 
             Today is {datetime.datetime.now().strftime("%Y-%m-%d")}.
 
-            Before answering you write:
-            (a) The time left until the outcome to the question is known.
-            (b) The status quo outcome if nothing changed.
-            (c) A brief description of a scenario that results in a No outcome.
-            (d) A brief description of a scenario that results in a Yes outcome.
-
-            You write your rationale remembering that good forecasters put extra weight on the status quo outcome since the world changes slowly most of the time.
-
-            
-            ------------------------------------------------------------------------
-            
-            Format your answer as below and be sure to follow the formatting requirements else automated regex extraction will fail.
-            
-            Analysis:
-            {{Insert your analysis here, following the above components. You can segment your analysis across multiple categories of options if you find it useful.}}
-            
-            Probability calibration
-            {{Insert your calibration of your inside view prediction here.}}
-            
-            Checklist:
-            {{Shortened, brief checklist verification here}}
-            
-            Probabilities: [Probability_A, Probability_B, ..., Probability_N]
+            Now write your answer in the format above, ending with "Probabilities: [Probability_A, Probability_B, ..., Probability_N]" in the order of the options.
             """
         )
-    return prompt_with_research
+    return prefix.strip(), suffix.strip()
+
+def get_multiple_choice_prompt_with_research(question, research):
+    return "\n\n".join(get_multiple_choice_prompt_parts_with_research(question, research))
 
 def get_multiple_choice_prompt_without_research(question):
     prompt_without_research = clean_indents(f"""
@@ -341,4 +377,15 @@ def get_search_query_generation_prompt(question):
 
     
 
-    
\ No newline at end of file
+    
+
+def get_research_summarization_prompt(research, token_budget):
+    prompt = clean_indents(f"""
+        Below is research gathered by an assistant for a forecasting question, as a series of search queries and their answers.
+
+        Rewrite it in at most {int(token_budget * 0.75)} words for a forecaster. Keep every concrete fact, number, date, base rate and named source that bears on the question, and drop repetition, filler and anything off-topic. Do not add facts, opinions or a forecast of your own.
+
+        Research:
+        {research}
+        """)
+    return prompt
@@ -0,0 +1,295 @@
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, TypeVar
+
+import httpx
+import requests
+
+from tracing import add_to_span
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# provider: (requests per second, burst, tokens per minute or None)
+# Override with e.g. PERPLEXITY_REQUESTS_PER_SECOND, PERPLEXITY_BURST, OPENAI_TOKENS_PER_MINUTE
+DEFAULT_PROVIDER_RATES: dict[str, tuple[float, int, int | None]] = {
+    "openai": (10, 10, None),
+    "openrouter": (10, 10, None),
+    "perplexity": (0.8, 5, None),
+    "asknews": (0.1, 2, None),  # burst 2: call_asknews sends its latest-news and historical searches together
+    "exa": (2, 2, None),
+    "metaculus": (2, 5, None),
+}
+
+
+class RetryableStatusError(Exception):
+    """
+    Raised for HTTP responses that are worth retrying (429 and 5xx).
+    """
+
+    def __init__(self, status_code: int, message: str, retry_after: float | None = None) -> None:
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(headers) -> float | None:
+    """
+    Seconds to wait according to `Retry-After` (seconds or HTTP date) or `retry-after-ms`.
+    """
+    if headers is None:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def raise_for_retryable_status(response) -> None:
+    """
+    Works with both `requests` and `httpx` responses.
+    """
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        raise RetryableStatusError(
+            response.status_code, response.text, parse_retry_after(response.headers)
+        )
+
+
+def _retry_info(exc: BaseException) -> tuple[bool, float | None, bool]:
+    """
+    Returns (retryable, retry_after, was_rate_limited) for an exception raised by a provider call.
+    """
+    if isinstance(exc, RetryableStatusError):
+        return True, exc.retry_after, exc.status_code == 429
+    response = getattr(exc, "response", None)
+    status_code = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    if status_code is not None:
+        headers = getattr(response, "headers", None)
+        return status_code in RETRYABLE_STATUS_CODES, parse_retry_after(headers), status_code == 429
+    if isinstance(
+        exc,
+        (
+            httpx.TransportError,
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            ConnectionError,
+            TimeoutError,
+        ),
+    ):
+        return True, None, False
+    return False, None, False
+
+
+@dataclass
+class BucketStats:
+    acquisitions: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    rate_limited: int = 0
+    retries: int = 0
+    failures: int = 0
+
+
+@dataclass
+class TokenBucket:
+    """
+    Token bucket limiting both requests per second (with a burst allowance) and, optionally, LLM tokens per minute.
+    Tokens are counted as the caller's estimate at reservation time (callers pass the prompt size).
+
+    Capacity is reserved up front: a caller that arrives when the bucket is empty is told how long to wait and the
+    debt is carried forward, so waiting callers are served in arrival order without polling.
+    `block_for` pauses the whole bucket, which is how a provider's Retry-After is honoured for every caller.
+    """
+
+    name: str
+    requests_per_second: float
+    burst: int
+    tokens_per_minute: int | None = None
+    stats: BucketStats = field(default_factory=BucketStats)
+
+    def __post_init__(self) -> None:
+        self._available_requests = float(self.burst)
+        self._available_tokens = float(self.tokens_per_minute or 0)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._available_requests = min(
+            float(self.burst), self._available_requests + elapsed * self.requests_per_second
+        )
+        if self.tokens_per_minute:
+            self._available_tokens = min(
+                float(self.tokens_per_minute),
+                self._available_tokens + elapsed * self.tokens_per_minute / 60,
+            )
+
+    def reserve(self, tokens: int = 0) -> float:
+        """
+        Reserves one request (and `tokens` tokens) and returns how many seconds to wait before using it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._available_requests -= 1
+            wait = max(0.0, -self._available_requests / self.requests_per_second)
+            if self.tokens_per_minute:
+                self._available_tokens -= tokens
+                wait = max(wait, -self._available_tokens / (self.tokens_per_minute / 60))
+            wait = max(wait, self._blocked_until - now)
+            self.stats.acquisitions += 1
+            self.stats.wait_seconds += wait
+            self.stats.max_wait_seconds = max(self.stats.max_wait_seconds, wait)
+            return wait
+
+    def block_for(self, seconds: float) -> None:
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self, tokens: int = 0) -> None:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self, tokens: int = 0) -> None:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RateLimiterRegistry:
+    """
+    One shared TokenBucket per provider, configured from DEFAULT_PROVIDER_RATES and the environment.
+    """
+
+    def __init__(self, rates: dict[str, tuple[float, int, int | None]] = DEFAULT_PROVIDER_RATES) -> None:
+        self.rates = rates
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def get(self, provider: str) -> TokenBucket:
+        if provider not in self._buckets:
+            requests_per_second, burst, tokens_per_minute = self.rates.get(provider, (5, 5, None))
+            prefix = provider.upper()
+            tokens_per_minute_override = os.getenv(f"{prefix}_TOKENS_PER_MINUTE")
+            self._buckets[provider] = TokenBucket(
+                name=provider,
+                requests_per_second=float(os.getenv(f"{prefix}_REQUESTS_PER_SECOND", requests_per_second)),
+                burst=int(os.getenv(f"{prefix}_BURST", burst)),
+                tokens_per_minute=int(tokens_per_minute_override) if tokens_per_minute_override else tokens_per_minute,
+            )
+        return self._buckets[provider]
+
+    def summary(self) -> str:
+        lines = ["Rate limiter wait time per provider:"]
+        for name, bucket in sorted(self._buckets.items()):
+            stats = bucket.stats
+            lines.append(
+                f"- {name}: {stats.acquisitions} requests, waited {stats.wait_seconds:.1f}s total "
+                f"(max {stats.max_wait_seconds:.1f}s), {stats.rate_limited} rate limited, "
+                f"{stats.retries} retries, {stats.failures} failures"
+            )
+        return "\n".join(lines)
+
+
+rate_limiters = RateLimiterRegistry()
+
+
+def _backoff_delay(
+    bucket: TokenBucket, exc: BaseException, attempt: int, max_retries: int, base_delay: float, max_delay: float
+) -> float | None:
+    """
+    How long to wait before retrying after `exc`, or None if the call should fail. Nothing is
+    recorded as a retry, and the bucket is not blocked, for an error that is not going to be retried.
+    """
+    retryable, retry_after, was_rate_limited = _retry_info(exc)
+    if was_rate_limited:
+        bucket.stats.rate_limited += 1
+    if not retryable or attempt >= max_retries:
+        return None
+    # Full jitter exponential backoff, unless the provider told us exactly how long to wait
+    delay = retry_after if retry_after is not None else random.uniform(0, min(max_delay, base_delay * 2**attempt))
+    if was_rate_limited:
+        bucket.block_for(delay)
+    bucket.stats.retries += 1
+    add_to_span("retries")
+    logger.warning(f"{bucket.name} request failed ({exc.__class__.__name__}: {str(exc)[:200]}), retrying in {delay:.1f}s")
+    return delay
+
+
+async def call_with_backoff(
+    provider: str,
+    func: Callable[[], Awaitable[T]],
+    tokens: int = 0,
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+) -> T:
+    """
+    Waits for the provider's bucket, calls `func` and retries 429s, 5xx and connection errors.
+    """
+    bucket = rate_limiters.get(provider)
+    for attempt in range(max_retries + 1):
+        await bucket.acquire(tokens)
+        try:
+            return await func()
+        except Exception as exc:
+            delay = _backoff_delay(bucket, exc, attempt, max_retries, base_delay, max_delay)
+            if delay is None:
+                bucket.stats.failures += 1
+                raise
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+def call_with_backoff_blocking(
+    provider: str,
+    func: Callable[[], T],
+    tokens: int = 0,
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+) -> T:
+    """
+    Synchronous counterpart of `call_with_backoff`.
+    """
+    bucket = rate_limiters.get(provider)
+    for attempt in range(max_retries + 1):
+        bucket.acquire_blocking(tokens)
+        try:
+            return func()
+        except Exception as exc:
+            delay = _backoff_delay(bucket, exc, attempt, max_retries, base_delay, max_delay)
+            if delay is None:
+                bucket.stats.failures += 1
+                raise
+            time.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4
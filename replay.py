@@ -0,0 +1,378 @@
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Requests to http://<host>:<port>/<upstream>/<path> are recorded from / replayed for <upstream base>/<path>
+REPLAY_UPSTREAMS = {
+    "metaculus": "https://www.metaculus.com/api",
+    "perplexity": "https://api.perplexity.ai",
+    "openai": "https://api.openai.com/v1",
+    "openrouter": "https://openrouter.ai/api/v1",
+    "asknews": "https://api.asknews.app",
+    "asknews_auth": "https://auth.asknews.app",
+}
+# The environment variables that point the bots (and the SDKs they use) at each upstream
+REPLAY_ENV_VARS = {
+    "metaculus": ("METACULUS_API_BASE_URL", ""),
+    "perplexity": ("PERPLEXITY_API_BASE_URL", ""),
+    "openai": ("OPENAI_BASE_URL", ""),
+    "openrouter": ("OPENROUTER_API_BASE", ""),
+    "asknews": ("ASKNEWS_API_BASE_URL", ""),
+    "asknews_auth": ("ASKNEWS_TOKEN_URL", "/oauth2/token"),
+}
+REPLAY_ARCHIVE_PATH = os.getenv("REPLAY_ARCHIVE_PATH", ".cache/replay.jsonl.gz")
+
+# Only these response headers are kept; request headers (which hold the API keys) are never stored
+_KEPT_RESPONSE_HEADERS = {"content-type", "retry-after", "retry-after-ms", "etag", "last-modified"}
+
+
+def replay_env(base_url: str) -> dict[str, str]:
+    """
+    The environment variables that send a bot's requests to a replay server at `base_url`.
+    """
+    return {
+        variable: f"{base_url}/{upstream}{suffix}" for upstream, (variable, suffix) in REPLAY_ENV_VARS.items()
+    }
+
+
+def body_hash(body: bytes) -> str:
+    """
+    Hash of a request body, with JSON bodies canonicalized so key order does not matter.
+    """
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True).encode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        pass
+    return hashlib.sha256(body).hexdigest()[:16]
+
+
+@dataclass
+class Interaction:
+    upstream: str
+    method: str
+    path: str  # including the query string
+    request_hash: str
+    status: int
+    headers: dict
+    body: str
+    body_is_base64: bool
+    latency: float
+
+    def body_bytes(self) -> bytes:
+        return base64.b64decode(self.body) if self.body_is_base64 else self.body.encode("utf-8")
+
+
+class ReplayArchive:
+    """
+    Recorded interactions in a gzipped JSONL file. Requests are matched on (upstream, method, path,
+    body hash); a request that was never recorded falls back to another recording of the same
+    endpoint and query string (e.g. an LLM prompt with a different date in it), and repeated requests
+    cycle through all matching recordings. A query string that was never recorded (e.g. a page of
+    results past the recorded ones) is a miss rather than some other page.
+    """
+
+    def __init__(self, path: str = REPLAY_ARCHIVE_PATH) -> None:
+        self.path = path
+        self._exact: dict[tuple, list[Interaction]] = defaultdict(list)
+        self._by_route: dict[tuple, list[Interaction]] = defaultdict(list)
+        self._served: Counter = Counter()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._index(Interaction(**json.loads(line)))
+
+    def __len__(self) -> int:
+        return sum(len(interactions) for interactions in self._exact.values())
+
+    @staticmethod
+    def _route(upstream: str, method: str, path: str) -> tuple:
+        parts = urlsplit(path)
+        return upstream, method, parts.path, tuple(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+
+    def _index(self, interaction: Interaction) -> None:
+        key = (interaction.upstream, interaction.method, interaction.path, interaction.request_hash)
+        self._exact[key].append(interaction)
+        self._by_route[self._route(interaction.upstream, interaction.method, interaction.path)].append(interaction)
+
+    def add(self, interaction: Interaction) -> None:
+        with self._lock:
+            self._index(interaction)
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Each append is its own gzip member, which gzip readers concatenate
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(json.dumps(asdict(interaction)) + "\n")
+
+    def lookup(self, upstream: str, method: str, path: str, request_hash: str) -> tuple[str, Interaction | None]:
+        """
+        Returns ("exact" | "route" | "miss", interaction).
+        """
+        with self._lock:
+            for kind, key, candidates in (
+                ("exact", (upstream, method, path, request_hash), self._exact),
+                ("route", self._route(upstream, method, path), self._by_route),
+            ):
+                interactions = candidates.get(key)
+                if interactions:
+                    index = self._served[(kind, key)] % len(interactions)
+                    self._served[(kind, key)] += 1
+                    return kind, interactions[index]
+        return "miss", None
+
+
+@dataclass
+class FaultInjection:
+    """
+    What the replay server does to each response: wait `latency` seconds plus up to `jitter` more
+    plus `latency_scale` times the latency that was recorded, and answer `rate_limit_rate` of the
+    requests with a 429 (Retry-After `retry_after`) and `error_rate` of them with a 503.
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    latency_scale: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    seed: int | None = None
+
+    def __post_init__(self) -> None:
+        self._random = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def delay(self, recorded_latency: float) -> float:
+        with self._lock:
+            jitter = self._random.uniform(0, self.jitter) if self.jitter else 0.0
+        return self.latency + jitter + self.latency_scale * recorded_latency
+
+    def fault(self) -> int | None:
+        with self._lock:
+            draw = self._random.random()
+        if draw < self.rate_limit_rate:
+            return 429
+        if draw < self.rate_limit_rate + self.error_rate:
+            return 503
+        return None
+
+
+# (upstream, method, path, body) -> a made-up Interaction, or None to answer from the archive
+Responder = Callable[[str, str, str, bytes], Interaction | None]
+
+
+class ReplayServer:
+    """
+    Local stand-in for the APIs the bots call. In "record" mode it forwards every request to the
+    real upstream and stores the pair in the archive; in "replay" mode it answers from the archive
+    only, with the configured fault injection, so a run needs no network and no API keys.
+    Writes that were never recorded (new forecasts and comments) are accepted with an empty 201.
+    A `responder` can make up replies instead (e.g. simulated providers in a benchmark); the
+    latency of the interaction it returns is treated like a recorded one.
+    """
+
+    def __init__(
+        self,
+        archive: ReplayArchive,
+        mode: str = "replay",
+        faults: FaultInjection | None = None,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        responder: Responder | None = None,
+    ) -> None:
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown replay mode: {mode}")
+        self.archive = archive
+        self.mode = mode
+        self.faults = faults or FaultInjection()
+        self.responder = responder
+        self.stats: dict[str, Counter] = defaultdict(Counter)
+        self._stats_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict[str, str]:
+        return replay_env(self.base_url)
+
+    def count(self, upstream: str, event: str) -> None:
+        with self._stats_lock:
+            self.stats[upstream][event] += 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args) -> None:
+                logger.debug(format % args)
+
+            def _send(self, status: int, headers: dict, body: bytes) -> None:
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self) -> None:
+                upstream, _, rest = self.path.lstrip("/").partition("/")
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if upstream not in REPLAY_UPSTREAMS:
+                    self._send(404, {"Content-Type": "application/json"}, b'{"detail": "unknown upstream"}')
+                    return
+                path = f"/{rest}"
+                if server.mode == "record":
+                    self._record(upstream, path, body)
+                else:
+                    self._replay(upstream, path, body)
+
+            def _record(self, upstream: str, path: str, body: bytes) -> None:
+                headers = {
+                    name: value
+                    for name, value in self.headers.items()
+                    if name.lower() not in ("host", "content-length", "accept-encoding", "connection")
+                }
+                start = time.perf_counter()
+                response = requests.request(
+                    self.command, f"{REPLAY_UPSTREAMS[upstream]}{path}", headers=headers, data=body, timeout=900
+                )
+                latency = time.perf_counter() - start
+                kept = {k: v for k, v in response.headers.items() if k.lower() in _KEPT_RESPONSE_HEADERS}
+                try:
+                    text, is_base64 = response.content.decode("utf-8"), False
+                except UnicodeDecodeError:
+                    text, is_base64 = base64.b64encode(response.content).decode("ascii"), True
+                server.archive.add(
+                    Interaction(
+                        upstream, self.command, path, body_hash(body), response.status_code, kept, text, is_base64, latency
+                    )
+                )
+                server.count(upstream, "recorded")
+                self._send(response.status_code, kept, response.content)
+
+            def _replay(self, upstream: str, path: str, body: bytes) -> None:
+                interaction = None
+                if server.responder is not None:
+                    interaction = server.responder(upstream, self.command, path, body)
+                if interaction is not None:
+                    kind = "simulated"
+                else:
+                    kind, interaction = server.archive.lookup(upstream, self.command, path, body_hash(body))
+                time.sleep(server.faults.delay(interaction.latency if interaction is not None else 0.0))
+                fault = server.faults.fault()
+                if fault == 429:
+                    server.count(upstream, "injected_429")
+                    self._send(
+                        429,
+                        {"Content-Type": "application/json", "Retry-After": f"{server.faults.retry_after:g}"},
+                        b'{"detail": "rate limited (injected)"}',
+                    )
+                    return
+                if fault is not None:
+                    server.count(upstream, "injected_error")
+                    self._send(fault, {"Content-Type": "application/json"}, b'{"detail": "unavailable (injected)"}')
+                    return
+                server.count(upstream, kind)
+                if interaction is not None:
+                    self._send(interaction.status, interaction.headers, interaction.body_bytes())
+                elif self.command != "GET":
+                    self._send(201, {"Content-Type": "application/json"}, b"{}")
+                else:
+                    self._send(404, {"Content-Type": "application/json"}, b'{"detail": "not recorded"}')
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+        return Handler
+
+    def start(self) -> "ReplayServer":
+        """
+        Serves from a background thread (e.g. inside a benchmark); `stop()` shuts it down.
+        """
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def summary(self) -> str:
+        if not self.stats:
+            return f"Replay server ({self.mode}): no requests"
+        lines = [f"Replay server ({self.mode}, {len(self.archive)} recorded interactions):"]
+        for upstream, counts in sorted(self.stats.items()):
+            lines.append(f"- {upstream}: " + ", ".join(f"{count} {event}" for event, count in sorted(counts.items())))
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Record the bots' API traffic, or replay it offline with injected latency, errors and 429s"
+    )
+    parser.add_argument("mode", choices=["record", "replay", "env"], help="'env' only prints the variables to export")
+    parser.add_argument("--archive", default=REPLAY_ARCHIVE_PATH)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every replayed response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds, uniformly")
+    parser.add_argument(
+        "--latency-scale", type=float, default=1.0, help="Multiple of the recorded latency to wait (0 = as fast as possible)"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of the injected 429s")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.mode == "env":
+        for name, value in replay_env(f"http://{args.host}:{args.port}").items():
+            print(f"export {name}={value}")
+        raise SystemExit(0)
+
+    replay_server = ReplayServer(
+        ReplayArchive(args.archive),
+        mode="record" if args.mode == "record" else "replay",
+        faults=FaultInjection(
+            args.latency, args.jitter, args.latency_scale, args.error_rate, args.rate_limit_rate, args.retry_after, args.seed
+        ),
+        host=args.host,
+        port=args.port,
+    )
+    exports = "\n".join(f"export {name}={value}" for name, value in replay_server.env().items())
+    print(f"{args.mode.capitalize()}ing on {replay_server.base_url} with archive {args.archive}; point the bot here with:\n{exports}")
+    replay_server.serve_forever()
+    print(replay_server.summary())
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import os
+import re
+
+import httpx
+
+from client_registry import clients
+from rate_limiting import call_with_backoff
+from response_cache import ResponseCache
+from tracing import record_usage
+
+logger = logging.getLogger(__name__)
+
+# Can be pointed at a local replay server (see replay.py)
+PERPLEXITY_API_BASE_URL = os.getenv("PERPLEXITY_API_BASE_URL", "https://api.perplexity.ai")
+PERPLEXITY_URL = f"{PERPLEXITY_API_BASE_URL}/chat/completions"
+PERPLEXITY_SYSTEM_PROMPT = "Be thorough and detailed. Be objective in your analysis, proving documented facts only. Cite all sources with names and dates."
+PERPLEXITY_QUERY_SUFFIX = " Cite all sources with names and dates, compiling a list of sources at the end. Be objective in your analysis, providing documented facts only."
+
+# Per-provider limits, overridable from the environment
+PERPLEXITY_MAX_CONCURRENT_REQUESTS = int(os.getenv("PERPLEXITY_MAX_CONCURRENT_REQUESTS", "5"))
+PERPLEXITY_REQUEST_TIMEOUT = float(os.getenv("PERPLEXITY_REQUEST_TIMEOUT", "800"))
+
+
+class AsyncResearchFetcher:
+    """
+    Sends all of a question's search queries to Perplexity at once over the shared "perplexity" client
+    from client_registry.
+
+    At most `max_concurrent_requests` requests are in flight at any time (across all questions),
+    and each request is abandoned after `request_timeout` seconds.
+    The limiter is bound to the running event loop and recreated if the loop changes.
+    If a `cache` is set, answers are looked up there before a request is made.
+    """
+
+    def __init__(
+        self,
+        max_concurrent_requests: int = PERPLEXITY_MAX_CONCURRENT_REQUESTS,
+        request_timeout: float = PERPLEXITY_REQUEST_TIMEOUT,
+        model: str = "sonar",
+        cache: ResponseCache | None = None,
+    ) -> None:
+        self.max_concurrent_requests = max_concurrent_requests
+        self.request_timeout = request_timeout
+        self.model = model
+        self.cache = cache or ResponseCache()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._limiter: asyncio.Semaphore | None = None
+
+    def _get_limiter(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._limiter is None:
+            self._loop = loop
+            self._limiter = asyncio.Semaphore(self.max_concurrent_requests)
+        return self._limiter
+
+    async def fetch_answer(self, query: str) -> str:
+        return await self.cache.get_or_compute(
+            "perplexity", query, self.model, lambda: self._request_answer(query)
+        )
+
+    async def _request_answer(self, query: str) -> str:
+        client = clients.http_client("perplexity")
+        limiter = self._get_limiter()
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": PERPLEXITY_SYSTEM_PROMPT},
+                {"role": "user", "content": query + PERPLEXITY_QUERY_SUFFIX},
+            ],
+        }
+        headers = {
+            "accept": "application/json",
+            "content-type": "application/json",
+            "authorization": f"Bearer {os.getenv('PERPLEXITY_API_KEY')}",
+        }
+
+        async def send_request() -> httpx.Response:
+            async with limiter:
+                resp = await client.post(
+                    PERPLEXITY_URL, json=payload, headers=headers, timeout=self.request_timeout
+                )
+            resp.raise_for_status()
+            return resp
+
+        resp = await call_with_backoff("perplexity", send_request)
+        body = resp.json()
+        record_usage(f"perplexity/{self.model}", body.get("usage"))
+        content = body["choices"][0]["message"]["content"]
+        return re.sub(r"<think>.*?</think>", "", content, flags=re.DOTALL)
+
+    async def fetch_answers(self, queries: list[str]) -> list[str]:
+        """
+        Returns the answers in the same order as `queries`. All queries are sent concurrently,
+        so the latency is that of the slowest query rather than the sum of all of them.
+        """
+        return list(await asyncio.gather(*[self.fetch_answer(query) for query in queries]))
+
+
+perplexity_fetcher = AsyncResearchFetcher()
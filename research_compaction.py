@@ -0,0 +1,182 @@
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from rate_limiting import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Research is pasted into every prediction prompt, so it is compacted to this many tokens first
+RESEARCH_COMPACTION_TOKEN_BUDGET = int(os.getenv("RESEARCH_COMPACTION_TOKEN_BUDGET", "3000"))
+# If set, research still over budget after deduplication is summarized by an LLM instead of truncated
+RESEARCH_COMPACTION_SUMMARIZE = os.getenv("RESEARCH_COMPACTION_SUMMARIZE", "false").lower() == "true"
+
+_BOILERPLATE_LINE = re.compile(
+    r"^\s*(?:"
+    r"i hope this helps|let me know if|feel free to|if you (?:have|need) (?:any )?(?:more|further|other)"
+    r"|please note that (?:this|i)|as an ai\b|i (?:cannot|can't|can not) (?:browse|provide|predict)"
+    r"|disclaimer\b|this (?:information|answer|summary) is (?:based|current) "
+    r").*$",
+    re.IGNORECASE,
+)
+# Perplexity's inline markers ([1], [2][3], [1, 4]) point at a citation list that is not part of the answer text
+_CITATION_MARKER = re.compile(r"\s?\[\d+(?:\s*,\s*\d+)*\]")
+_URL = re.compile(r"https?://[^\s)\]>]+")
+_STRUCTURE_LINE = re.compile(r"^\s*<(?:Question|Answer|End of Answer)>")
+_BLOCK_END = "<End of Answer>"
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def _source_key(line: str) -> str | None:
+    """
+    A key identifying the source a line cites, or None if the line is not a citation/source line.
+    """
+    url = _URL.search(line)
+    if url is not None:
+        return url.group(0).rstrip(".,;").lower()
+    stripped = line.strip()
+    if re.match(r"^(?:[-*•]|\d+[.)]|\[\d+\])\s", stripped) and re.search(r"\b(?:19|20)\d\d\b", stripped) and len(stripped) < 200:
+        return _normalize(stripped)
+    return None
+
+
+def strip_boilerplate(text: str) -> str:
+    text = _CITATION_MARKER.sub("", text)
+    lines = [line.rstrip() for line in text.splitlines() if not _BOILERPLATE_LINE.match(line)]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def dedupe_research(text: str) -> str:
+    """
+    Drops paragraphs that already appeared earlier (e.g. the same article found by two searches)
+    and source lines citing a source that was already listed. Lines that structure the research
+    (<Question>, <Answer>, <End of Answer>) are always kept.
+    """
+    seen_paragraphs: set[str] = set()
+    seen_sources: set[str] = set()
+    kept_paragraphs = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        lines = paragraph.splitlines()
+        structural = [line for line in lines if _STRUCTURE_LINE.match(line)]
+        content = "\n".join(line for line in lines if not _STRUCTURE_LINE.match(line))
+        key = _normalize(content)
+        if key and key in seen_paragraphs:
+            if structural:
+                kept_paragraphs.append("\n".join(structural))
+            continue
+        if key:
+            seen_paragraphs.add(key)
+        kept_lines = []
+        for line in lines:
+            source = None if _STRUCTURE_LINE.match(line) else _source_key(line)
+            if source is not None:
+                if source in seen_sources:
+                    continue
+                seen_sources.add(source)
+            kept_lines.append(line)
+        if kept_lines:
+            kept_paragraphs.append("\n".join(kept_lines))
+    return "\n\n".join(kept_paragraphs)
+
+
+def _split_blocks(text: str) -> list[str]:
+    if _BLOCK_END in text:
+        blocks = [block for block in re.split(r"(?<=<End of Answer>)\n*", text) if block.strip()]
+        if len(blocks) > 1:
+            return blocks
+    return [paragraph for paragraph in re.split(r"\n\s*\n", text) if paragraph.strip()]
+
+
+def _truncate(block: str, max_chars: int) -> str:
+    if len(block) <= max_chars:
+        return block
+    closing = _BLOCK_END if block.rstrip().endswith(_BLOCK_END) else ""
+    cut = block[: max(0, max_chars - len(closing) - 6)]
+    # Prefer ending on a paragraph or sentence boundary
+    boundary = max(cut.rfind("\n\n"), cut.rfind(". "))
+    if boundary > len(cut) // 2:
+        cut = cut[: boundary + 1]
+    return f"{cut.rstrip()} [...]" + (f"\n{closing}" if closing else "")
+
+
+def truncate_to_budget(text: str, token_budget: int) -> str:
+    """
+    Shares the budget between the research blocks (one per search query, or one per paragraph)
+    so a single long answer cannot crowd out the others: short blocks are kept whole and the
+    remaining budget is split evenly between the long ones.
+    """
+    if estimate_tokens(text) <= token_budget:
+        return text
+    blocks = _split_blocks(text)
+    remaining_chars = token_budget * 4
+    shares: dict[int, int] = {}
+    for count, index in enumerate(sorted(range(len(blocks)), key=lambda i: len(blocks[i]))):
+        share = remaining_chars // (len(blocks) - count)
+        shares[index] = min(len(blocks[index]), share)
+        remaining_chars -= shares[index]
+    return "\n\n".join(_truncate(block, shares[index]) for index, block in enumerate(blocks))
+
+
+@dataclass
+class CompactionRecord:
+    label: str
+    tokens_before: int
+    tokens_after: int
+    summarized: bool
+
+
+class ResearchCompactor:
+    """
+    Fits research into `token_budget` tokens before it is pasted into the prediction prompts:
+    citation markers and boilerplate lines are stripped, repeated paragraphs and sources are
+    dropped, and if it is still too long it is either summarized once by `summarize(text, budget)`
+    or truncated evenly across its blocks.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = RESEARCH_COMPACTION_TOKEN_BUDGET,
+        summarize: Callable[[str, int], Awaitable[str]] | None = None,
+    ) -> None:
+        self.token_budget = token_budget
+        self.summarize = summarize
+        self.records: list[CompactionRecord] = []
+
+    async def compact(self, research: str, label: str = "") -> tuple[str, CompactionRecord]:
+        """
+        Returns the compacted research and the record of this compaction (also kept in `records`).
+        """
+        tokens_before = estimate_tokens(research)
+        compacted = dedupe_research(strip_boilerplate(research))
+        summarized = False
+        if estimate_tokens(compacted) > self.token_budget and self.summarize is not None:
+            try:
+                compacted = await self.summarize(compacted, self.token_budget)
+                summarized = True
+            except Exception as e:
+                logger.warning(f"Summarizing research for {label} failed, truncating instead: {e}")
+        compacted = truncate_to_budget(compacted, self.token_budget)
+        record = CompactionRecord(label, tokens_before, estimate_tokens(compacted), summarized)
+        self.records.append(record)
+        logger.info(
+            f"Research for {label}: {record.tokens_before} -> {record.tokens_after} tokens"
+            + (" (summarized)" if summarized else "")
+        )
+        return compacted, record
+
+    def summary(self) -> str:
+        if not self.records:
+            return "Research compaction: nothing compacted"
+        before = sum(record.tokens_before for record in self.records)
+        after = sum(record.tokens_after for record in self.records)
+        summarized = sum(record.summarized for record in self.records)
+        return (
+            f"Research compaction (budget {self.token_budget} tokens): {before} -> {after} tokens "
+            f"over {len(self.records)} questions ({100 * (1 - after / max(before, 1)):.0f}% saved, "
+            f"{summarized} summarized)"
+        )
@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Unset keeps the store in memory for the current run only
+RESEARCH_STORE_PATH = os.getenv("RESEARCH_STORE_PATH")
+RESEARCH_STORE_MAX_AGE_HOURS = float(os.getenv("RESEARCH_STORE_MAX_AGE_HOURS", "24"))
+# Estimated Jaccard similarity of two normalized queries above which they share research. Queries
+# that mention different numbers or names never do, however similar the rest of the text is.
+RESEARCH_STORE_SIMILARITY = float(os.getenv("RESEARCH_STORE_SIMILARITY", "0.9"))
+
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16  # 16 bands of 4 rows: pairs above ~0.6 similarity almost always share a bucket
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(1, 1 << 32, NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 32, NUM_PERMUTATIONS, dtype=np.uint64)
+
+_STOPWORDS = frozenset(
+    "a an and the of in on at to for by be is are was will would with or as from than this that what "
+    "which who how does do did it its".split()
+)
+
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Lowercases and drops punctuation and stopwords. Numbers are kept (without thousands
+    separators), so questions that differ in a threshold or a date stay different.
+    """
+    text = _NUMBER.sub(lambda number: number.group().replace(",", ""), text.lower())
+    words = re.findall(r"[a-z0-9]+(?:\.[0-9]+)?", text)
+    return " ".join(word for word in words if word not in _STOPWORDS)
+
+
+def key_terms(text: str) -> frozenset[str]:
+    """
+    The numbers and capitalized names in a query. Research answers whether one question resolves,
+    so it is only shared between queries that are about the same entities, dates and thresholds.
+    """
+    terms = {number.replace(",", "") for number in _NUMBER.findall(text)}
+    for sentence in re.split(r"[.?!]\s+", text):
+        # The first word of a sentence is capitalized whether or not it is a name
+        for word in re.findall(r"[^\W\d_][\w'-]*", sentence)[1:]:
+            if word[0].isupper():
+                terms.add(word.lower())
+    return frozenset(terms)
+
+
+def _shingles(normalized: str) -> set[str]:
+    words = normalized.split()
+    return set(words) | {f"{first} {second}" for first, second in zip(words, words[1:])}
+
+
+def minhash_signature(normalized: str) -> np.ndarray:
+    shingles = _shingles(normalized) or {""}
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles],
+        dtype=np.uint64,
+    )
+    # (a * x + b) mod p for every permutation and shingle; a, x < 2^32 so nothing overflows
+    permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1)
+
+
+def estimated_similarity(signature: np.ndarray, other: np.ndarray) -> float:
+    return float(np.mean(signature == other))
+
+
+def _band_keys(signature: np.ndarray) -> list[tuple[int, bytes]]:
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    return [(band, signature[band * rows : (band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+
+
+@dataclass
+class StoredResearch:
+    query: str
+    normalized: str
+    signature: np.ndarray
+    answer: str
+    created_at: float
+    key_terms: frozenset[str] = frozenset()
+
+
+class ResearchStore:
+    """
+    Remembers query -> research answer pairs and serves a stored answer for any later query that
+    normalizes to the same text, or that mentions the same numbers and names (`key_terms`) and is
+    estimated (by MinHash) to be at least `similarity_threshold` similar, as long as the answer is
+    younger than `max_age_seconds`.
+
+    Queries that arrive while a similar query is still being researched wait for that request
+    instead of starting their own, so a group of sibling questions is researched once.
+    Entries are kept in SQLite at `path` (or only in memory if `path` is None).
+    """
+
+    def __init__(
+        self,
+        path: str | None = RESEARCH_STORE_PATH,
+        max_age_seconds: float = RESEARCH_STORE_MAX_AGE_HOURS * 60 * 60,
+        similarity_threshold: float = RESEARCH_STORE_SIMILARITY,
+    ) -> None:
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hits = {"exact": 0, "similar": 0, "in_flight": 0}
+        self.misses = 0
+        self._entries: list[StoredResearch] = []
+        self._by_normalized: dict[str, StoredResearch] = {}
+        self._buckets: dict[tuple[int, bytes], list[StoredResearch]] = defaultdict(list)
+        self._in_flight: list[tuple[str, frozenset[str], np.ndarray, asyncio.Future]] = []
+        self._conn: sqlite3.Connection | None = None
+        if path is not None:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS research (
+                    query TEXT NOT NULL,
+                    normalized TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "DELETE FROM research WHERE created_at < ?", (time.time() - self.max_age_seconds,)
+            )
+            self._conn.commit()
+            for query, normalized, answer, created_at in self._conn.execute(
+                "SELECT query, normalized, answer, created_at FROM research ORDER BY created_at"
+            ):
+                self._index(
+                    StoredResearch(
+                        query, normalized, minhash_signature(normalized), answer, created_at, key_terms(query)
+                    )
+                )
+
+    def _index(self, entry: StoredResearch) -> None:
+        self._entries.append(entry)
+        self._by_normalized[entry.normalized] = entry
+        for key in _band_keys(entry.signature):
+            self._buckets[key].append(entry)
+
+    def _is_fresh(self, entry: StoredResearch) -> bool:
+        return time.time() - entry.created_at <= self.max_age_seconds
+
+    def lookup(self, query: str) -> tuple[str, StoredResearch] | None:
+        """
+        Returns ("exact" or "similar", entry) for a fresh stored answer matching `query`, if any.
+        """
+        normalized = normalize_query(query)
+        entry = self._by_normalized.get(normalized)
+        if entry is not None and self._is_fresh(entry):
+            return "exact", entry
+        signature = minhash_signature(normalized)
+        terms = key_terms(query)
+        best: StoredResearch | None = None
+        best_similarity = self.similarity_threshold
+        for key in _band_keys(signature):
+            for candidate in self._buckets.get(key, []):
+                if candidate.key_terms != terms:
+                    continue
+                similarity = estimated_similarity(signature, candidate.signature)
+                if similarity >= best_similarity and self._is_fresh(candidate):
+                    best, best_similarity = candidate, similarity
+        return ("similar", best) if best is not None else None
+
+    def add(self, query: str, answer: str) -> None:
+        normalized = normalize_query(query)
+        entry = StoredResearch(
+            query, normalized, minhash_signature(normalized), answer, time.time(), key_terms(query)
+        )
+        self._index(entry)
+        if self._conn is not None:
+            self._conn.execute(
+                "INSERT INTO research (query, normalized, answer, created_at) VALUES (?, ?, ?, ?)",
+                (entry.query, entry.normalized, entry.answer, entry.created_at),
+            )
+            self._conn.commit()
+
+    def _similar_in_flight(
+        self, normalized: str, terms: frozenset[str], signature: np.ndarray
+    ) -> asyncio.Future | None:
+        for other_normalized, other_terms, other_signature, future in self._in_flight:
+            if other_normalized == normalized or (
+                other_terms == terms
+                and estimated_similarity(signature, other_signature) >= self.similarity_threshold
+            ):
+                return future
+        return None
+
+    async def get_or_fetch(self, query: str, fetch: Callable[[str], Awaitable[str]]) -> str:
+        match = self.lookup(query)
+        if match is not None:
+            kind, entry = match
+            self.hits[kind] += 1
+            if kind == "similar":
+                logger.info(f"Reusing research for '{entry.query}' for '{query}'")
+            return entry.answer
+
+        normalized = normalize_query(query)
+        terms = key_terms(query)
+        signature = minhash_signature(normalized)
+        in_flight = self._similar_in_flight(normalized, terms, signature)
+        if in_flight is not None:
+            try:
+                answer = await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                if not in_flight.cancelled():
+                    raise
+            except Exception:
+                pass
+            else:
+                self.hits["in_flight"] += 1
+                return answer
+            # The request we were waiting on failed, so research this query ourselves
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        record = (normalized, terms, signature, future)
+        self._in_flight.append(record)
+        try:
+            answer = await fetch(query)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters retry on their own; this keeps asyncio from logging an unretrieved exception
+            future.exception()
+            raise
+        else:
+            future.set_result(answer)
+            self.add(query, answer)
+            return answer
+        finally:
+            self._in_flight.remove(record)
+
+    def summary(self) -> str:
+        hits = sum(self.hits.values())
+        return (
+            f"Research store: {self.misses} researched, {hits} reused "
+            f"({self.hits['exact']} exact, {self.hits['similar']} similar, {self.hits['in_flight']} shared in flight), "
+            f"{len(self._entries)} stored"
+        )
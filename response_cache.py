@@ -0,0 +1,228 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Awaitable, Callable
+
+from tracing import annotate
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class CacheBackend(ABC):
+    """
+    Storage for cached responses. Keys are hex digests built by ResponseCache.make_key.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> str | None: ...
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None: ...
+
+    def close(self) -> None:
+        pass
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """
+    Process-local backend, useful for benchmark iterations that don't need to survive a restart.
+    """
+
+    def __init__(self, ttl_seconds: float | None = DEFAULT_TTL_SECONDS) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[str, tuple[float, str]] = {}
+
+    def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created_at, value = entry
+        if self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self._entries[key] = (time.time(), value)
+
+
+class SqliteCacheBackend(CacheBackend):
+    """
+    Persistent backend stored in a single SQLite file.
+
+    Entries older than `ttl_seconds` are treated as misses and purged. When the cache grows past
+    `max_entries` or `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float | None = DEFAULT_TTL_SECONDS,
+        max_entries: int | None = None,
+        max_bytes: int | None = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_accessed ON responses (last_accessed)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> str | None:
+        row = self._conn.execute(
+            "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        now = time.time()
+        if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+            return None
+        self._conn.execute(
+            "UPDATE responses SET last_accessed = ? WHERE key = ?", (now, key)
+        )
+        self._conn.commit()
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, size, created_at, last_accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value.encode("utf-8")), now, now),
+        )
+        self._evict(now)
+        self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        if self.ttl_seconds is not None:
+            self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+        if self.max_entries is not None:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        if self.max_bytes is not None:
+            (total_bytes,) = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            if total_bytes > self.max_bytes:
+                rows = self._conn.execute(
+                    "SELECT key, size FROM responses ORDER BY last_accessed ASC"
+                ).fetchall()
+                to_delete = []
+                for key, size in rows:
+                    if total_bytes <= self.max_bytes:
+                        break
+                    to_delete.append((key,))
+                    total_bytes -= size
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class ResponseCache:
+    """
+    Content-addressed cache for LLM and research responses.
+
+    The key is a hash of the call kind, prompt, model name and sampling params, so changing any
+    of them is a miss. Identical requests made several times in one process (e.g. the N forecast
+    samples of a question) get a draw index, so a rerun replays each sample instead of N copies
+    of the first one. With no backend every call goes straight to `compute`.
+    """
+
+    def __init__(self, backend: CacheBackend | None = None) -> None:
+        self.backend = backend
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+        self._draws: Counter[str] = Counter()
+
+    @staticmethod
+    def make_key(kind: str, prompt: object, model: str, params: dict | None = None) -> str:
+        payload = json.dumps(
+            {"kind": kind, "prompt": prompt, "model": model, "params": params or {}},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get_or_compute(
+        self,
+        kind: str,
+        prompt: object,
+        model: str,
+        compute: Callable[[], Awaitable[str]],
+        params: dict | None = None,
+    ) -> str:
+        if self.backend is None:
+            return await compute()
+        base_key = self.make_key(kind, prompt, model, params)
+        draw = self._draws[base_key]
+        self._draws[base_key] += 1
+        key = f"{base_key}:{draw}"
+        cached = self.backend.get(key)
+        if cached is not None:
+            self.hits[kind] += 1
+            annotate(cache_hit=True)
+            return cached
+        self.misses[kind] += 1
+        annotate(cache_hit=False)
+        value = await compute()
+        self.backend.set(key, value)
+        return value
+
+    def stats_summary(self) -> str:
+        kinds = sorted(set(self.hits) | set(self.misses))
+        if not kinds:
+            return "Response cache: no lookups"
+        parts = [
+            f"{kind}: {self.hits[kind]} hits / {self.misses[kind]} misses"
+            for kind in kinds
+        ]
+        return "Response cache: " + ", ".join(parts)
+
+
+def llm_cache_params(llm) -> dict:
+    """
+    The sampling params of a forecasting_tools GeneralLlm that affect its output.
+    """
+    ignored = {"api_key", "timeout", "extra_headers", "model"}
+    return {k: v for k, v in llm.litellm_kwargs.items() if k not in ignored}
+
+
+async def cached_invoke(cache: ResponseCache, llm, prompt, kind: str = "llm") -> str:
+    return await cache.get_or_compute(
+        kind,
+        prompt,
+        llm.model,
+        lambda: llm.invoke(prompt),
+        params=llm_cache_params(llm),
+    )
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import math
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProviderLimits:
+    """
+    Maximum number of in-flight requests per provider, plus how many requests of each kind
+    a single question needs. Defaults can be overridden with the matching environment variables.
+    """
+
+    perplexity: int = 5  # PERPLEXITY_MAX_CONCURRENT_REQUESTS
+    forecaster: int = 10  # FORECASTER_MAX_CONCURRENT_REQUESTS (OpenRouter, also used for search query generation)
+    parser: int = 10  # PARSER_MAX_CONCURRENT_REQUESTS
+    queries_per_question: int = 6  # the question itself plus up to 5 generated search queries
+    predictions_per_question: int = 5
+
+    @classmethod
+    def from_env(cls, predictions_per_question: int = 5) -> "ProviderLimits":
+        return cls(
+            perplexity=int(os.getenv("PERPLEXITY_MAX_CONCURRENT_REQUESTS", cls.perplexity)),
+            forecaster=int(os.getenv("FORECASTER_MAX_CONCURRENT_REQUESTS", cls.forecaster)),
+            parser=int(os.getenv("PARSER_MAX_CONCURRENT_REQUESTS", cls.parser)),
+            predictions_per_question=predictions_per_question,
+        )
+
+
+class ConcurrencyScheduler:
+    """
+    Hands out per-provider concurrency slots and sizes how many questions may research at once.
+
+    The question limit is chosen so that every provider can be kept saturated: a question uses
+    `queries_per_question` Perplexity slots while researching and `predictions_per_question`
+    forecaster/parser slots while forecasting, so we allow as many questions as the most
+    parallel provider can absorb. The per-provider limits are what actually protect the quotas.
+
+    Semaphores are created lazily inside the running event loop (never at import time) and are
+    rebuilt if the scheduler is used from a new loop.
+    """
+
+    def __init__(self, limits: ProviderLimits) -> None:
+        self.limits = limits
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def max_concurrent_questions(self) -> int:
+        limits = self.limits
+        return max(
+            1,
+            math.ceil(limits.perplexity / limits.queries_per_question),
+            math.ceil(limits.forecaster / limits.predictions_per_question),
+            math.ceil(limits.parser / limits.predictions_per_question),
+        )
+
+    def _capacity(self, provider: str) -> int:
+        if provider == "questions":
+            return self.max_concurrent_questions
+        return getattr(self.limits, provider)
+
+    def _get_semaphore(self, provider: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphores = {}
+        if provider not in self._semaphores:
+            self._semaphores[provider] = asyncio.Semaphore(self._capacity(provider))
+        return self._semaphores[provider]
+
+    @asynccontextmanager
+    async def limit(self, provider: str) -> AsyncIterator[None]:
+        """
+        `provider` is one of "questions", "perplexity", "forecaster" or "parser".
+        """
+        async with self._get_semaphore(provider):
+            yield
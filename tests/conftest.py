@@ -0,0 +1,4 @@
+import os
+
+# forecasting_tools imports litellm, which otherwise downloads its model price list on import
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
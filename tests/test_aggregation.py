@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from aggregation import (
+    aggregate_cdfs,
+    aggregate_option_probabilities,
+    aggregate_probabilities,
+    enforce_cdf_constraints,
+    geometric_mean_of_odds,
+    interp_rows,
+    log_pool,
+    quantile_average,
+    trimmed_mean,
+)
+
+GRID = np.linspace(0, 1, 201)
+
+
+def uniform_cdf(low: float, high: float) -> np.ndarray:
+    return np.clip((GRID - low) / (high - low), 0, 1)
+
+
+@pytest.mark.parametrize("method", ["median", "trimmed_mean", "geo_mean_odds"])
+def test_aggregate_probabilities_batched_and_bounded(method):
+    probabilities = np.array([[0.2, 0.3, 0.9], [0.0, 0.0, 0.0], [1.0, 1.0, np.nan]])
+    aggregated = aggregate_probabilities(probabilities, method)
+    assert aggregated.shape == (3,)
+    assert aggregated[1] == pytest.approx(0.001)
+    assert aggregated[2] == pytest.approx(0.999)
+    assert 0.2 < aggregated[0] < 0.9
+
+
+def test_trimmed_mean_drops_outliers_and_ignores_missing_samples():
+    assert trimmed_mean(np.array([1.0, 2.0, 3.0, 4.0, 100.0])) == pytest.approx(3.0)
+    assert trimmed_mean(np.array([1.0, 2.0, 3.0, 4.0, 100.0, np.nan, np.nan])) == pytest.approx(3.0)
+
+
+def test_geometric_mean_of_odds_is_symmetric():
+    assert geometric_mean_of_odds(np.array([0.1, 0.9])) == pytest.approx(0.5)
+    assert geometric_mean_of_odds(np.array([0.2, 0.2])) == pytest.approx(0.2)
+
+
+@pytest.mark.parametrize("method", ["mean", "median", "log_pool"])
+def test_aggregate_option_probabilities_sum_to_one_within_bounds(method):
+    samples = np.array([[[0.0, 0.3, 0.7], [0.1, 0.6, 0.3]], [[1.0, 0.0, 0.0], [np.nan, np.nan, np.nan]]])
+    aggregated = aggregate_option_probabilities(samples, method)
+    assert aggregated.shape == (2, 3)
+    assert aggregated.sum(axis=-1) == pytest.approx([1.0, 1.0])
+    assert (aggregated > 0).all()
+
+
+def test_log_pool_favours_options_all_samples_agree_on():
+    pooled = log_pool(np.array([[0.5, 0.5], [0.9, 0.1]]))
+    assert pooled[0] > 0.7
+    assert pooled.sum() == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize(
+    "aggregate, samples",
+    [
+        (aggregate_probabilities, np.empty(0)),
+        (aggregate_probabilities, np.array([[0.5, 0.6], [np.nan, np.nan]])),
+        (aggregate_option_probabilities, np.empty((0, 3))),
+        (aggregate_option_probabilities, np.full((2, 3), np.nan)),
+    ],
+)
+def test_no_samples_raise(aggregate, samples):
+    with pytest.raises(ValueError, match="No samples"):
+        aggregate(samples)
+
+
+@pytest.mark.parametrize("samples", [np.empty((0, 201)), np.full((2, 201), np.nan)])
+def test_no_cdf_samples_raise(samples):
+    with pytest.raises(ValueError, match="No samples"):
+        aggregate_cdfs(samples, open_upper_bound=True, open_lower_bound=True)
+
+
+@pytest.mark.parametrize("method", ["median", "quantile_average"])
+@pytest.mark.parametrize("open_upper_bound", [True, False])
+@pytest.mark.parametrize("open_lower_bound", [True, False])
+def test_aggregate_cdfs_are_valid(method, open_upper_bound, open_lower_bound):
+    cdfs = np.stack([uniform_cdf(0.1, 0.3), uniform_cdf(0.6, 0.8), uniform_cdf(0.0, 1.0)])
+    aggregated = aggregate_cdfs(cdfs, open_upper_bound, open_lower_bound, method)
+    steps = np.diff(aggregated)
+    assert steps.min() >= 0.01 / 200 - 1e-12
+    if open_lower_bound:
+        assert aggregated[0] >= 0.001
+    else:
+        assert aggregated[0] == 0.0
+    if open_upper_bound:
+        assert aggregated[-1] <= 0.999
+    else:
+        assert aggregated[-1] == pytest.approx(1.0)
+
+
+def test_quantile_average_keeps_the_shape_of_the_samples():
+    cdfs = np.stack([uniform_cdf(0.2, 0.4), uniform_cdf(0.6, 0.8)])
+    averaged = quantile_average(cdfs)
+    # Halfway between the two ramps, rather than the flat step a per-point median gives
+    assert averaged[[90, 100, 110]] == pytest.approx([0.25, 0.5, 0.75], abs=0.01)
+    assert quantile_average(cdfs[:1]) == pytest.approx(cdfs[0], abs=0.002)
+
+
+def test_quantile_average_ignores_missing_samples():
+    cdfs = np.stack([uniform_cdf(0.2, 0.4), np.full(201, np.nan)])
+    assert quantile_average(cdfs) == pytest.approx(cdfs[0], abs=0.002)
+
+
+def test_enforce_cdf_constraints_repairs_decreasing_rows():
+    cdfs = np.array([[0.2, 0.1, 0.5, 0.4, 1.2]])
+    fixed = enforce_cdf_constraints(cdfs, open_upper_bound=False, open_lower_bound=False)
+    assert fixed[0, 0] == 0.0 and fixed[0, -1] == pytest.approx(1.0)
+    assert (np.diff(fixed) > 0).all()
+
+
+def test_interp_rows_matches_np_interp():
+    rng = np.random.default_rng(0)
+    xp = np.sort(rng.random((2, 3, 8)), axis=-1)
+    xp[0, 0, 3] = xp[0, 0, 4]  # repeated knot
+    fp = np.sort(rng.random((2, 3, 8)), axis=-1)
+    x = np.sort(rng.random(50) * 1.4 - 0.2)
+    expected = np.array([[np.interp(x, xp[i, j], fp[i, j]) for j in range(3)] for i in range(2)])
+    assert interp_rows(x, xp, fp) == pytest.approx(expected)
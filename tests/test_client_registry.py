@@ -0,0 +1,67 @@
+import asyncio
+import subprocess
+import sys
+
+import httpx
+
+from client_registry import ClientRegistry
+
+
+def transport() -> httpx.MockTransport:
+    return httpx.MockTransport(lambda request: httpx.Response(200, text="ok"))
+
+
+def test_clients_are_reused_within_a_loop():
+    registry = ClientRegistry(http2=False)
+
+    async def run():
+        first = registry.http_client("test", transport())
+        await first.get("https://example.com/")
+        assert registry.http_client("test") is first
+        return first
+
+    asyncio.run(run())
+    assert registry.stats["test"].clients_created == 1
+    assert registry.stats["test"].requests == 1
+
+
+CLOSED_WITH_LOOP = """
+import asyncio
+import httpx
+from client_registry import ClientRegistry
+
+registry = ClientRegistry(http2=False)
+
+
+async def run():
+    client = registry.http_client("test", httpx.MockTransport(lambda request: httpx.Response(200)))
+    await client.get("https://example.com/")
+    return client
+
+
+first = asyncio.run(run())
+second = asyncio.run(run())
+print(first.is_closed, second is not first, second.is_closed, registry.stats["test"].clients_created)
+"""
+
+
+def test_clients_are_closed_with_their_loop_and_recreated_in_the_next():
+    # In a fresh interpreter: importing forecasting_tools (as the bots do) patches asyncio.run with
+    # nest_asyncio, which keeps reusing one loop
+    result = subprocess.run(
+        [sys.executable, "-X", "dev", "-c", CLOSED_WITH_LOOP], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.split() == ["True", "True", "True", "2"]
+    assert "Unclosed" not in result.stderr and "ResourceWarning" not in result.stderr
+
+
+def test_aclose_all():
+    registry = ClientRegistry(http2=False)
+
+    async def run():
+        client = registry.http_client("test", transport())
+        await registry.closing(client.get("https://example.com/"))
+        assert client.is_closed
+        assert registry.http_client("test", transport()) is not client
+
+    asyncio.run(run())
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from main_with_no_framework import (
+    aggregate_numeric_predictions,
+    generate_cdf_locations,
+    generate_continuous_cdf,
+    generate_continuous_cdfs,
+)
+
+PERCENTILES = {10: 12.0, 20: 20.0, 40: 35.0, 60: 50.0, 80: 70.0, 90: 85.0}
+
+
+def settings(open_upper_bound=True, open_lower_bound=True, zero_point=None, cdf_size=201):
+    return {
+        "question_type": "numeric",
+        "open_upper_bound": open_upper_bound,
+        "open_lower_bound": open_lower_bound,
+        "upper_bound": 100.0,
+        "lower_bound": 0.0,
+        "zero_point": zero_point,
+        "cdf_size": cdf_size,
+    }
+
+
+@pytest.mark.parametrize("open_upper_bound", [True, False])
+@pytest.mark.parametrize("open_lower_bound", [True, False])
+@pytest.mark.parametrize("zero_point", [None, -50.0])
+def test_cdf_is_valid_for_metaculus(open_upper_bound, open_lower_bound, zero_point):
+    cdf = np.array(generate_continuous_cdf(PERCENTILES, **settings(open_upper_bound, open_lower_bound, zero_point)))
+    assert len(cdf) == 201
+    assert np.diff(cdf).min() >= 0.01 / 200 - 1e-12
+    assert cdf[0] == 0.0 if not open_lower_bound else cdf[0] >= 0.001
+    assert cdf[-1] == pytest.approx(1.0) if not open_upper_bound else cdf[-1] <= 0.999
+
+
+def test_cdf_passes_through_the_percentiles():
+    cdf = generate_continuous_cdf(PERCENTILES, **settings())
+    locations = generate_cdf_locations(0.0, 100.0, None, 201)
+    assert np.interp(50.0, locations, cdf) == pytest.approx(0.6, abs=0.01)
+
+
+def test_values_outside_closed_bounds_are_pinned_inside():
+    cdf = np.array(generate_continuous_cdf({10: -30.0, 50: 50.0, 90: 250.0}, **settings(False, False)))
+    assert np.diff(cdf).min() > 0
+    assert cdf[0] == 0.0 and cdf[-1] == pytest.approx(1.0)
+
+
+def test_discrete_cdf_size():
+    cdf = generate_continuous_cdf(PERCENTILES, **settings(cdf_size=11))
+    assert len(cdf) == 11 and np.diff(cdf).min() >= 0.01 / 10 - 1e-12
+
+
+def test_batch_matches_single_cdfs():
+    sets = [PERCENTILES, {5: 1.0, 50: 40.0, 95: 99.0}, {10: 30.0, 50: 31.0, 90: 32.0}]
+    batch = generate_continuous_cdfs(sets, **settings(zero_point=-50.0))
+    for row, percentile_values in zip(batch, sets):
+        assert row == pytest.approx(generate_continuous_cdf(percentile_values, **settings(zero_point=-50.0)))
+
+
+def test_log_scaled_locations():
+    locations = generate_cdf_locations(1.0, 1000.0, 0.0, 4)
+    assert locations == pytest.approx([1.0, 10.0, 100.0, 1000.0])
+
+
+def test_no_percentile_sets():
+    assert generate_continuous_cdfs([], **settings()).shape == (0, 201)
+    question = {
+        "type": "numeric",
+        "open_upper_bound": True,
+        "open_lower_bound": True,
+        "scaling": {"range_min": 0.0, "range_max": 100.0, "zero_point": None},
+    }
+    with pytest.raises(ValueError, match="No samples"):
+        aggregate_numeric_predictions(question, [])
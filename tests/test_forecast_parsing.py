@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+import forecast_parsing
+from forecast_parsing import (
+    parse_binary_with_regex,
+    parse_option_list_with_regex,
+    parse_percentiles_with_regex,
+    tiered_parse,
+)
+
+
+def test_parse_binary_with_regex():
+    assert parse_binary_with_regex("Probability: 35%").prediction_in_decimal == pytest.approx(0.35)
+    assert parse_binary_with_regex("Probability: ZZ%") is None
+    # Out of range is left to the parser LLM
+    assert parse_binary_with_regex("Probability: 150%") is None
+
+
+def test_parse_option_list_with_regex():
+    parsed = parse_option_list_with_regex("Probabilities: [20, 30, 50]", ["A", "B", "C"])
+    assert [option.option_name for option in parsed.predicted_options] == ["A", "B", "C"]
+    assert [option.probability for option in parsed.predicted_options] == pytest.approx([0.2, 0.3, 0.5])
+    assert parse_option_list_with_regex("Probabilities: [20, 80]", ["A", "B", "C"]) is None
+
+
+def test_parse_percentiles_with_regex():
+    text = "Distribution:\n• Percentile 10: 1,000\n– Percentile 50: 2,000\nPercentile 90: 4,000\n"
+    percentiles = parse_percentiles_with_regex(text)
+    assert [(p.percentile, p.value) for p in percentiles] == [(0.1, 1000), (0.5, 2000), (0.9, 4000)]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Distribution:\nPercentile 10: 1\nPercentile 90: 2\n",  # too few percentiles
+        "Distribution:\nPercentile 10: 5\nPercentile 50: 4\nPercentile 90: 6\n",  # not increasing
+        "No distribution given",
+    ],
+)
+def test_parse_percentiles_with_regex_rejects(text):
+    assert parse_percentiles_with_regex(text) is None
+
+
+def test_tiered_parse_falls_back_to_llm(monkeypatch):
+    monkeypatch.setattr(forecast_parsing, "parse_tier_counts", forecast_parsing.Counter())
+    calls = []
+
+    async def llm_parse():
+        calls.append(1)
+        return "from llm"
+
+    def failing_regex():
+        raise ValueError("bad")
+
+    assert asyncio.run(tiered_parse("binary", lambda: "from regex", llm_parse)) == "from regex"
+    assert asyncio.run(tiered_parse("binary", lambda: None, llm_parse)) == "from llm"
+    assert asyncio.run(tiered_parse("binary", failing_regex, llm_parse)) == "from llm"
+    assert len(calls) == 2
+    assert "binary: 1/3 regex (2 fell back to the parser LLM)" in forecast_parsing.parse_tier_summary()
@@ -0,0 +1,41 @@
+import time
+
+from forecast_state import ForecastStateStore, digest, question_input_hash
+
+
+def store(tmp_path, **options) -> ForecastStateStore:
+    return ForecastStateStore(str(tmp_path / "state" / "forecast_state.sqlite3"), **options)
+
+
+def test_input_hash_covers_every_field():
+    base = question_input_hash("title", "description", "criteria", "fine print")
+    assert base == question_input_hash("title", "description", "criteria", "fine print")
+    assert base != question_input_hash("title", "description", "criteria", "other fine print")
+    # Field boundaries count: moving text from one field to the next changes the hash
+    assert digest("ab", "c") != digest("a", "bc")
+    assert digest(None) == digest("")
+
+
+def test_reason_to_forecast(tmp_path):
+    state = store(tmp_path, max_age_seconds=60)
+    assert state.reason_to_forecast(1, "hash") == "new"
+    state.record_forecast(1, "hash", "research")
+    assert state.reason_to_forecast(1, "hash") is None
+    assert state.reason_to_forecast(1, "edited") == "changed"
+
+
+def test_stale_forecasts_are_redone_unless_touched(tmp_path):
+    state = store(tmp_path, max_age_seconds=60)
+    state.record_forecast(1, "hash", "research")
+    state._conn.execute("UPDATE question_state SET forecast_at = ?", (time.time() - 120,))
+    assert state.reason_to_forecast(1, "hash") == "stale"
+    assert state.research_unchanged(1, "hash", "research")
+    assert not state.research_unchanged(1, "hash", "new research")
+    state.touch(1)
+    assert state.reason_to_forecast(1, "hash") is None
+
+
+def test_state_survives_a_restart(tmp_path):
+    store(tmp_path).record_forecast(1, "hash", None)
+    assert store(tmp_path).reason_to_forecast(1, "hash") is None
+    assert store(tmp_path).reason_to_forecast(2, "hash") == "new"
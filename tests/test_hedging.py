@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from hedging import HedgedResearcher, LatencyTracker, ResearchSource
+
+
+def source(name: str, delay: float, answer: str | Exception = "", started: list | None = None) -> ResearchSource:
+    async def fetch(query: str) -> str:
+        if started is not None:
+            started.append(name)
+        await asyncio.sleep(delay)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer or f"{name} on {query}"
+
+    return ResearchSource(name, fetch)
+
+
+def researcher(sources, mode="hedge", delay=0.05) -> HedgedResearcher:
+    return HedgedResearcher(sources, mode=mode, default_hedge_delay=delay)
+
+
+def test_fast_primary_needs_no_backup():
+    started = []
+    hedged = researcher([source("primary", 0.01, started=started), source("backup", 0.01, started=started)])
+    assert asyncio.run(hedged.fetch("q")) == "primary on q"
+    assert started == ["primary"] and hedged.hedges_started == 0
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    cancelled = []
+
+    async def slow(query: str) -> str:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(query)
+            raise
+        return "too late"
+
+    async def main():
+        answer = await hedged.fetch("q")
+        # Let the cancelled request run its handlers
+        await asyncio.sleep(0)
+        return answer
+
+    hedged = researcher([ResearchSource("primary", slow), source("backup", 0.01)])
+    assert asyncio.run(main()) == "backup on q"
+    assert hedged.hedges_started == 1 and hedged.wins["backup"] == 1
+    assert cancelled == ["q"]
+
+
+def test_failed_primary_starts_the_backup_at_once():
+    hedged = researcher([source("primary", 0, RuntimeError("down")), source("backup", 0.01)], delay=10)
+    assert asyncio.run(asyncio.wait_for(hedged.fetch("q"), 1)) == "backup on q"
+    assert hedged.failures["primary"] == 1 and hedged.hedges_started == 0
+
+
+def test_backup_delay_counts_from_the_newest_start():
+    started_at = {}
+
+    def timed(name: str, delay: float, answer="") -> ResearchSource:
+        async def fetch(query: str) -> str:
+            started_at[name] = asyncio.get_running_loop().time()
+            await asyncio.sleep(delay)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer or name
+
+        return ResearchSource(name, fetch)
+
+    hedged = researcher(
+        [timed("first", 0.15, RuntimeError("down")), timed("second", 10), timed("third", 0.01)], delay=0.1
+    )
+    assert asyncio.run(hedged.fetch("q")) == "third"
+    # Hedged after second's own delay, not a fresh delay after first failed
+    assert started_at["third"] - started_at["second"] == pytest.approx(0.1, abs=0.04)
+
+
+def test_all_sources_failing_raises_the_last_error():
+    hedged = researcher([source("primary", 0, RuntimeError("one")), source("backup", 0, "  ")])
+    with pytest.raises(ValueError, match="Empty research from backup"):
+        asyncio.run(hedged.fetch("q"))
+
+
+def test_merge_mode_truncates_each_answer_to_its_share():
+    hedged = HedgedResearcher(
+        [source("a", 0, "x" * 1000), source("b", 0, RuntimeError("down")), source("c", 0, "y" * 10)],
+        mode="merge",
+        token_budget=100,
+    )
+    merged = asyncio.run(hedged.fetch("q"))
+    assert "[Research from a]\n" + "x" * 200 + "\n[...truncated]" in merged
+    assert "[Research from c]\n" + "y" * 10 + "\n" in merged
+    assert "[Research from b]" not in merged
+
+
+def test_hedge_delay_uses_recent_latencies_once_there_are_enough():
+    latencies = LatencyTracker()
+    hedged = HedgedResearcher([], default_hedge_delay=60, min_samples=3, hedge_percentile=0.5, latencies=latencies)
+    latencies.record("p", 1.0)
+    assert hedged.hedge_delay("p") == 60
+    latencies.record("p", 3.0)
+    latencies.record("p", 2.0)
+    assert hedged.hedge_delay("p") == 2.0
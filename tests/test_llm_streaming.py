@@ -0,0 +1,98 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from llm_streaming import (
+    IncrementalAnswerParser,
+    binary_answer_format,
+    option_lines_answer_format,
+    percentile_answer_format,
+    stream_choices,
+)
+
+
+def feed_in_chunks(parser: IncrementalAnswerParser, text: str, size: int = 7) -> None:
+    for start in range(0, len(text), size):
+        parser.feed(text[start : start + size])
+    parser.finish()
+
+
+def test_answer_split_across_chunks():
+    parser = IncrementalAnswerParser(binary_answer_format())
+    feed_in_chunks(parser, "Reasoning first.\nProbability: 42%")
+    assert parser.error is None
+    assert parser.answer_lines == ["probability: 42%"]
+
+
+def test_percentile_lines_with_bullets_and_unicode_dashes():
+    parser = IncrementalAnswerParser(percentile_answer_format(3))
+    feed_in_chunks(parser, "Distribution:\n• Percentile 10: −5\n- Percentile 50 – 1,000\nPercentile 90: 2,000\n")
+    assert parser.error is None
+    assert parser.complete
+    assert parser.answer_lines == ["percentile 10: -5", "percentile 50 - 1000", "percentile 90: 2000"]
+
+
+def test_placeholder_is_malformed():
+    parser = IncrementalAnswerParser(option_lines_answer_format(["Red", "Blue"]))
+    feed_in_chunks(parser, "Red: Probability_A\nBlue: 40\n")
+    assert parser.error is not None and "placeholder" in parser.error
+
+
+def test_runaway_and_repeating_generations_are_malformed():
+    parser = IncrementalAnswerParser(binary_answer_format(), max_chars=500)
+    feed_in_chunks(parser, "".join(f"thought {i}\n" for i in range(100)))
+    assert parser.error == "No answer after 500 characters"
+
+    parser = IncrementalAnswerParser(binary_answer_format())
+    feed_in_chunks(parser, "I keep saying the same thing. " * 200)
+    assert parser.error == "Generation is repeating itself"
+
+
+def _chunk(index, content=None, finish_reason=None):
+    delta = SimpleNamespace(content=content)
+    return SimpleNamespace(
+        usage=None, choices=[SimpleNamespace(index=index, delta=delta, finish_reason=finish_reason)]
+    )
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def close(self):
+        self.closed = True
+
+
+def test_stream_choices_cuts_short_only_the_malformed_choice():
+    stream = FakeStream(
+        [
+            _chunk(0, "Reasoning\nProb"),
+            _chunk(1, "Probability: XX%\n"),
+            _chunk(0, "ability: 30%"),
+            _chunk(0, finish_reason="stop"),
+        ]
+    )
+
+    async def collect():
+        return [result async for result in stream_choices(stream, "test-model", binary_answer_format(), n=2)]
+
+    results = asyncio.run(collect())
+    assert results[0][0] == 1 and results[0][1] is None
+    assert results[1] == (0, "Reasoning\nProbability: 30%", None)
+    assert stream.closed
+
+
+@pytest.mark.parametrize("size", [1, 3, 64])
+def test_chunk_size_does_not_change_the_answer(size):
+    parser = IncrementalAnswerParser(binary_answer_format())
+    feed_in_chunks(parser, "a\n\nb\nProbability: 7%\n", size)
+    assert parser.answer_lines == ["probability: 7%"]
@@ -0,0 +1,110 @@
+import pytest
+
+from parse_answers_from_response import (
+    clean,
+    extract_answer,
+    extract_option_probabilities_from_response,
+    extract_percentiles_from_response,
+    normalize_probabilities,
+    parse_binary_probab,
+    parse_multiple_choice_probab_distr,
+)
+
+REASONING = "Some reasoning about base rates.\n" * 2000
+
+
+def test_clean_normalizes_dashes_bullets_and_separators():
+    assert clean("• Percentile 10 – 1,200") == "percentile 10 - 1200"
+    assert clean("- **Percentile 50:** −5") == "percentile 50: -5"
+    assert clean("▪ Percentile 90: 1\u00a0200") == "percentile 90: 1200"
+
+
+@pytest.mark.parametrize(
+    "completion, expected",
+    [
+        ("Reasoning\nProbability: 37%", 0.37),
+        ("**Probability:** 42 %", 0.42),
+        ("PROBABILITY: 12.5%\nThat is my answer.", 0.125),
+        (REASONING + "Probability: 3%", 0.03),
+        # The last anchor only restates the template, so the answer before it is used
+        ("Probability: 55%\nFormat reminder: Probability: ZZ%", 0.55),
+        # Fullwidth colon, only found after normalizing the tail
+        ("Probability： 61%", 0.61),
+    ],
+)
+def test_parse_binary_probab(completion, expected):
+    assert parse_binary_probab(completion) == pytest.approx(expected)
+
+
+def test_parse_binary_probab_without_answer():
+    assert parse_binary_probab("I cannot say.") is None
+    assert parse_binary_probab("Probability: ZZ%") == -1
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "Percentile 10: 1,200",
+        "• Percentile 10: 1,200",
+        "- Percentile 10: 1200",
+        "* **Percentile 10:** 1,200",
+        "Percentile 10 – 1\u00a0200",
+    ],
+)
+def test_extract_percentiles_handles_markdown_and_separators(line):
+    completion = f"{REASONING}Distribution:\n{line}\nPercentile 90: 3,000\n"
+    assert extract_percentiles_from_response(completion) == {10: 1200.0, 90: 3000.0}
+
+
+def test_extract_percentiles_unicode_minus_and_list_input():
+    lines = ["Distribution:", "Percentile 10: −50", "Percentile 50: 0", "Percentile 90: 2.5e3"]
+    assert extract_percentiles_from_response(lines) == {10: -50.0, 50: 0.0, 90: 2500.0}
+
+
+def test_extract_percentiles_uses_last_filled_distribution():
+    completion = "Distribution:\nPercentile 10: 1\nPercentile 90: 9\n\nDistribution:\nPercentile 10: XX\n"
+    assert extract_percentiles_from_response(completion) == {10: 1.0, 90: 9.0}
+
+
+def test_extract_percentiles_ignores_unknown_percentiles():
+    completion = "Distribution:\nPercentile 12: 5\nPercentile 50: 7\n"
+    assert extract_percentiles_from_response(completion) == {50: 7.0}
+
+
+def test_extract_percentiles_error_carries_diagnostics():
+    with pytest.raises(ValueError, match="no answer anchor"):
+        extract_percentiles_from_response("Percentile 10: 5")
+    with pytest.raises(ValueError, match="no valid answer after any anchor"):
+        extract_percentiles_from_response("Distribution:\nPercentile 10: XX\n")
+
+
+def test_extract_option_probabilities():
+    completion = REASONING + "**Probabilities:** [30, 50.5%, 19.5]"
+    assert extract_option_probabilities_from_response(completion, 3) == [30.0, 50.5, 19.5]
+
+
+def test_extract_option_probabilities_skips_lists_of_the_wrong_length():
+    completion = "Probabilities: [20, 80, 0]\nCorrected: Probabilities: [20, 80]"
+    assert extract_option_probabilities_from_response(completion, 3) == [20.0, 80.0, 0.0]
+    with pytest.raises(ValueError, match="expected 4"):
+        extract_option_probabilities_from_response(completion, 4)
+
+
+def test_parse_multiple_choice_probab_distr_normalizes():
+    probabilities = parse_multiple_choice_probab_distr("Probabilities: [0, 50, 150]", 3)
+    assert sum(probabilities) == pytest.approx(1.0)
+    assert min(probabilities) > 0
+
+
+def test_normalize_probabilities_clamps_decimals():
+    probabilities = normalize_probabilities([0.0, 1.0])
+    assert probabilities == pytest.approx([0.01, 0.99])
+
+
+def test_extract_answer_reports_where_the_answer_was_found():
+    completion = REASONING + "Probability: 20%"
+    parsed = extract_answer(completion, "binary")
+    assert parsed.value == pytest.approx(0.2)
+    assert parsed.diagnostics.anchor_offset == len(REASONING)
+    assert parsed.diagnostics.normalized_chars == 0
+    assert extract_answer(completion, "discrete").diagnostics.question_type == "numeric"
@@ -0,0 +1,60 @@
+import asyncio
+
+from pipeline import Pipeline, Stage
+
+
+def test_items_flow_through_every_stage():
+    async def double(item):
+        return item * 2
+
+    async def increment(item):
+        return item + 1
+
+    pipeline = Pipeline([Stage("double", double, workers=2), Stage("increment", increment)])
+    assert sorted(asyncio.run(pipeline.run(range(5)))) == [1, 3, 5, 7, 9]
+    assert [stage.metrics.processed for stage in pipeline.stages] == [5, 5]
+
+
+def test_failed_items_are_reported_and_dropped():
+    errors = []
+
+    async def check(item):
+        if item == 2:
+            raise ValueError("bad item")
+        return item
+
+    pipeline = Pipeline([Stage("check", check)], on_error=lambda item, e: errors.append((item, str(e))))
+    assert sorted(asyncio.run(pipeline.run([1, 2, 3]))) == [1, 3]
+    assert errors == [(2, "bad item")]
+    assert pipeline.stages[0].metrics.failed == 1
+
+
+def test_slow_stage_holds_back_the_source():
+    pulled = []
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def source():
+            for item in range(50):
+                pulled.append(item)
+                yield item
+
+        async def fast(item):
+            return item
+
+        async def slow(item):
+            await gate.wait()
+            return item
+
+        pipeline = Pipeline([Stage("fast", fast, 1, queue_size=2), Stage("slow", slow, 1, queue_size=2)])
+        run = asyncio.create_task(pipeline.run(source()))
+        await asyncio.sleep(0.05)
+        blocked_at = len(pulled)
+        gate.set()
+        return blocked_at, await run
+
+    blocked_at, results = asyncio.run(main())
+    # Two queues of two, an item in each worker, and one item each waiting to be put into a full queue
+    assert blocked_at <= 8
+    assert sorted(results) == list(range(50))
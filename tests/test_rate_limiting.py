@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import pytest
+
+import rate_limiting
+from rate_limiting import (
+    RateLimiterRegistry,
+    RetryableStatusError,
+    TokenBucket,
+    call_with_backoff,
+    call_with_backoff_blocking,
+    parse_retry_after,
+)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = RateLimiterRegistry({"test": (1000, 1000, None)})
+    monkeypatch.setattr(rate_limiting, "rate_limiters", registry)
+    return registry
+
+
+def failing(errors: list[Exception]):
+    calls = []
+
+    def call():
+        calls.append(time.monotonic())
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+
+    return call, calls
+
+
+def test_parse_retry_after():
+    assert parse_retry_after({"retry-after": "3"}) == 3.0
+    assert parse_retry_after({"retry-after-ms": "250", "retry-after": "3"}) == 0.25
+    assert parse_retry_after({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0.0
+    assert parse_retry_after({"retry-after": "soon"}) is None
+    assert parse_retry_after(None) is None
+
+
+def test_retries_until_success(registry):
+    call, calls = failing([RetryableStatusError(503, "down"), RetryableStatusError(429, "slow down", 0.01)])
+    assert call_with_backoff_blocking("test", call, base_delay=0.001) == "ok"
+    stats = registry.get("test").stats
+    assert (len(calls), stats.retries, stats.rate_limited, stats.failures) == (3, 2, 1, 0)
+
+
+def test_final_attempt_is_not_counted_as_a_retry_or_blocking(registry):
+    call, calls = failing([RetryableStatusError(429, "slow down", 30)] * 2)
+
+    async def call_async():
+        return call()
+
+    with pytest.raises(RetryableStatusError):
+        asyncio.run(call_with_backoff("test", call_async, max_retries=0))
+    bucket = registry.get("test")
+    assert (len(calls), bucket.stats.retries, bucket.stats.rate_limited, bucket.stats.failures) == (1, 0, 1, 1)
+    # Other callers are not held back by a Retry-After that nobody is going to wait for
+    assert bucket.reserve() == 0
+
+
+def test_errors_that_are_not_retryable_fail_at_once(registry):
+    call, calls = failing([ValueError("bad request")])
+    with pytest.raises(ValueError):
+        call_with_backoff_blocking("test", call)
+    assert len(calls) == 1 and registry.get("test").stats.retries == 0
+
+
+def test_rate_limited_retry_blocks_the_bucket(registry):
+    call, calls = failing([RetryableStatusError(429, "slow down", 0.2)])
+    call_with_backoff_blocking("test", call)
+    assert calls[1] - calls[0] >= 0.2
+    assert registry.get("test").reserve() == 0
+
+
+def test_token_bucket_serves_waiters_in_arrival_order():
+    bucket = TokenBucket("test", requests_per_second=10, burst=2)
+    waits = [bucket.reserve() for _ in range(5)]
+    assert waits[:2] == [0, 0]
+    assert waits[2:] == pytest.approx([0.1, 0.2, 0.3], abs=0.01)
+
+
+def test_token_bucket_limits_tokens_per_minute():
+    bucket = TokenBucket("test", requests_per_second=100, burst=100, tokens_per_minute=600)
+    assert bucket.reserve(600) == 0
+    assert bucket.reserve(60) == pytest.approx(6, abs=0.01)
+
+
+def test_block_for_holds_back_every_caller():
+    bucket = TokenBucket("test", requests_per_second=100, burst=100)
+    bucket.block_for(5)
+    assert bucket.reserve() == pytest.approx(5, abs=0.01)
+    assert bucket.reserve() == pytest.approx(5, abs=0.01)
@@ -0,0 +1,37 @@
+from replay import Interaction, ReplayArchive
+
+
+def interaction(path: str, request_hash: str, body: str) -> Interaction:
+    return Interaction("metaculus", "GET", path, request_hash, 200, {}, body, False, 0.1)
+
+
+def archive(tmp_path) -> ReplayArchive:
+    recorded = ReplayArchive(str(tmp_path / "replay.jsonl.gz"))
+    recorded.add(interaction("/posts/?limit=100&offset=0", "a", "page 1"))
+    recorded.add(interaction("/posts/?limit=100&offset=100", "a", "page 2"))
+    recorded.add(interaction("/chat/completions", "prompt-1", "answer 1"))
+    return recorded
+
+
+def test_exact_match(tmp_path):
+    kind, found = archive(tmp_path).lookup("metaculus", "GET", "/posts/?limit=100&offset=100", "a")
+    assert (kind, found.body) == ("exact", "page 2")
+
+
+def test_unrecorded_page_is_a_miss(tmp_path):
+    assert archive(tmp_path).lookup("metaculus", "GET", "/posts/?limit=100&offset=200", "a") == ("miss", None)
+
+
+def test_route_fallback_keeps_the_query_string(tmp_path):
+    recorded = archive(tmp_path)
+    kind, found = recorded.lookup("metaculus", "GET", "/posts/?offset=100&limit=100", "b")
+    assert (kind, found.body) == ("route", "page 2")
+    kind, found = recorded.lookup("metaculus", "GET", "/chat/completions", "prompt-2")
+    assert (kind, found.body) == ("route", "answer 1")
+
+
+def test_archive_is_reloaded_from_disk(tmp_path):
+    archive(tmp_path)
+    reloaded = ReplayArchive(str(tmp_path / "replay.jsonl.gz"))
+    assert len(reloaded) == 3
+    assert reloaded.lookup("metaculus", "GET", "/posts/?limit=100&offset=0", "a")[1].body == "page 1"
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from research_store import ResearchStore, key_terms, normalize_query
+
+CANADA = "Will the United States impose new tariffs on imports from Canada before July 1, 2026?"
+MEXICO = "Will the United States impose new tariffs on imports from Mexico before July 1, 2026?"
+
+
+def store(**options) -> ResearchStore:
+    return ResearchStore(path=None, **options)
+
+
+def test_normalize_query_keeps_numbers():
+    assert normalize_query("Will GDP grow by 2.5% in 2026?") == "gdp grow 2.5 2026"
+    assert normalize_query("Above 1,000 deaths?") == normalize_query("above 1000 deaths")
+    assert normalize_query("Above 1,000 deaths?") != normalize_query("Above 2,000 deaths?")
+
+
+def test_key_terms_are_names_and_numbers():
+    assert key_terms(CANADA) == {"united", "states", "canada", "july", "1", "2026"}
+
+
+def test_exact_match_ignores_case_punctuation_and_stopwords():
+    research = store()
+    research.add(CANADA, "canada research")
+    kind, entry = research.lookup(CANADA.upper().replace("?", "")) or (None, None)
+    assert kind == "exact" and entry.answer == "canada research"
+
+
+@pytest.mark.parametrize(
+    "sibling",
+    [
+        MEXICO,
+        CANADA.replace("2026", "2027"),
+        "Will Nvidia close above $200 on December 31, 2025?",
+    ],
+)
+def test_sibling_questions_about_other_entities_are_not_served(sibling):
+    research = store(similarity_threshold=0.5)
+    research.add(CANADA, "canada research")
+    research.add("Will Nvidia close above $150 on December 31, 2025?", "nvidia research")
+    assert research.lookup(sibling) is None
+
+
+def test_rewording_with_the_same_entities_is_served():
+    research = store(similarity_threshold=0.5)
+    research.add(CANADA, "canada research")
+    reworded = "Will the United States impose new tariffs on all imports from Canada before July 1, 2026?"
+    kind, entry = research.lookup(reworded)
+    assert kind == "similar" and entry.answer == "canada research"
+
+
+def test_get_or_fetch_researches_siblings_separately_and_shares_duplicates():
+    research = store()
+    fetched: list[str] = []
+
+    async def fetch(query: str) -> str:
+        fetched.append(query)
+        await asyncio.sleep(0.01)
+        return f"research for {query}"
+
+    async def main():
+        return await asyncio.gather(
+            research.get_or_fetch(CANADA, fetch),
+            research.get_or_fetch(MEXICO, fetch),
+            research.get_or_fetch(CANADA.lower(), fetch),
+        )
+
+    canada, mexico, canada_again = asyncio.run(main())
+    assert fetched == [CANADA, MEXICO]
+    assert mexico == f"research for {MEXICO}"
+    assert canada_again == canada
+    assert research.hits["in_flight"] == 1
+
+
+def test_stored_research_survives_a_restart(tmp_path):
+    path = str(tmp_path / "research.sqlite3")
+    ResearchStore(path=path).add(CANADA, "canada research")
+    reopened = ResearchStore(path=path)
+    assert reopened.lookup(CANADA)[1].answer == "canada research"
+    assert reopened.lookup(MEXICO) is None
+
+
+def test_stale_research_is_not_served():
+    research = store(max_age_seconds=0)
+    research.add(CANADA, "canada research")
+    research._entries[0].created_at -= 1
+    assert research.lookup(CANADA) is None
@@ -0,0 +1,96 @@
+import asyncio
+import types
+
+import pytest
+
+import response_cache
+from response_cache import InMemoryCacheBackend, ResponseCache, SqliteCacheBackend
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(response_cache, "time", types.SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    def make(**options):
+        if request.param == "memory":
+            return InMemoryCacheBackend(**options)
+        return SqliteCacheBackend(str(tmp_path / "cache" / "responses.sqlite3"), **options)
+
+    return make
+
+
+def test_entries_expire_after_ttl(make_backend, clock):
+    backend = make_backend(ttl_seconds=60)
+    backend.set("key", "value")
+    clock.now += 60
+    assert backend.get("key") == "value"
+    clock.now += 1
+    assert backend.get("key") is None
+
+
+def test_least_recently_used_entries_are_evicted_past_max_entries(tmp_path, clock):
+    backend = SqliteCacheBackend(str(tmp_path / "responses.sqlite3"), max_entries=2)
+    backend.set("a", "1")
+    clock.now += 1
+    backend.set("b", "2")
+    clock.now += 1
+    assert backend.get("a") == "1"
+    clock.now += 1
+    backend.set("c", "3")
+    assert (backend.get("a"), backend.get("b"), backend.get("c")) == ("1", None, "3")
+
+
+def test_least_recently_used_entries_are_evicted_past_max_bytes(tmp_path, clock):
+    backend = SqliteCacheBackend(str(tmp_path / "responses.sqlite3"), max_bytes=10)
+    for key in "abc":
+        backend.set(key, key * 4)
+        clock.now += 1
+    assert [backend.get(key) for key in "abc"] == [None, "bbbb", "cccc"]
+
+
+def test_sqlite_cache_survives_a_restart(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    SqliteCacheBackend(path).set("key", "value")
+    assert SqliteCacheBackend(path).get("key") == "value"
+
+
+def test_repeated_requests_replay_each_draw():
+    backend = InMemoryCacheBackend()
+    answers = iter(["first", "second", "third"])
+
+    async def compute():
+        return next(answers)
+
+    async def draws(cache: ResponseCache) -> list[str]:
+        return [await cache.get_or_compute("llm", "prompt", "model", compute, {"temperature": 0.3}) for _ in range(2)]
+
+    assert asyncio.run(draws(ResponseCache(backend))) == ["first", "second"]
+    rerun = ResponseCache(backend)
+    assert asyncio.run(draws(rerun)) == ["first", "second"]
+    assert rerun.hits["llm"] == 2 and rerun.misses["llm"] == 0
+
+
+def test_key_covers_prompt_model_and_params():
+    key = ResponseCache.make_key("llm", "prompt", "model", {"temperature": 0.3})
+    assert key == ResponseCache.make_key("llm", "prompt", "model", {"temperature": 0.3})
+    assert key != ResponseCache.make_key("llm", "prompt", "model", {"temperature": 0.5})
+    assert key != ResponseCache.make_key("llm", "prompt", "other model", {"temperature": 0.3})
+    assert key != ResponseCache.make_key("research", "prompt", "model", {"temperature": 0.3})
+
+
+def test_no_backend_always_computes():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return "value"
+
+    cache = ResponseCache()
+    asyncio.run(cache.get_or_compute("llm", "prompt", "model", compute))
+    asyncio.run(cache.get_or_compute("llm", "prompt", "model", compute))
+    assert len(calls) == 2
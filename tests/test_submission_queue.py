@@ -0,0 +1,80 @@
+import asyncio
+
+import main_with_no_framework as bot
+from forecast_state import ForecastStateStore
+from main_with_no_framework import ForecastSubmissionQueue, QuestionJob, submission_failures, submit_question_forecast
+
+
+def fake_metaculus(monkeypatch, rejected: set[int] = frozenset()):
+    batches: list[list[int]] = []
+    comments: list[int] = []
+
+    async def post_forecast_batch(forecasts):
+        batches.append([forecast["question"] for forecast in forecasts])
+        if rejected & {forecast["question"] for forecast in forecasts}:
+            raise RuntimeError("rejected")
+
+    async def post_question_comment_async(post_id, comment):
+        comments.append(post_id)
+
+    monkeypatch.setattr(bot, "post_forecast_batch", post_forecast_batch)
+    monkeypatch.setattr(bot, "post_question_comment_async", post_question_comment_async)
+    return batches, comments
+
+
+def job(question_id: int) -> QuestionJob:
+    details = {"question": {"type": "binary"}}
+    return QuestionJob(question_id, question_id + 1000, details, input_hash=f"hash-{question_id}", forecast=0.4, comment="why")
+
+
+async def submit_all(jobs, submit_workers, state_store=None, **queue_options):
+    async with ForecastSubmissionQueue(**queue_options) as queue:
+        pending = list(jobs)
+
+        async def worker():
+            while pending:
+                await submit_question_forecast(pending.pop(0), True, queue, state_store)
+
+        await asyncio.gather(*(worker() for _ in range(submit_workers)))
+
+
+def test_concurrent_forecasts_share_one_batch(monkeypatch, tmp_path):
+    batches, comments = fake_metaculus(monkeypatch)
+    jobs = [job(question_id) for question_id in range(10)]
+    state_store = ForecastStateStore(str(tmp_path / "state.sqlite3"))
+    loop_time = asyncio.run(_timed(submit_all(jobs, 2, state_store, max_batch_size=10, max_wait_seconds=5)))
+    # A full batch goes out at once instead of waiting out max_wait_seconds per pair of forecasts
+    assert batches == [list(range(10))]
+    assert loop_time < 1
+    assert sorted(comments) == [question_id + 1000 for question_id in range(10)]
+    assert submission_failures(jobs) == []
+    assert all("Posted" in job.summary for job in jobs)
+    assert state_store.reason_to_forecast(3, "hash-3") is None
+
+
+def test_batch_flushes_after_max_wait(monkeypatch):
+    batches, _ = fake_metaculus(monkeypatch)
+    loop_time = asyncio.run(_timed(submit_all([job(1), job(2), job(3)], 2, max_wait_seconds=0.2)))
+    assert batches == [[1, 2, 3]]
+    assert loop_time < 1
+
+
+def test_rejected_forecast_is_reported_and_not_recorded(monkeypatch, tmp_path):
+    batches, comments = fake_metaculus(monkeypatch, rejected={2})
+    jobs = [job(1), job(2), job(3)]
+    state_store = ForecastStateStore(str(tmp_path / "state.sqlite3"))
+    asyncio.run(submit_all(jobs, 2, state_store, max_wait_seconds=0.05))
+    # The batch fails, then each forecast is retried on its own
+    assert batches == [[1, 2, 3], [1], [2], [3]]
+    assert [failed.question_id for failed, _ in submission_failures(jobs)] == [2]
+    assert sorted(comments) == [1001, 1003]
+    assert "Posted" not in jobs[1].summary
+    assert state_store.reason_to_forecast(2, "hash-2") == "new"
+    assert state_store.reason_to_forecast(1, "hash-1") is None
+
+
+async def _timed(coroutine) -> float:
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await coroutine
+    return loop.time() - start
@@ -0,0 +1,549 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from statistics import NormalDist
+
+from replay import FaultInjection, Interaction, ReplayArchive, ReplayServer
+
+logger = logging.getLogger(__name__)
+
+THROUGHPUT_BASELINE_PATH = os.getenv("THROUGHPUT_BASELINE_PATH", "benchmarks/throughput_baseline.json")
+# A metric this much worse than the baseline fails --check
+THROUGHPUT_TOLERANCE = float(os.getenv("THROUGHPUT_TOLERANCE", "0.3"))
+
+# upstream: (median seconds, lognormal sigma) of a simulated response, before --time-scale
+SIMULATED_LATENCY = {
+    "metaculus": (0.4, 0.3),
+    "perplexity": (8.0, 0.4),
+    "openai": (6.0, 0.5),
+    "openrouter": (6.0, 0.5),
+    "asknews": (3.0, 0.4),
+    "asknews_auth": (0.2, 0.2),
+}
+SIMULATED_OPTIONS = ["Red", "Green", "Blue", "Yellow"]
+BOTS = ["no_framework", "template"]
+
+# Metric: whether higher values are better
+_CHECKED_METRICS = {
+    "questions_per_minute": True,
+    "p95_latency_seconds": False,
+    "max_rss_mb": False,
+    "cost_per_question": False,
+}
+
+_WORDS = (
+    "market election rainfall satellite vaccine tariff reactor harvest drought treaty launch merger "
+    "inflation glacier pipeline summit strike wildfire quota census vessel subsidy outbreak turbine "
+    "referendum ceasefire semiconductor lithium monsoon airline stadium bond currency refinery border "
+    "coalition parliament ferry orbit telescope wheat copper dam festival highway tunnel export import "
+    "budget deficit pension court verdict patent lawsuit union wage factory port canal railway bridge "
+    "volcano earthquake hurricane flood heatwave reservoir forest coral fishery tourism museum archive "
+    "protocol benchmark dataset chip cluster startup regulator agency ministry governor senate mayor"
+).split()
+
+
+def synthetic_posts(count: int, seed: int = 0) -> list[dict]:
+    """
+    Metaculus posts for `count` made-up open questions, cycling through binary, numeric and
+    multiple choice. Titles are random enough that no two questions share their research.
+    """
+    rng = random.Random(seed)
+    posts = []
+    for index in range(count):
+        question_type = ("binary", "numeric", "multiple_choice")[index % 3]
+        subject = " ".join(rng.sample(_WORDS, 4))
+        title = {
+            "binary": f"Will the {subject} agreement be signed before 2027?",
+            "numeric": f"How many {subject} reports will be published in 2026?",
+            "multiple_choice": f"Which colour will the {subject} committee choose?",
+        }[question_type]
+        question = {
+            "id": 20000 + index,
+            "title": title,
+            "type": question_type,
+            "status": "open",
+            "description": " ".join(rng.choice(_WORDS) for _ in range(80)),
+            "resolution_criteria": f"Resolves according to the official {subject} announcement.",
+            "fine_print": "",
+            "unit": "reports" if question_type == "numeric" else "",
+            "options": SIMULATED_OPTIONS if question_type == "multiple_choice" else None,
+            "scaling": {"range_min": 0, "range_max": 100, "zero_point": None, "inbound_outcome_count": None},
+            "open_upper_bound": True,
+            "open_lower_bound": False,
+            "my_forecasts": {"latest": None},
+        }
+        posts.append({"id": 10000 + index, "title": title, "question": question})
+    return posts
+
+
+def forecasting_tools_question(post: dict):
+    """
+    The forecasting_tools question object for a synthetic post, as MetaculusApi would load it.
+    """
+    from forecasting_tools import BinaryQuestion, MultipleChoiceQuestion, NumericQuestion
+
+    question = post["question"]
+    common = {
+        "question_text": question["title"],
+        "id_of_question": question["id"],
+        "id_of_post": post["id"],
+        "page_url": f"https://www.metaculus.com/questions/{post['id']}/",
+        "background_info": question["description"],
+        "resolution_criteria": question["resolution_criteria"],
+        "fine_print": question["fine_print"],
+    }
+    if question["type"] == "binary":
+        return BinaryQuestion(**common)
+    if question["type"] == "multiple_choice":
+        return MultipleChoiceQuestion(options=question["options"], **common)
+    scaling = question["scaling"]
+    return NumericQuestion(
+        upper_bound=scaling["range_max"],
+        lower_bound=scaling["range_min"],
+        open_upper_bound=question["open_upper_bound"],
+        open_lower_bound=question["open_lower_bound"],
+        unit_of_measure=question["unit"],
+        **common,
+    )
+
+
+def _filler(rng: random.Random, words: int) -> str:
+    lines = []
+    for start in range(0, words, 12):
+        lines.append(" ".join(rng.choice(_WORDS) for _ in range(min(12, words - start))) + ".")
+    return "\n".join(lines)
+
+
+def _split_probabilities(rng: random.Random, count: int) -> list[int]:
+    weights = [rng.uniform(0.5, 3.0) for _ in range(count)]
+    probabilities = [max(1, round(100 * weight / sum(weights))) for weight in weights]
+    probabilities[0] += 100 - sum(probabilities)
+    return probabilities
+
+
+def simulated_completion(prompt: str, rng: random.Random) -> str:
+    """
+    Some reasoning followed by an answer in whatever format the prompt asks for.
+    """
+    reasoning = _filler(rng, rng.randint(150, 300))
+    percentiles = list(dict.fromkeys(re.findall(r"Percentile ([\d.]+): XX", prompt)))
+    if percentiles:
+        distribution = NormalDist(rng.uniform(40, 60), rng.uniform(5, 12))
+        lines = [f"Percentile {p}: {distribution.inv_cdf(float(p) / 100):.1f}" for p in percentiles]
+        return reasoning + "\n\nDistribution:\n" + "\n".join(lines)
+    if "Probability: ZZ%" in prompt:
+        probability = min(99, max(1, round(rng.gauss(35, 8))))
+        return f"{reasoning}\n\nProbability: {probability}%"
+    if "Probabilities: [Probability_A" in prompt:
+        probabilities = _split_probabilities(rng, len(SIMULATED_OPTIONS))
+        return f"{reasoning}\n\nProbabilities: [{', '.join(map(str, probabilities))}]"
+    if "Option_A: Probability_A" in prompt:
+        probabilities = _split_probabilities(rng, len(SIMULATED_OPTIONS))
+        lines = [f"{option}: {p}%" for option, p in zip(SIMULATED_OPTIONS, probabilities)]
+        return reasoning + "\n\n" + "\n".join(lines)
+    if "Search queries:" in prompt:
+        queries = [f"{index}. {' '.join(rng.sample(_WORDS, 6))}" for index in range(1, rng.randint(3, 5) + 1)]
+        return f"{_filler(rng, 60)}\n\nSearch queries:\n" + "\n".join(queries)
+    return reasoning
+
+
+def _prompt_text(messages: list[dict]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            parts += [block.get("text", "") for block in content if isinstance(block, dict)]
+        elif content:
+            parts.append(content)
+    return "\n".join(parts)
+
+
+def _usage(prompt: str, completions: list[str]) -> dict:
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = sum(len(text) // 4 for text in completions)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def _event_stream(model: str, completions: list[str], usage: dict | None) -> bytes:
+    """
+    The completions as OpenAI streaming chunks, interleaved the way `n` choices arrive.
+    """
+    base = {"id": "chatcmpl-simulated", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+    pieces = [[text[start : start + 80] for start in range(0, len(text), 80)] for text in completions]
+    events = []
+    for step in range(max(len(p) for p in pieces)):
+        for index, choice_pieces in enumerate(pieces):
+            if step < len(choice_pieces):
+                delta = {"role": "assistant", "content": choice_pieces[step]}
+                events.append({**base, "choices": [{"index": index, "delta": delta, "finish_reason": None}]})
+    for index in range(len(completions)):
+        events.append({**base, "choices": [{"index": index, "delta": {}, "finish_reason": "stop"}]})
+    if usage is not None:
+        events.append({**base, "choices": [], "usage": usage})
+    return "".join(f"data: {json.dumps(event)}\n\n" for event in events).encode("utf-8") + b"data: [DONE]\n\n"
+
+
+def _interaction(upstream: str, method: str, path: str, status: int, body, latency: float) -> Interaction:
+    if isinstance(body, bytes):
+        return Interaction(upstream, method, path, "", status, {"Content-Type": "text/event-stream"}, body.decode("utf-8"), False, latency)
+    return Interaction(upstream, method, path, "", status, {"Content-Type": "application/json"}, json.dumps(body), False, latency)
+
+
+class SimulatedProviders:
+    """
+    A ReplayServer responder standing in for every upstream: Metaculus serves `posts` and accepts
+    any write, Perplexity returns made-up research and the LLM APIs answer in the format each prompt
+    asks for, streamed if requested. Each response takes a lognormal SIMULATED_LATENCY.
+    """
+
+    def __init__(self, posts: list[dict], seed: int = 0) -> None:
+        self.posts = {post["id"]: post for post in posts}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, upstream: str, method: str, path: str, body: bytes) -> Interaction | None:
+        with self._lock:
+            # The server answers from many threads; each request gets its own generator
+            rng = random.Random(self._random.random())
+        median, sigma = SIMULATED_LATENCY.get(upstream, (0.0, 0.0))
+        latency = median * math.exp(rng.gauss(0, sigma))
+        if upstream == "metaculus":
+            post_id = re.fullmatch(r"/posts/(\d+)/(?:\?.*)?", path)
+            if method != "GET":
+                return _interaction(upstream, method, path, 201, {}, latency)
+            if post_id and int(post_id.group(1)) in self.posts:
+                return _interaction(upstream, method, path, 200, self.posts[int(post_id.group(1))], latency)
+            return _interaction(upstream, method, path, 404, {"detail": "Not found."}, latency)
+        if not path.startswith("/chat/completions"):
+            return None
+        request = json.loads(body or b"{}")
+        prompt = _prompt_text(request.get("messages", []))
+        model = request.get("model", "simulated")
+        if upstream == "perplexity":
+            answer = _filler(rng, rng.randint(250, 450)) + "\n\nSources:\n1. Simulated Wire, 2025-01-01"
+            response = {
+                "id": "simulated",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                "usage": _usage(prompt, [answer]),
+            }
+            return _interaction(upstream, method, path, 200, response, latency)
+        completions = [simulated_completion(prompt, rng) for _ in range(int(request.get("n") or 1))]
+        usage = _usage(prompt, completions)
+        if request.get("stream"):
+            include_usage = (request.get("stream_options") or {}).get("include_usage")
+            return _interaction(upstream, method, path, 200, _event_stream(model, completions, usage if include_usage else None), latency)
+        response = {
+            "id": "chatcmpl-simulated",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {"index": index, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+                for index, text in enumerate(completions)
+            ],
+            "usage": usage,
+        }
+        return _interaction(upstream, method, path, 200, response, latency)
+
+
+@dataclass
+class ThroughputResult:
+    """
+    One benchmark run. Times are in simulated seconds (wall clock divided by the time scale).
+    """
+
+    bot: str
+    questions: int
+    failed: int
+    time_scale: float
+    elapsed_seconds: float
+    questions_per_minute: float
+    p50_latency_seconds: float
+    p95_latency_seconds: float
+    peak_concurrent_questions: int
+    max_rss_mb: float
+    cost_per_question: float
+
+    def summary(self) -> str:
+        return (
+            f"{self.bot}: {self.questions} questions ({self.failed} failed) in {self.elapsed_seconds:.0f}s, "
+            f"{self.questions_per_minute:.2f} q/min, latency p50 {self.p50_latency_seconds:.1f}s "
+            f"p95 {self.p95_latency_seconds:.1f}s, peak {self.peak_concurrent_questions} questions in flight, "
+            f"max RSS {self.max_rss_mb:.0f} MB, ${self.cost_per_question:.4f}/question"
+        )
+
+
+def configure_environment(server_env: dict[str, str], time_scale: float) -> None:
+    """
+    Points the bots at the simulated providers with placeholder keys, and compresses the waits that
+    are measured in seconds (provider rate limits, the research hedge delay, submission batching)
+    by the same factor as the simulated latencies. Must run before the bots are imported.
+    """
+    os.environ.update(server_env)
+    for key in ("METACULUS_TOKEN", "OPENAI_API_KEY", "OPENROUTER_API_KEY", "PERPLEXITY_API_KEY"):
+        os.environ[key] = "benchmark"
+    for key in ("ASKNEWS_CLIENT_ID", "ASKNEWS_SECRET", "EXA_API_KEY", "ANTHROPIC_API_KEY", "TRACE_PATH", "RESEARCH_STORE_PATH"):
+        os.environ.pop(key, None)
+    os.environ["INCREMENTAL_MODE"] = "false"
+    os.environ["LITELLM_LOCAL_MODEL_COST_MAP"] = "True"
+    os.environ["RESEARCH_HEDGE_DEFAULT_DELAY"] = str(60 * time_scale)
+    os.environ["SUBMISSION_BATCH_MAX_WAIT_SECONDS"] = str(5 * time_scale)
+    from rate_limiting import DEFAULT_PROVIDER_RATES
+
+    for provider, (requests_per_second, _, _) in DEFAULT_PROVIDER_RATES.items():
+        os.environ[f"{provider.upper()}_REQUESTS_PER_SECOND"] = str(requests_per_second / time_scale)
+
+
+async def _run_no_framework(bot, posts: list[dict], runs_per_question: int) -> None:
+    pairs = [(post["question"]["id"], post["id"]) for post in posts]
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            await bot.clients.closing(
+                bot.forecast_questions(
+                    pairs,
+                    submit_prediction=True,
+                    num_runs_per_question=runs_per_question,
+                    skip_previously_forecasted_questions=False,
+                )
+            )
+        except RuntimeError:
+            # Failed questions are counted from their traces
+            pass
+
+
+async def _run_template(main, posts: list[dict]) -> None:
+    # Questions are built directly: forecasting_tools' MetaculusApi has no configurable base URL
+    from adaptive_sampling import ADAPTIVE_SAMPLING
+
+    bot = main.FallTemplateBot2025(
+        research_reports_per_question=1,
+        predictions_per_research_report=1 if ADAPTIVE_SAMPLING else main.provider_limits.predictions_per_question,
+        use_research_summary_to_forecast=False,
+        publish_reports_to_metaculus=False,
+        folder_to_save_reports_to=None,
+        skip_previously_forecasted_questions=False,
+    )
+    questions = [forecasting_tools_question(post) for post in posts]
+    with contextlib.redirect_stdout(io.StringIO()):
+        await main.clients.closing(bot.forecast_questions(questions, return_exceptions=True))
+
+
+def _max_rss_mb() -> float:
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+def _percentile(values: list[float], q: float) -> float:
+    from tracing import percentile
+
+    return percentile(values, q)
+
+
+def measure(bot: str, spans: list, questions: int, elapsed: float, time_scale: float) -> ThroughputResult:
+    """
+    Per-question latency is the extent of the question's trace (its first span starting to its last
+    span ending); a question failed if a span carrying its question_id ended in an error.
+    """
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span.trace_id].append(span)
+    intervals = []
+    failed = 0
+    for trace in traces.values():
+        question_spans = [span for span in trace if "question_id" in span.attributes]
+        if not question_spans:
+            continue
+        failed += any(span.status == "error" for span in question_spans)
+        start = min(span.start_time for span in trace)
+        end = max(span.start_time + (span.duration or 0.0) for span in trace)
+        intervals.append((start, end))
+    latencies = [(end - start) / time_scale for start, end in intervals]
+    peak = in_flight = 0
+    for _, change in sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals]):
+        in_flight += change
+        peak = max(peak, in_flight)
+    failed += questions - len(intervals)
+    elapsed /= time_scale
+    cost = sum(span.attributes.get("cost") or 0.0 for span in spans)
+    return ThroughputResult(
+        bot=bot,
+        questions=questions,
+        failed=failed,
+        time_scale=time_scale,
+        elapsed_seconds=elapsed,
+        questions_per_minute=(questions - failed) / elapsed * 60 if elapsed else 0.0,
+        p50_latency_seconds=_percentile(latencies, 50),
+        p95_latency_seconds=_percentile(latencies, 95),
+        peak_concurrent_questions=peak,
+        max_rss_mb=_max_rss_mb(),
+        cost_per_question=cost / questions if questions else 0.0,
+    )
+
+
+def run_benchmark(
+    bot: str,
+    questions: int,
+    time_scale: float,
+    seed: int = 0,
+    runs_per_question: int = 5,
+    error_rate: float = 0.0,
+    rate_limit_rate: float = 0.0,
+) -> ThroughputResult:
+    """
+    Forecasts `questions` synthetic questions with one of the bots against simulated providers.
+    Run one bot per process: the bots read their configuration when they are imported.
+    """
+    posts = synthetic_posts(questions, seed)
+    faults = FaultInjection(
+        latency_scale=time_scale,
+        error_rate=error_rate,
+        rate_limit_rate=rate_limit_rate,
+        retry_after=max(0.01, time_scale),
+        seed=seed,
+    )
+    archive = ReplayArchive(os.path.join(tempfile.mkdtemp(), "unused.jsonl.gz"))
+    server = ReplayServer(archive, faults=faults, port=0, responder=SimulatedProviders(posts, seed)).start()
+    try:
+        configure_environment(server.env(), time_scale)
+        from tracing import tracer
+
+        # Imported before the clock starts; importing litellm alone takes seconds
+        if bot == "no_framework":
+            import main_with_no_framework
+
+            run = _run_no_framework(main_with_no_framework, posts, runs_per_question)
+        else:
+            import main
+
+            run = _run_template(main, posts)
+        start = time.perf_counter()
+        asyncio.run(run)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.stop()
+    logger.info(server.summary())
+    return measure(bot, tracer.spans, questions, elapsed, time_scale)
+
+
+def check_against_baseline(result: dict, baseline: dict, tolerance: float = THROUGHPUT_TOLERANCE) -> list[str]:
+    """
+    The regressions of `result` against the baseline of the same bot, as messages.
+    """
+    for setting in ("questions", "time_scale"):
+        if result[setting] != baseline.get(setting):
+            return [
+                f"{result['bot']}: baseline was recorded with {setting}={baseline.get(setting)}, not "
+                f"{result[setting]}; rerun with matching settings or --update-baseline"
+            ]
+    regressions = []
+    if result["failed"] > baseline.get("failed", 0):
+        regressions.append(f"{result['bot']}: {result['failed']} questions failed (baseline {baseline.get('failed', 0)})")
+    for metric, higher_is_better in _CHECKED_METRICS.items():
+        expected, actual = baseline.get(metric), result[metric]
+        if not expected:
+            continue
+        if higher_is_better and actual < expected * (1 - tolerance):
+            regressions.append(f"{result['bot']}: {metric} {actual:.4g} is below baseline {expected:.4g}")
+        elif not higher_is_better and actual > expected * (1 + tolerance):
+            regressions.append(f"{result['bot']}: {metric} {actual:.4g} is above baseline {expected:.4g}")
+    return regressions
+
+
+def _run_in_subprocess(bot: str, args: argparse.Namespace) -> dict:
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--bot", bot,
+        "--questions", str(args.questions),
+        "--time-scale", str(args.time_scale),
+        "--seed", str(args.seed),
+        "--runs", str(args.runs),
+        "--error-rate", str(args.error_rate),
+        "--rate-limit-rate", str(args.rate_limit_rate),
+        "--json",
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark of {bot} failed:\n{completed.stderr[-4000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="End-to-end throughput of the bots against simulated providers, checked against a stored baseline"
+    )
+    parser.add_argument("--bot", choices=BOTS + ["all"], default="all")
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument(
+        "--time-scale", type=float, default=0.02, help="Real seconds per simulated second (0.02 runs 50x faster)"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=5, help="Samples per question of the no-framework bot")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--baseline", default=THROUGHPUT_BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=THROUGHPUT_TOLERANCE)
+    parser.add_argument("--check", action="store_true", help="Exit with an error if a metric regressed past the tolerance")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--json", action="store_true", help="Print the result of a single bot as JSON")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if args.bot == "all":
+        results = [_run_in_subprocess(bot, args) for bot in BOTS]
+    else:
+        result = run_benchmark(
+            args.bot, args.questions, args.time_scale, args.seed, args.runs, args.error_rate, args.rate_limit_rate
+        )
+        if args.json:
+            print(json.dumps(asdict(result)))
+            raise SystemExit(0)
+        results = [asdict(result)]
+    for result in results:
+        print(ThroughputResult(**result).summary())
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update({result["bot"]: result for result in results})
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+    elif args.check:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = []
+        for result in results:
+            if result["bot"] not in baseline:
+                regressions.append(f"{result['bot']}: no baseline in {args.baseline}")
+                continue
+            regressions += check_against_baseline(result, baseline[result["bot"]], args.tolerance)
+        if regressions:
+            print("Throughput regressions:\n" + "\n".join(f"- {regression}" for regression in regressions))
+            raise SystemExit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
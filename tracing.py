@@ -0,0 +1,251 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+# Finished spans are appended to this JSONL file; unset keeps them in memory for the end-of-run summary only
+TRACE_PATH = os.getenv("TRACE_PATH")
+
+
+@dataclass
+class Span:
+    """
+    One timed step of a forecast (a stage such as "research", or a single call such as one
+    Perplexity request). Attributes carry what the step cost: model, prompt/completion tokens,
+    cost in USD, cache hits and retries.
+    """
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start_time: float
+    attributes: dict = field(default_factory=dict)
+    duration: float | None = None
+    status: str = "ok"
+    error: str | None = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount: float = 1) -> None:
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+class Tracer:
+    def __init__(self, path: str | None = TRACE_PATH) -> None:
+        self.path = path
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+        self._file = None
+        if path is not None:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+
+    @contextmanager
+    def span(self, name: str, trace_id: str | None = None, **attributes) -> Iterator[Span]:
+        """
+        Times the enclosed block as a child of the current span (or as the root of a new trace).
+        Spans started in tasks created inside the block are its children too. Work that is handed
+        between tasks (e.g. the stages of a pipeline) can be kept in one trace by passing `trace_id`.
+        """
+        parent = _current_span.get()
+        if trace_id is None:
+            trace_id = parent.trace_id if parent is not None else new_trace_id()
+        span = Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent is not None else None,
+            start_time=time.time(),
+            attributes=attributes,
+        )
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except asyncio.CancelledError:
+            # e.g. the slower of two hedged research requests; not a failure of the step
+            span.status = "cancelled"
+            raise
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{e.__class__.__name__}: {str(e)[:200]}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            _current_span.reset(token)
+            self._finish(span)
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+            if self._file is not None:
+                self._file.write(json.dumps(asdict(span), default=str) + "\n")
+                self._file.flush()
+
+    def summary(self) -> str:
+        return summarize([asdict(span) for span in self.spans])
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+tracer = Tracer()
+
+
+def annotate(**attributes) -> None:
+    """
+    Sets attributes on the current span, if there is one.
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+def add_to_span(key: str, amount: float = 1) -> None:
+    span = _current_span.get()
+    if span is not None:
+        span.add(key, amount)
+
+
+_unpriced_models: set[str] = set()
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float | None:
+    """
+    USD cost of a request according to litellm's price list, or None for models it does not know.
+    """
+    if model in _unpriced_models:
+        return None
+    import litellm
+
+    try:
+        prompt_cost, completion_cost = litellm.cost_per_token(
+            model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+        )
+    except Exception:
+        _unpriced_models.add(model)
+        return None
+    return prompt_cost + completion_cost
+
+
+def record_usage(model: str, usage) -> None:
+    """
+    Adds a response's token usage (and its cost) to the current span. Several requests made under
+    one span, e.g. the retries of a malformed sample, add up.
+    """
+    span = _current_span.get()
+    if span is None:
+        return
+    span.set(model=model)
+    if usage is None:
+        return
+    if isinstance(usage, dict):
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        completion_tokens = usage.get("completion_tokens") or 0
+    else:
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    span.add("prompt_tokens", prompt_tokens)
+    span.add("completion_tokens", completion_tokens)
+    cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    if cost is not None:
+        span.add("cost", cost)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Nearest-rank percentile, q in [0, 100].
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[min(len(ordered), int(rank)) - 1]
+
+
+def summarize(spans: list[dict], by: str = "stage") -> str:
+    """
+    A table of latency percentiles, tokens, cost, cache hits and retries per stage (span name),
+    per model, or per (stage, model).
+    """
+    groups: dict[str, list[dict]] = defaultdict(list)
+    for span in spans:
+        model = span.get("attributes", {}).get("model")
+        if by == "stage":
+            groups[span["name"]].append(span)
+        elif model is not None:
+            groups[model if by == "model" else f"{span['name']} / {model}"].append(span)
+    if not groups:
+        return f"Traces: no spans by {by}"
+    width = max(len(key) for key in groups)
+    lines = [
+        f"{'stage' if by == 'stage' else by:<{width}}  {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8} "
+        f"{'errors':>6} {'tokens':>9} {'cost $':>8} {'cached':>6} {'retries':>7}"
+    ]
+    for key, group in sorted(groups.items(), key=lambda item: -sum(s["duration"] or 0 for s in item[1])):
+        durations = [span["duration"] or 0.0 for span in group]
+        attributes = [span.get("attributes", {}) for span in group]
+        tokens = sum((a.get("prompt_tokens") or 0) + (a.get("completion_tokens") or 0) for a in attributes)
+        cost = sum(a.get("cost") or 0.0 for a in attributes)
+        cached = sum(bool(a.get("cache_hit")) for a in attributes)
+        retries = sum(a.get("retries") or 0 for a in attributes)
+        errors = sum(span.get("status") == "error" for span in group)
+        lines.append(
+            f"{key:<{width}}  {len(group):>6} {percentile(durations, 50):>7.2f}s {percentile(durations, 95):>7.2f}s "
+            f"{percentile(durations, 99):>7.2f}s {errors:>6} {tokens:>9} {cost:>8.4f} {cached:>6} {retries:>7}"
+        )
+    return "\n".join(lines)
+
+
+def load_spans(path: str) -> list[dict]:
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                spans.append(json.loads(line))
+    return spans
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Summarize the spans recorded in a TRACE_PATH file: latency percentiles and cost per stage and model"
+    )
+    parser.add_argument("path", nargs="?", default=TRACE_PATH, help="JSONL trace file (default: $TRACE_PATH)")
+    parser.add_argument(
+        "--by",
+        choices=["stage", "model", "stage_model", "all"],
+        default="all",
+        help="Group spans by stage, by model, by both, or print all three tables",
+    )
+    parser.add_argument("--trace", help="Only summarize the spans of this trace id")
+    args = parser.parse_args()
+    if args.path is None:
+        parser.error("No trace file given and TRACE_PATH is not set")
+    spans = load_spans(args.path)
+    if args.trace:
+        spans = [span for span in spans if span["trace_id"] == args.trace]
+    groupings = ["stage", "model", "stage_model"] if args.by == "all" else [args.by]
+    print("\n\n".join(summarize(spans, by) for by in groupings))